@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+PR获取压测
+功能：在进程内启动本地Gitcode API模拟服务器，按不同并发数运行get_all_pull_requests，
+测量在给定延迟和故障率下的获取吞吐量、请求数与重试情况，全程离线
+
+用法：
+    python benchmarks/fetch_benchmark.py --prs 20000 --concurrency 1,4,8 --latency-ms 120 --jitter-ms 60
+    python benchmarks/fetch_benchmark.py --rate-limit-rate 0.02 --drop-rate 0.01 --retry-delay 0.2
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import monitor  # noqa: E402
+from gitcode_client import GitcodeClient  # noqa: E402
+from mock_gitcode_server import MockGitcodeAPI, build_arg_parser, load_recorded_prs, start_server  # noqa: E402
+from run_benchmarks import RESULTS_DIR, _git_commit  # noqa: E402
+from synthetic_prs import generate_prs  # noqa: E402
+
+def run_fetch(api: MockGitcodeAPI, base_url: str, concurrency: int, requests_per_second: float,
+              max_requests_per_second: float, max_retries: int, retry_delay: float, max_pages: int) -> dict:
+    """以指定并发数完整获取一次PR，返回耗时、吞吐量及服务端统计"""
+    api.reset_stats()
+    client = GitcodeClient(pool_size=max(concurrency, 1))
+    rate_limiter = monitor.AdaptiveRateLimiter(requests_per_second, max_rate=max_requests_per_second)
+    fetch_report = {}
+    error = None
+    prs = []
+
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            prs = monitor.get_all_pull_requests("bench", "synthetic", "token", max_retries=max_retries,
+                                                retry_delay=retry_delay, max_pages=max_pages,
+                                                concurrency=concurrency, client=client,
+                                                fetch_report=fetch_report, api_base=base_url,
+                                                rate_limiter=rate_limiter)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - start
+    client.close()
+
+    stats = dict(api.stats)
+    return {
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 3),
+        "prs": len(prs),
+        "pages": fetch_report.get("pages", 0),
+        "stop_reason": fetch_report.get("stop_reason"),
+        "throughput_prs_per_second": round(len(prs) / wall, 1) if wall > 0 else None,
+        "retries": fetch_report.get("retries", 0),
+        "final_rate": round(rate_limiter.rate, 2),
+        "rate_limiter_stats": dict(rate_limiter.stats),
+        "server_stats": stats,
+        "error": error,
+    }
+
+def main():
+    arg_parser = build_arg_parser()
+    arg_parser.description = "基于本地模拟服务器的PR获取压测"
+    arg_parser.add_argument("--concurrency", default="1,4,8", help="逗号分隔的并发数")
+    arg_parser.add_argument("--requests-per-second", type=float, default=50, help="客户端自适应限流器的初始速率")
+    arg_parser.add_argument("--max-requests-per-second", type=float, default=200, help="客户端自适应限流器的速率上限")
+    arg_parser.add_argument("--max-retries", type=int, default=3, help="get_all_pull_requests的重试次数")
+    arg_parser.add_argument("--retry-delay", type=float, default=0.5, help="重试间隔（秒）")
+    arg_parser.add_argument("--max-pages", type=int, default=0, help="最大页数，0表示不限制")
+    arg_parser.add_argument("--output", help="结果JSON路径，默认写入 benchmarks/results/")
+    arg_parser.set_defaults(port=0)
+    args = arg_parser.parse_args()
+
+    prs = load_recorded_prs(args.data) if args.data else generate_prs(args.prs, seed=args.seed)
+    api = MockGitcodeAPI(prs, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                         rate_limit_rate=args.rate_limit_rate, rate_limit_burst=args.rate_limit_burst,
+                         error_rate=args.error_rate, drop_rate=args.drop_rate,
+                         access_token=args.access_token, seed=args.seed)
+    server, base_url = start_server(api, args.host, args.port, args.verbose)
+    print(f"🚀 模拟服务器: {base_url} （{len(prs)} 个PR，延迟 {args.latency_ms}±{args.jitter_ms}ms，"
+          f"429突发率 {args.rate_limit_rate}，5xx率 {args.error_rate}，断连率 {args.drop_rate}）")
+
+    results = []
+    try:
+        for concurrency in [int(value) for value in args.concurrency.split(',') if value.strip()]:
+            result = run_fetch(api, base_url, concurrency, args.requests_per_second,
+                               args.max_requests_per_second, args.max_retries, args.retry_delay, args.max_pages or None)
+            results.append(result)
+            stats = result["server_stats"]
+            status = "✅" if result["error"] is None else f"❌ {result['error']}"
+            print(f"  并发 {concurrency:>3}: {result['wall_seconds']:>8.2f}s  {result['prs']:>7} 个PR  "
+                  f"{result['throughput_prs_per_second']} PR/s  请求 {stats['requests']} "
+                  f"(429 {stats['rate_limited']} / 5xx {stats['server_errors']} / 断连 {stats['dropped']})  "
+                  f"重试 {result['retries']}  最终速率 {result['final_rate']} 次/秒  {status}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    report = {
+        "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "server": {key: getattr(args, key) for key in ("prs", "seed", "data", "latency_ms", "jitter_ms",
+                                                        "rate_limit_rate", "rate_limit_burst",
+                                                        "error_rate", "drop_rate")},
+        "results": results,
+    }
+    output_file = args.output
+    if not output_file:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_file = os.path.join(RESULTS_DIR, f"fetch_{report['git_commit']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 压测结果已保存: {output_file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+本地Gitcode API模拟服务器
+功能：实现 /api/v5/repos/{owner}/{repo}/pulls 接口（state、page、per_page、sort、direction、since）
+及PR详情接口 pulls/{number}/comments、pulls/{number}/operate_logs，返回合成或录制的PR数据，并可注入延迟、抖动、429限流突发、5xx错误和连接中断，用于离线调优分页、并发和重试
+
+用法：
+    python benchmarks/mock_gitcode_server.py --prs 20000 --latency-ms 150 --jitter-ms 80 --rate-limit-rate 0.02
+    GITCODE_API_BASE=http://127.0.0.1:8765 python monitor.py
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from serialization import load_data  # noqa: E402
+from synthetic_prs import generate_pr_details, generate_prs  # noqa: E402
+from timeutil import parse_timestamp  # noqa: E402
+
+_PULLS_PATH = re.compile(r'^/api/v5/repos/([^/]+)/([^/]+)/pulls/?$')
+_PULL_DETAIL_PATH = re.compile(r'^/api/v5/repos/([^/]+)/([^/]+)/pulls/(\d+)/(comments|operate_logs)/?$')
+
+# 单页最大条数（与Gitcode API一致）
+MAX_PER_PAGE = 100
+
+class MockGitcodeAPI:
+    """
+    模拟服务器的数据与故障注入配置，所有请求处理线程共享
+
+    rate_limit_rate为每个请求触发429突发的概率，突发期间连续rate_limit_burst个请求返回429；
+    error_rate为返回5xx的概率，drop_rate为不返回任何响应直接断开连接的概率
+    """
+    def __init__(self, prs: list, latency_ms: float = 0, jitter_ms: float = 0, rate_limit_rate: float = 0,
+                 rate_limit_burst: int = 3, error_rate: float = 0, drop_rate: float = 0,
+                 access_token: str = None, seed: int = None):
+        self.prs = prs
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit_rate = rate_limit_rate
+        self.rate_limit_burst = rate_limit_burst
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.access_token = access_token
+        self.seed = seed
+
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.rate_limited_remaining = 0
+        self._orderings = {}
+        self._details = {}
+        self._by_number = {pr['number']: pr for pr in prs}
+        self.reset_stats()
+
+        # 预先解析时间戳，排序和过滤时不再重复解析
+        self._epochs = {}
+        for pr in prs:
+            self._epochs[pr['number']] = {
+                key: parse_timestamp(pr[key]).timestamp() if pr.get(key) else 0.0
+                for key in ('created_at', 'updated_at')
+            }
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {'requests': 0, 'ok': 0, 'not_modified': 0, 'rate_limited': 0,
+                          'server_errors': 0, 'dropped': 0, 'unauthorized': 0, 'bytes_sent': 0}
+
+    def _count(self, key: str, amount: int = 1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def choose_fault(self):
+        """为一次请求抽取故障类型：'drop'、'rate_limit'、'server_error' 或 None"""
+        with self.lock:
+            self.stats['requests'] += 1
+            if self.rate_limited_remaining > 0:
+                self.rate_limited_remaining -= 1
+                return 'rate_limit'
+            roll = self.rng.random()
+            if roll < self.drop_rate:
+                return 'drop'
+            roll -= self.drop_rate
+            if roll < self.rate_limit_rate:
+                self.rate_limited_remaining = max(self.rate_limit_burst - 1, 0)
+                return 'rate_limit'
+            roll -= self.rate_limit_rate
+            if roll < self.error_rate:
+                return 'server_error'
+            return None
+
+    def delay(self) -> float:
+        """本次请求的响应延迟（秒）"""
+        with self.lock:
+            jitter = self.rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+        return max(self.latency_ms + jitter, 0) / 1000
+
+    def list_pulls(self, query: dict) -> list:
+        """按查询参数过滤、排序并分页"""
+        state = query.get('state', 'all')
+        page = max(int(query.get('page', 1)), 1)
+        per_page = min(max(int(query.get('per_page', 20)), 1), MAX_PER_PAGE)
+        sort_key = 'updated_at' if query.get('sort') == 'updated' else 'created_at'
+        descending = query.get('direction', 'desc') != 'asc'
+
+        prs = self._ordering(state, sort_key, descending)
+        if query.get('since'):
+            since = parse_timestamp(query['since']).timestamp()
+            prs = [pr for pr in prs if self._epochs[pr['number']]['updated_at'] >= since]
+        return prs[(page - 1) * per_page:page * per_page]
+
+    def pr_details(self, number: int, resource: str, query: dict):
+        """PR详情资源（评论或操作日志）的一页，PR不存在时返回None"""
+        pr = self._by_number.get(number)
+        if pr is None:
+            return None
+        with self.lock:
+            details = self._details.get(number)
+        if details is None:
+            details = generate_pr_details(pr, seed=self.seed)
+            with self.lock:
+                self._details[number] = details
+        page = max(int(query.get('page', 1)), 1)
+        per_page = min(max(int(query.get('per_page', 20)), 1), MAX_PER_PAGE)
+        return details[resource][(page - 1) * per_page:page * per_page]
+
+    def _ordering(self, state: str, sort_key: str, descending: bool) -> list:
+        """按状态过滤并排序后的PR列表，每种组合只计算一次"""
+        key = (state, sort_key, descending)
+        with self.lock:
+            ordering = self._orderings.get(key)
+        if ordering is None:
+            prs = self.prs if state == 'all' else [pr for pr in self.prs if pr['state'] == state]
+            ordering = sorted(prs, key=lambda pr: (self._epochs[pr['number']][sort_key], pr['number']),
+                              reverse=descending)
+            with self.lock:
+                self._orderings[key] = ordering
+        return ordering
+
+class MockGitcodeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'MockGitcode/1.0'
+
+    @property
+    def api(self) -> MockGitcodeAPI:
+        return self.server.api
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, payload, headers: dict = None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.api._count('not_modified')
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        response_headers = {'Content-Type': 'application/json; charset=utf-8'}
+        if status == 200:
+            response_headers['ETag'] = etag
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=1)
+            response_headers['Content-Encoding'] = 'gzip'
+        response_headers.update(headers or {})
+
+        self.send_response(status)
+        for key, value in response_headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.api._count('bytes_sent', len(body))
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+
+        # 统计接口：GET /_stats 查看，GET /_stats?reset=1 清零
+        if parts.path == '/_stats':
+            stats = dict(self.api.stats)
+            if query.get('reset'):
+                self.api.reset_stats()
+            self._send_json(200, stats)
+            return
+
+        match = _PULLS_PATH.match(parts.path)
+        detail_match = _PULL_DETAIL_PATH.match(parts.path)
+        if not match and not detail_match:
+            self._send_json(404, {"message": "Not Found"})
+            return
+
+        if self.api.access_token and query.get('access_token') != self.api.access_token:
+            self.api._count('unauthorized')
+            self._send_json(401, {"message": "401 Unauthorized"})
+            return
+
+        fault = self.api.choose_fault()
+        delay = self.api.delay()
+        if delay:
+            time.sleep(delay)
+
+        if fault == 'drop':
+            # 不返回任何响应直接断开，客户端表现为连接错误
+            self.api._count('dropped')
+            self.close_connection = True
+            return
+        if fault == 'rate_limit':
+            self.api._count('rate_limited')
+            self._send_json(429, {"message": "Too Many Requests"},
+                            {'Retry-After': '1', 'X-RateLimit-Remaining': '0'})
+            return
+        if fault == 'server_error':
+            self.api._count('server_errors')
+            status = self.api.rng.choice((500, 502, 503))
+            self._send_json(status, {"message": "Server Error"})
+            return
+
+        try:
+            if detail_match:
+                prs = self.api.pr_details(int(detail_match.group(3)), detail_match.group(4), query)
+                if prs is None:
+                    self._send_json(404, {"message": "Not Found"})
+                    return
+            else:
+                prs = self.api.list_pulls(query)
+        except ValueError as e:
+            self._send_json(400, {"message": str(e)})
+            return
+        self.api._count('ok')
+        self._send_json(200, prs)
+
+def load_recorded_prs(data_file: str) -> list:
+    """读取录制的PR数据：PR列表，或包含all_prs字段的分析数据（任意支持的格式）"""
+    data = load_data(data_file)
+    return data if isinstance(data, list) else data.get('all_prs', [])
+
+def create_server(api: MockGitcodeAPI, host: str = '127.0.0.1', port: int = 0, verbose: bool = False) -> ThreadingHTTPServer:
+    """创建模拟服务器（port为0时自动分配端口）"""
+    server = ThreadingHTTPServer((host, port), MockGitcodeHandler)
+    server.daemon_threads = True
+    server.api = api
+    server.verbose = verbose
+    return server
+
+def start_server(api: MockGitcodeAPI, host: str = '127.0.0.1', port: int = 0, verbose: bool = False) -> tuple:
+    """
+    在后台线程中启动模拟服务器，返回 (server, base_url)，用完后调用server.shutdown()
+    """
+    server = create_server(api, host, port, verbose)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    arg_parser = argparse.ArgumentParser(description="本地Gitcode API模拟服务器")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--prs", type=int, default=10000, help="合成PR数量")
+    arg_parser.add_argument("--seed", type=int, default=42, help="合成数据与故障注入的随机种子")
+    arg_parser.add_argument("--data", help="使用录制的PR数据（PR列表或分析JSON）代替合成数据")
+    arg_parser.add_argument("--latency-ms", type=float, default=0, help="每个请求的基础延迟（毫秒）")
+    arg_parser.add_argument("--jitter-ms", type=float, default=0, help="延迟抖动幅度（毫秒）")
+    arg_parser.add_argument("--rate-limit-rate", type=float, default=0, help="触发429突发的概率")
+    arg_parser.add_argument("--rate-limit-burst", type=int, default=3, help="每次429突发连续返回429的请求数")
+    arg_parser.add_argument("--error-rate", type=float, default=0, help="返回5xx的概率")
+    arg_parser.add_argument("--drop-rate", type=float, default=0, help="直接断开连接的概率")
+    arg_parser.add_argument("--access-token", help="设置后校验请求中的access_token，不匹配时返回401")
+    arg_parser.add_argument("--verbose", action="store_true", help="打印每个请求的访问日志")
+    return arg_parser
+
+def main():
+    args = build_arg_parser().parse_args()
+    prs = load_recorded_prs(args.data) if args.data else generate_prs(args.prs, seed=args.seed)
+    api = MockGitcodeAPI(prs, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                         rate_limit_rate=args.rate_limit_rate, rate_limit_burst=args.rate_limit_burst,
+                         error_rate=args.error_rate, drop_rate=args.drop_rate,
+                         access_token=args.access_token, seed=args.seed)
+
+    server = create_server(api, args.host, args.port, args.verbose)
+    print(f"🚀 模拟Gitcode API已启动: http://{args.host}:{args.port} （{len(prs)} 个PR）")
+    print(f"   使用方式: GITCODE_API_BASE=http://{args.host}:{args.port} python monitor.py")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n📊 请求统计: {json.dumps(api.stats, ensure_ascii=False)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+PR数据流水线基准测试
+功能：用合成数据测量获取、入库、分析、索引、导出、各序列化格式读写和看板生成各阶段的耗时、峰值内存和吞吐量，
+结果保存为JSON以便在不同提交之间对比回归
+
+用法：
+    python benchmarks/run_benchmarks.py --sizes 1000,10000,100000
+    python benchmarks/run_benchmarks.py --sizes 1000000 --no-memory
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<旧结果>.json
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import columnar_analysis  # noqa: E402
+import monitor  # noqa: E402
+import pr_dashboard  # noqa: E402
+import serialization  # noqa: E402
+from daily_index import DailyCountIndex  # noqa: E402
+from pr_store import PRStore  # noqa: E402
+from synthetic_prs import generate_prs  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+
+class InMemoryClient:
+    """
+    与GitcodeClient接口一致的内存客户端，按page/per_page切分合成数据，用于测量获取阶段的处理开销
+    """
+    def __init__(self, prs: list):
+        self.prs = prs
+        self.stats = {'requests': 0, 'not_modified': 0, 'bytes_received': 0}
+
+    def get_json(self, url, params=None, on_response=None):
+        self.stats['requests'] += 1
+        page, per_page = params['page'], params['per_page']
+        return self.prs[(page - 1) * per_page:page * per_page]
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                              capture_output=True, text=True).stdout.strip() or 'unknown'
+    except OSError:
+        return 'unknown'
+
+def measure(stage: str, size: int, func, track_memory: bool = True) -> tuple:
+    """
+    执行一次func测量墙钟时间和CPU时间；track_memory时再以tracemalloc执行一次测量峰值内存
+
+    返回 (结果记录, func的返回值)
+    """
+    gc.collect()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        value = func()
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+    peak_mb = None
+    if track_memory:
+        gc.collect()
+        tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+
+    record = {
+        "size": size,
+        "stage": stage,
+        "wall_seconds": round(wall, 4),
+        "cpu_seconds": round(cpu, 4),
+        "peak_memory_mb": round(peak_mb, 2) if peak_mb is not None else None,
+        "throughput_prs_per_second": round(size / wall, 1) if wall > 0 else None,
+    }
+    print(f"  {stage:<18} {wall:>9.3f}s  cpu {cpu:>9.3f}s  "
+          f"{'-' if peak_mb is None else f'{peak_mb:.1f}MB':>10}  {record['throughput_prs_per_second']} PR/s")
+    return record, value
+
+def run_size(size: int, seed: int, track_memory: bool, work_dir: str) -> list:
+    """对一个数据规模执行所有阶段"""
+    print(f"\n📏 数据规模: {size} 个PR")
+    results = []
+    now = datetime.now(timezone.utc)
+
+    record, prs = measure("generate", size, lambda: generate_prs(size, seed=seed, now=now), False)
+    results.append(record)
+
+    def fetch():
+        return monitor.get_all_pull_requests("bench", "synthetic", "token", max_pages=None,
+                                             client=InMemoryClient(prs),
+                                             rate_limiter=monitor.TokenBucket(1e9))
+    record, _ = measure("fetch", size, fetch, track_memory)
+    results.append(record)
+
+    db_file = os.path.join(work_dir, f"bench_{size}.db")
+
+    def upsert():
+        if os.path.exists(db_file):
+            os.remove(db_file)
+        store = PRStore(db_file)
+        store.upsert_prs(prs)
+        store.close()
+    record, _ = measure("store_upsert", size, upsert, track_memory)
+    results.append(record)
+
+    store = PRStore(db_file)
+    record, records = measure("store_load", size, store.all_prs, track_memory)
+    results.append(record)
+
+    record, analysis = measure("analyze_python", size, lambda: monitor.analyze_pr_data(records, now=now), track_memory)
+    results.append(record)
+
+    if columnar_analysis.is_available():
+        record, _ = measure("analyze_numpy", size,
+                            lambda: monitor.analyze_pr_data(records, now=now, backend="numpy"), track_memory)
+        results.append(record)
+
+    record, index = measure("daily_index", size, lambda: DailyCountIndex.build(records), track_memory)
+    results.append(record)
+
+    data_file = os.path.join(work_dir, f"bench_{size}_prs_analysis.json")
+    output_data = dict(analysis, repository="bench/synthetic", daily_index=index.to_dict())
+    record, _ = measure("export_json", size, lambda: store.export_json(data_file, output_data, prs=records), track_memory)
+    results.append(record)
+    store.close()
+
+    record, _ = measure("dashboard", size, lambda: pr_dashboard.generate_pr_dashboard(data_file, "Benchmark"),
+                        track_memory)
+    results.append(record)
+
+    results.extend(run_serialization(size, dict(output_data, all_prs=[pr.to_dict() for pr in records]), track_memory,
+                                     work_dir))
+    return results
+
+def run_serialization(size: int, data: dict, track_memory: bool, work_dir: str) -> list:
+    """
+    测量各序列化格式的写入/读取耗时和文件大小；json_stdlib为标准库json.dump(indent=2)基线
+    """
+    results = []
+    baseline_file = os.path.join(work_dir, f"bench_{size}_stdlib.json")
+
+    def write_stdlib():
+        with open(baseline_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    def read_stdlib():
+        with open(baseline_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    stages = [("json_stdlib", baseline_file, write_stdlib, read_stdlib)]
+    for fmt, extension in serialization.FORMAT_EXTENSIONS.items():
+        if not serialization.is_available(fmt):
+            print(f"  （跳过 {fmt}：未安装可选依赖）")
+            continue
+        path = os.path.join(work_dir, f"bench_{size}_prs_analysis{extension}")
+        stages.append((fmt, path, lambda path=path: serialization.dump_data(data, path),
+                       lambda path=path: serialization.load_data(path)))
+
+    for fmt, path, write, read in stages:
+        record, _ = measure(f"write_{fmt}", size, write, track_memory)
+        record["size_mb"] = round(os.path.getsize(path) / 1024 / 1024, 3)
+        print(f"  {'':<18} 文件大小 {record['size_mb']:.3f}MB")
+        results.append(record)
+        record, _ = measure(f"read_{fmt}", size, read, track_memory)
+        results.append(record)
+    return results
+
+def compare(current: list, baseline_file: str):
+    """打印与基线结果的耗时对比"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(r["size"], r["stage"]): r for r in baseline["results"]}
+
+    print(f"\n📊 与基线对比 ({baseline.get('git_commit')} @ {baseline.get('timestamp')}):")
+    for record in current:
+        old = previous.get((record["size"], record["stage"]))
+        if not old or not old["wall_seconds"]:
+            continue
+        change = (record["wall_seconds"] - old["wall_seconds"]) / old["wall_seconds"] * 100
+        marker = "⚠️ " if change > 20 else "  "
+        print(f"{marker}{record['size']:>8} {record['stage']:<18} {old['wall_seconds']:>9.3f}s -> "
+              f"{record['wall_seconds']:>9.3f}s ({change:+.1f}%)")
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="PR数据流水线基准测试")
+    arg_parser.add_argument("--sizes", default="1000,10000,100000",
+                            help="逗号分隔的数据规模，例如 1000,10000,100000,1000000")
+    arg_parser.add_argument("--seed", type=int, default=42, help="合成数据随机种子")
+    arg_parser.add_argument("--no-memory", action="store_true", help="不测量峰值内存（tracemalloc会让每个阶段多执行一次）")
+    arg_parser.add_argument("--output", help="结果JSON路径，默认写入 benchmarks/results/")
+    arg_parser.add_argument("--compare", help="与之前保存的结果JSON对比")
+    args = arg_parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    commit = _git_commit()
+    results = []
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in sizes:
+            results.extend(run_size(size, args.seed, not args.no_memory, work_dir))
+
+    report = {
+        "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "results": results,
+    }
+
+    output_file = args.output
+    if not output_file:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_file = os.path.join(RESULTS_DIR, f"bench_{commit}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 基准测试结果已保存: {output_file}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
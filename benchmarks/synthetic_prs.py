@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+合成PR数据生成器
+功能：按固定随机种子生成与Gitcode API字段结构一致的PR对象（标签组合、时间分布参照真实仓库），
+用于基准测试和离线压测
+"""
+
+import hashlib
+import random
+from datetime import datetime, timedelta, timezone
+
+# Gitcode时间戳使用北京时间
+_TZ = timezone(timedelta(hours=8))
+
+_TARGET_BRANCHES = [('master', 0.5), ('main', 0.32), ('release/3.2.x', 0.18)]
+_STATES = [('merged', 0.6), ('closed', 0.2), ('open', 0.2)]
+_TITLE_PREFIXES = ['fix', 'feat', 'refactor', 'test', 'docs', 'perf', 'chore']
+_TITLE_SCOPES = ['runtime', 'compiler', 'kernel', 'makefile', 'ci', 'memory', 'launcher', 'tests']
+
+def _weighted(rng: random.Random, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+def _fmt(dt: datetime) -> str:
+    return dt.astimezone(_TZ).strftime('%Y-%m-%dT%H:%M:%S+08:00')
+
+def _sha(rng: random.Random) -> str:
+    return hashlib.sha1(str(rng.random()).encode()).hexdigest()
+
+def _label(name: str, label_id: int, repository_id: int) -> dict:
+    return {"id": label_id, "color": "#29e047", "name": name, "title": name, "repository_id": repository_id}
+
+def _labels(rng: random.Random, state: str, repository_id: int) -> list:
+    """按真实仓库中的比例生成标签组合，约6%带sc-fail、约3%带ci-pipeline-failed"""
+    names = ['ascend-cla/yes' if rng.random() < 0.96 else 'ascend-cla/no']
+    ci = rng.random()
+    if state == 'open' and ci < 0.3:
+        names.append('ci-pipeline-running')
+    elif ci < 0.03:
+        names.append('ci-pipeline-failed')
+    else:
+        names.append('ci-pipeline-passed')
+    sc = rng.random()
+    names.append('SC-FAIL' if sc < 0.06 else 'SC-RUNNING' if sc < 0.08 else 'SC-SUCC')
+    if state == 'merged' or rng.random() < 0.2:
+        names.extend(['lgtm', 'approved'])
+    if rng.random() < 0.18:
+        names.append('stat/needs-squash')
+    return [_label(name, 1000 + i, repository_id) for i, name in enumerate(names)]
+
+def _user(login: str) -> dict:
+    return {
+        "id": hashlib.md5(login.encode()).hexdigest()[:24],
+        "login": login,
+        "name": login,
+        "state": "active",
+        "email": "",
+        "name_cn": "",
+        "html_url": f"https://gitcode.com/{login}",
+    }
+
+def _branch_ref(branch: str, sha: str, user: dict, full_name: str) -> dict:
+    return {
+        "label": branch,
+        "ref": branch,
+        "sha": sha,
+        "user": user,
+        "repo": {
+            "full_path": full_name,
+            "full_name": full_name,
+            "name": full_name.split('/')[-1],
+            "path": full_name.split('/')[-1],
+            "owner": user,
+        },
+    }
+
+def generate_prs(count: int, seed: int = 42, now: datetime = None, span_days: int = None,
+                 owner: str = "Ascend", repo: str = "triton-ascend", authors: int = 60) -> list:
+    """
+    生成count个PR，按编号倒序（与API默认的创建时间倒序一致）
+
+    创建时间分布在最近span_days天内（默认按每天约6个PR推算），工作日和工作时间更密集；
+    合入/关闭时长服从对数正态分布（中位数约1天），越新的PR越可能仍处于open状态
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc)
+    span_days = span_days or max(14, count // 6)
+    repository_id = 7623225
+    full_name = f"{owner}/{repo}"
+    logins = [f"dev-{i:03d}" for i in range(authors)]
+    # 少数作者贡献大部分PR
+    author_weights = [1 / (i + 1) for i in range(authors)]
+
+    # 生成按时间升序的创建时间，再按编号倒序输出
+    created_times = []
+    while len(created_times) < count:
+        created = now - timedelta(seconds=rng.random() * span_days * 86400)
+        local = created.astimezone(_TZ)
+        weight = (0.3 if local.weekday() >= 5 else 1.0) * (1.0 if 9 <= local.hour < 22 else 0.25)
+        if rng.random() < weight:
+            created_times.append(created)
+    created_times.sort()
+
+    prs = []
+    for index, created in enumerate(created_times):
+        number = index + 1
+        age_days = (now - created).total_seconds() / 86400
+        state = 'open' if age_days < 2 and rng.random() < 0.6 else _weighted(rng, _STATES)
+        duration = timedelta(days=min(rng.lognormvariate(0, 1.3), 120))
+
+        merged_at = closed_at = ''
+        updated = created + timedelta(minutes=rng.randint(1, 600))
+        if state != 'open':
+            finished = min(created + duration, now)
+            closed_at = _fmt(finished)
+            if state == 'merged':
+                merged_at = closed_at
+            updated = finished + timedelta(seconds=1)
+        updated = min(updated, now)
+
+        login = rng.choices(logins, weights=author_weights)[0]
+        user = _user(login)
+        target_branch = _weighted(rng, _TARGET_BRANCHES)
+        source_branch = f"{target_branch.split('/')[0]}/{rng.choice(_TITLE_SCOPES)}-{number}"
+        title = f"{rng.choice(_TITLE_PREFIXES)}({rng.choice(_TITLE_SCOPES)}): synthetic change #{number}"
+        base_sha, head_sha = _sha(rng), _sha(rng)
+        html_url = f"https://gitcode.com/{full_name}/merge_requests/{number}"
+
+        prs.append({
+            "number": number,
+            "html_url": html_url,
+            "url": f"https://gitcode.com/api/v5/repos/{full_name}/pulls/{number}",
+            "close_related_issue": 0,
+            "prune_branch": False,
+            "draft": False,
+            "labels": _labels(rng, state, repository_id),
+            "user": user,
+            "assignees": [],
+            "testers": [],
+            "head": _branch_ref(source_branch, head_sha, user, f"{login}/{repo}"),
+            "base": _branch_ref(target_branch, base_sha, _user(owner.lower()), full_name),
+            "id": 8000000 + number,
+            "iid": number,
+            "project_id": repository_id,
+            "title": title,
+            "body": f"Synthetic pull request {number} for benchmarking.\n\n" + "detail " * rng.randint(5, 80),
+            "state": state,
+            "assignees_number": 0,
+            "testers_number": 0,
+            "created_at": _fmt(created),
+            "updated_at": _fmt(updated),
+            "merged_at": merged_at,
+            "closed_at": closed_at,
+            "target_branch": target_branch,
+            "source_branch": source_branch,
+            "source_project_id": 7600000 + number % 1000,
+            "force_remove_source_branch": False,
+            "web_url": html_url,
+            "merge_request_type": "MergeRequest",
+            "added_lines": rng.randint(1, 2000),
+            "removed_lines": rng.randint(0, 800),
+            "diff_refs": {"base_sha": base_sha, "head_sha": head_sha, "start_sha": base_sha},
+            "notes": rng.randint(0, 40),
+            "source_git_url": f"git@gitcode.com:{login}/{repo}.git",
+            "can_merge_check": state == 'open',
+            "mergeable": state != 'closed',
+            "locked": False,
+        })
+
+    prs.reverse()
+    return prs
+
+def generate_pr_details(pr: dict, seed: int = 42, now: datetime = None) -> dict:
+    """
+    为一个合成PR生成确定性的评论和操作日志（同一PR多次生成结果相同），用于模拟服务器的PR详情接口
+
+    约85%的PR有人工评审（首次评审时延服从对数正态分布，中位数约3小时），机器人评论不计为评审；
+    当前带失败标签的PR和约10%的其他PR有失败标签的添加记录，已不带失败标签的在数小时后移除
+    """
+    rng = random.Random(f"{seed}:{pr['number']}")
+    now = now or datetime.now(timezone.utc)
+    created = datetime.fromisoformat(pr['created_at'])
+    finished = datetime.fromisoformat(pr['closed_at']) if pr.get('closed_at') else now
+    robot = _user('ascend-robot')
+    author = pr['user']['login']
+
+    def at(hours: float) -> str:
+        return _fmt(min(created + timedelta(hours=hours), finished, now))
+
+    comments = [{"id": pr['number'] * 100, "body": "CLA signature check passed", "user": robot,
+                 "created_at": at(0.01)}]
+    if rng.random() < 0.85:
+        first_review = rng.lognormvariate(1.1, 1.2)
+        for i in range(rng.randint(1, 6)):
+            reviewer = _user(f"dev-{rng.randrange(60):03d}")
+            if reviewer['login'] == author:
+                reviewer = _user('maintainer-000')
+            comments.append({"id": pr['number'] * 100 + i + 1, "body": "review comment", "user": reviewer,
+                             "created_at": at(first_review * (1 + i))})
+
+    label_names = [label['name'].lower() for label in pr.get('labels', [])]
+    failing_now = any('sc-fail' in name or 'ci-pipeline-failed' in name for name in label_names)
+    operate_logs = []
+    if failing_now or rng.random() < 0.1:
+        operate_logs.append({"id": pr['number'] * 100, "action_type": "label", "user": robot,
+                             "content": "add label ci-pipeline-failed", "created_at": at(0.2)})
+        if not failing_now:
+            operate_logs.append({"id": pr['number'] * 100 + 1, "action_type": "label", "user": robot,
+                                 "content": "remove label ci-pipeline-failed",
+                                 "created_at": at(0.2 + rng.lognormvariate(1.5, 0.8))})
+    if pr['state'] == 'merged':
+        operate_logs.append({"id": pr['number'] * 100 + 2, "action_type": "review", "user": _user('maintainer-000'),
+                             "content": "approve pull request", "created_at": at(1e6)})
+    return {"comments": comments, "operate_logs": operate_logs}
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+列式PR分析后端
+功能：把PR列表一次性转换为NumPy列（整列解析的datetime64时间、整数状态码、标签类别位集合），
+窗口过滤、时长计算、最值/均值与按天计数全部向量化完成，返回结构与 monitor.analyze_pr_data 一致
+"""
+
+from datetime import datetime, timedelta, timezone
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖
+    np = None
+
+from quantile_sketch import DDSketch
+from timeutil import parse_timestamp
+
+# 状态码
+STATE_CODES = {'open': 0, 'merged': 1, 'closed': 2}
+STATE_OTHER = 3
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_US_PER_DAY = 24 * 3600 * 1000000
+
+def is_available() -> bool:
+    """numpy是否可用"""
+    return np is not None
+
+def _to_us(timestamp):
+    """解析时间字符串，返回 (UTC微秒时间戳, 时区偏移微秒)，为空或无法解析时返回None"""
+    if not timestamp:
+        return None
+    try:
+        parsed = parse_timestamp(timestamp)
+    except (ValueError, TypeError, OverflowError):
+        return None
+    offset = parsed.utcoffset() or timedelta(0)
+    return (parsed - _EPOCH) // timedelta(microseconds=1), offset // timedelta(microseconds=1)
+
+def _parse_column(values: list) -> tuple:
+    """
+    把一列时间字符串解析为 (UTC微秒时间戳, 时区偏移微秒, 是否有效) 三个数组
+
+    YYYY-MM-DDTHH:MM:SS加时区后缀（''、'Z'、'±HH:MM'）的标准形式在字符码上校验格式、计算偏移，
+    本地时间部分整列交给numpy解析；其他形式（小数秒等）逐个回退到parse_timestamp，为空或无法解析时记为无效
+    """
+    # 定宽26个字符：标准形式最长25个字符，更长的字符串第26个字符非空，按非标准形式处理
+    text = np.array([value or '' for value in values], dtype='U26')
+    codes = text.view(np.uint32).reshape(len(text), 26).astype('int64')
+
+    def char(column, value):
+        return codes[:, column] == ord(value)
+
+    digits = codes[:, [20, 21, 23, 24]] - ord('0')
+    signed = ((char(19, '+') | char(19, '-')) & char(22, ':') & (codes[:, 25] == 0)
+              & ((digits >= 0) & (digits <= 9)).all(axis=1))
+    regular = (char(4, '-') & char(7, '-') & char(10, 'T') & char(13, ':') & char(16, ':')
+               & ((codes[:, 19] == 0) | (char(19, 'Z') & (codes[:, 20] == 0)) | signed))
+
+    hours, minutes = digits[:, 0] * 10 + digits[:, 1], digits[:, 2] * 10 + digits[:, 3]
+    offset_seconds = np.where(signed, hours * 3600 + minutes * 60, 0)
+    offset_seconds = np.where(char(19, '-'), -offset_seconds, offset_seconds)
+
+    heads = text.astype('U19')
+    heads[~regular] = 'NaT'
+    try:
+        local = heads.astype('datetime64[s]')
+    except ValueError:
+        # 日期字段越界等情况，整列逐个解析
+        regular[:] = False
+        local = np.full(len(text), np.datetime64('NaT'), dtype='datetime64[s]')
+
+    ok = regular.copy()
+    timestamps = np.where(ok, local.astype('int64') - offset_seconds, 0) * 1000000
+    offset_us = np.where(ok, offset_seconds, 0) * 1000000
+    for i in np.flatnonzero(~regular & (codes[:, 0] != 0)).tolist():
+        parsed = _to_us(values[i])
+        if parsed is not None:
+            timestamps[i], offset_us[i] = parsed
+            ok[i] = True
+    return timestamps, offset_us, ok
+
+def _category_column(pr_list: list, classifier) -> list:
+    """每个PR的类别位集合；精简记录的标签为元组，相同的标签组合只分类一次"""
+    cache = {}
+    masks = []
+    for pr in pr_list:
+        labels = pr['labels'] if 'labels' in pr else ()
+        if isinstance(labels, tuple):
+            mask = cache.get(labels)
+            if mask is None:
+                mask = cache[labels] = classifier.classify(labels)
+        else:
+            mask = classifier.classify(labels)
+        masks.append(mask)
+    return masks
+
+def build_pr_columns(pr_list: list, is_failed=None, classifier=None, since: datetime = None) -> dict:
+    """
+    把PR列表转换为列式数组：每个时间字段整列解析，标签按组合分类
+
+    classifier为标签分类器（默认为label_rules.get_classifier()）；is_failed为判断失败PR的函数，
+    默认由类别位集合中的failed位得到。
+    since不为None时只对待合入或since之后创建的PR解析合入/关闭时间并分类标签，其余PR的这些列记为无效或0
+    （与单遍分析器按需解析的口径一致，统计只用到这些PR的这些列）
+    """
+    from label_rules import FAILED, get_classifier
+
+    classifier = classifier or get_classifier()
+    failed_bit = classifier.bits.get(FAILED, 0)
+
+    created, created_offset, created_ok = _parse_column([pr['created_at'] for pr in pr_list])
+    state = np.array([STATE_CODES.get(pr['state'], STATE_OTHER) for pr in pr_list], dtype='int8')
+
+    if since is None:
+        needed = list(range(len(pr_list)))
+    else:
+        since_us = (since - _EPOCH) // timedelta(microseconds=1)
+        needed = np.flatnonzero((state == STATE_CODES['open']) | (created_ok & (created >= since_us))).tolist()
+    needed_prs = [pr_list[i] for i in needed]
+
+    merged, merged_ok = np.zeros(len(pr_list), dtype='int64'), np.zeros(len(pr_list), dtype=bool)
+    merged[needed], _, merged_ok[needed] = _parse_column([pr['merged_at'] for pr in needed_prs])
+    closed, closed_ok = np.zeros(len(pr_list), dtype='int64'), np.zeros(len(pr_list), dtype=bool)
+    closed[needed], _, closed_ok[needed] = _parse_column([pr.get('closed_at') for pr in needed_prs])
+
+    categories = np.zeros(len(pr_list), dtype='int64')
+    categories[needed] = _category_column(needed_prs, classifier)
+    if is_failed is not None:
+        failed = np.zeros(len(pr_list), dtype=bool)
+        failed[needed] = [bool(is_failed(pr)) for pr in needed_prs]
+    else:
+        failed = (categories & failed_bit) != 0
+
+    return {
+        "created": created.astype('datetime64[us]'),
+        "created_offset": created_offset.astype('timedelta64[us]'),
+        "created_ok": created_ok,
+        "merged": merged.astype('datetime64[us]'),
+        "merged_ok": merged_ok,
+        "closed": closed.astype('datetime64[us]'),
+        "closed_ok": closed_ok,
+        "state": state,
+        "failed": failed,
+        "categories": categories,
+        "category_names": list(classifier.categories),
+    }
+
+def _duration_days(delta_us):
+    """与 timedelta.days + timedelta.seconds / 86400 相同的口径（忽略微秒）"""
+    days = delta_us // _US_PER_DAY
+    seconds = (delta_us - days * _US_PER_DAY) // 1000000
+    return days + seconds / (24 * 3600)
+
+def analyze_columns(columns: dict, pr_list: list, now: datetime = None) -> dict:
+    """
+    基于列式数组计算分析结果，pr_list用于取回窗口内PR的编号和详情字段
+    """
+    from monitor import DURATION_WINDOWS, PR_DETAILS_LIMIT, summarize_duration_sketches, summarize_label_categories
+
+    now = now or datetime.now(timezone.utc)
+    now_us = np.datetime64((now - _EPOCH) // timedelta(microseconds=1), 'us')
+    seven_days_ago = now_us - np.timedelta64(7 * _US_PER_DAY, 'us')
+    fourteen_days_ago = now_us - np.timedelta64(14 * _US_PER_DAY, 'us')
+
+    created = columns["created"]
+    created_ok = columns["created_ok"]
+
+    # 待合入PR数量
+    open_pr_count = int(np.count_nonzero(columns["state"] == STATE_CODES['open']))
+
+    # 近七天提交的PR
+    recent_mask = created_ok & (created >= seven_days_ago)
+    recent_submitted_prs = [pr_list[i]['number'] for i in np.flatnonzero(recent_mask)]
+
+    # 近七天已合入的PR的合入时长分析
+    merged_mask = recent_mask & (columns["state"] == STATE_CODES['merged']) & columns["merged_ok"]
+    merged_idx = np.flatnonzero(merged_mask)
+    durations = _duration_days((columns["merged"][merged_idx] - created[merged_idx]).astype('int64'))
+
+    recent_merged_prs_analysis = {
+        "count": int(len(merged_idx)),
+        "total_duration_days": 0,
+        "average_duration_days": 0,
+        "min_duration_days": None,
+        "max_duration_days": None,
+        "pr_details": []
+    }
+    if len(merged_idx):
+        # 累加顺序与逐个PR累加保持一致
+        total = float(np.cumsum(durations)[-1])
+        recent_merged_prs_analysis.update({
+            "total_duration_days": total,
+            "average_duration_days": round(total / len(merged_idx), 2),
+            "min_duration_days": float(durations.min()),
+            "max_duration_days": float(durations.max()),
+        })
+        for i, duration_days in zip(merged_idx[:PR_DETAILS_LIMIT], durations[:PR_DETAILS_LIMIT].tolist()):
+            pr = pr_list[i]
+            recent_merged_prs_analysis["pr_details"].append({
+                "number": pr['number'],
+                "title": pr['title'],
+                "created_at": pr['created_at'],
+                "merged_at": pr['merged_at'],
+                "duration_days": round(duration_days, 2),
+                "duration_hours": round(duration_days * 24, 2)
+            })
+
+    # 各窗口的合入/关闭时长草图
+    state = columns["state"]
+    merge_mask = created_ok & (state == STATE_CODES['merged']) & columns["merged_ok"]
+    close_mask = created_ok & (state == STATE_CODES['closed']) & columns["closed_ok"]
+    duration_sketches = {}
+    for days in DURATION_WINDOWS:
+        in_window = created >= now_us - np.timedelta64(days * _US_PER_DAY, 'us')
+        duration_sketches[days] = {}
+        for kind, mask, end in (("merge", merge_mask, columns["merged"]), ("close", close_mask, columns["closed"])):
+            idx = np.flatnonzero(mask & in_window)
+            sketch = DDSketch()
+            for value in _duration_days((end[idx] - created[idx]).astype('int64')).tolist():
+                sketch.add(value)
+            duration_sketches[days][kind] = sketch
+
+    # 标签类别：open中的数量、各窗口内创建的数量
+    open_mask = state == STATE_CODES['open']
+    category_names = columns["category_names"]
+    has_category = [(columns["categories"] >> i) & 1 == 1 for i in range(len(category_names))]
+    category_open = [np.count_nonzero(has & open_mask) for has in has_category]
+    category_created = {}
+    for days in DURATION_WINDOWS:
+        in_window = created_ok & (created >= now_us - np.timedelta64(days * _US_PER_DAY, 'us'))
+        category_created[days] = [np.count_nonzero(has & in_window) for has in has_category]
+
+    # 近两周PR每日提交次数统计（按PR自身时区的日期分桶）
+    daily_mask = created_ok & (created >= fourteen_days_ago)
+    local_days = ((created[daily_mask] + columns["created_offset"][daily_mask]).astype('int64')) // _US_PER_DAY
+    daily_submissions = {}
+    daily_failed_submissions = {}
+    if len(local_days):
+        base_day = int(local_days.min())
+        offsets = local_days - base_day
+        totals = np.bincount(offsets)
+        failures = np.bincount(offsets, weights=columns["failed"][daily_mask].astype('int64'))
+        # 按首次出现的顺序输出日期，与逐个PR统计时的字典顺序一致
+        unique_offsets, first_index = np.unique(offsets, return_index=True)
+        for offset in unique_offsets[np.argsort(first_index)].tolist():
+            date_key = (_EPOCH + timedelta(days=base_day + offset)).strftime('%Y-%m-%d')
+            daily_submissions[date_key] = int(totals[offset])
+            daily_failed_submissions[date_key] = int(failures[offset])
+
+    return {
+        "total_open_prs": open_pr_count,
+        "recent_submitted_prs": recent_submitted_prs,
+        "recent_merged_prs_analysis": recent_merged_prs_analysis,
+        "daily_submissions": daily_submissions,
+        "daily_failed_submissions": daily_failed_submissions,
+        **summarize_duration_sketches(duration_sketches),
+        "label_categories": summarize_label_categories(category_names, category_open, category_created)
+    }
+
+def analyze_pr_data_columnar(pr_list: list, now: datetime = None) -> dict:
+    """
+    列式后端入口：转换一次列数组后完成全部统计
+    """
+    from monitor import DURATION_WINDOWS
+
+    now = now or datetime.now(timezone.utc)
+    since = now - timedelta(days=max(DURATION_WINDOWS + (14,)))
+    return analyze_columns(build_pr_columns(pr_list, since=since), pr_list, now)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+每日计数前缀和索引
+功能：覆盖全部历史的逐日PR计数（提交、合入、关闭、失败），以累计前缀和保存，
+任意时间窗口的总数和移动平均都是O(1)查询，看板无需再遍历PR或逐个解析日期字符串
+"""
+
+from datetime import date, datetime, timedelta
+
+from label_rules import is_failed_pr
+from timeutil import parse_timestamp
+
+# 计数序列
+SERIES = ('submitted', 'merged', 'closed', 'failed')
+
+def _local_date(timestamp):
+    """时间字符串在其自身时区下的日期（与daily_submissions的分桶口径一致），无法解析时返回None"""
+    if not timestamp:
+        return None
+    try:
+        return parse_timestamp(timestamp).date()
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+class DailyCountIndex:
+    """
+    从start_date开始的逐日累计计数：prefix[series][i] 为 start_date 之前 i 天内的累计数量
+
+    covered_since为计数完整的第一天：本地存储只保证此后的PR完整（更早的日期只含恰好入库的PR），
+    为None时表示整个索引范围都完整
+    """
+    def __init__(self, start_date: date, prefix: dict, covered_since: date = None):
+        self.start_date = start_date
+        self.prefix = prefix
+        self.days = len(prefix[SERIES[0]]) - 1
+        self.covered_since = covered_since
+
+    @classmethod
+    def build(cls, prs, is_failed=None, covered_since: date = None) -> 'DailyCountIndex':
+        """
+        遍历一次PR，按日期统计各序列并计算前缀和
+
+        提交和失败按created_at，合入按merged_at，关闭（未合入）按closed_at分桶；
+        is_failed默认使用 label_rules.is_failed_pr；covered_since见类说明
+        """
+        is_failed = is_failed or is_failed_pr
+
+        events = {series: {} for series in SERIES}
+
+        def count(series, day):
+            if day is not None:
+                events[series][day] = events[series].get(day, 0) + 1
+
+        for pr in prs:
+            created_day = _local_date(pr['created_at'])
+            count('submitted', created_day)
+            if created_day is not None and is_failed(pr):
+                count('failed', created_day)
+            if pr['state'] == 'merged':
+                count('merged', _local_date(pr['merged_at']))
+            elif pr['state'] == 'closed':
+                count('closed', _local_date(pr.get('closed_at')))
+
+        all_days = [day for counts in events.values() for day in counts]
+        if not all_days:
+            today = datetime.now().date()
+            return cls(today, {series: [0] for series in SERIES}, covered_since)
+
+        start_date, end_date = min(all_days), max(all_days)
+        days = (end_date - start_date).days + 1
+        prefix = {}
+        for series in SERIES:
+            counts = events[series]
+            running = 0
+            cumulative = [0]
+            for offset in range(days):
+                running += counts.get(start_date + timedelta(days=offset), 0)
+                cumulative.append(running)
+            prefix[series] = cumulative
+        return cls(start_date, prefix, covered_since)
+
+    @property
+    def end_date(self) -> date:
+        """索引覆盖的最后一天"""
+        return self.start_date + timedelta(days=self.days - 1)
+
+    def _offset(self, day: date) -> int:
+        """day之前（不含day）的累计位置，超出索引范围时截断"""
+        return min(max((day - self.start_date).days, 0), self.days)
+
+    def total(self, series: str, start: date, end: date) -> int:
+        """start到end（均包含）之间的数量"""
+        if end < start:
+            return 0
+        cumulative = self.prefix[series]
+        return cumulative[self._offset(end + timedelta(days=1))] - cumulative[self._offset(start)]
+
+    def covers(self, days: int, end: date = None) -> bool:
+        """截至end（默认今天）的最近days天是否都在计数完整的范围内"""
+        end = end or datetime.now().date()
+        return self.covered_since is None or end - timedelta(days=days - 1) >= self.covered_since
+
+    def window_total(self, series: str, days: int, end: date = None) -> int:
+        """截至end（默认今天）的最近days天的数量"""
+        end = end or datetime.now().date()
+        return self.total(series, end - timedelta(days=days - 1), end)
+
+    def moving_average(self, series: str, days: int, end: date = None) -> float:
+        """截至end（默认今天）的最近days天的日均数量"""
+        return self.window_total(series, days, end) / days if days > 0 else 0.0
+
+    def daily_counts(self, series: str, start: date, end: date) -> list:
+        """start到end（均包含）的逐日数量"""
+        return [self.total(series, start + timedelta(days=offset), start + timedelta(days=offset))
+                for offset in range((end - start).days + 1)]
+
+    def to_dict(self) -> dict:
+        """序列化为可写入JSON的字典"""
+        return {
+            "start_date": self.start_date.strftime('%Y-%m-%d'),
+            "covered_since": self.covered_since.strftime('%Y-%m-%d') if self.covered_since else None,
+            "prefix_sums": self.prefix,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'DailyCountIndex':
+        """从to_dict()的结果恢复索引"""
+        covered_since = data.get("covered_since")
+        return cls(datetime.strptime(data["start_date"], '%Y-%m-%d').date(), data["prefix_sums"],
+                   datetime.strptime(covered_since, '%Y-%m-%d').date() if covered_since else None)
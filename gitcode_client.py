@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Gitcode API客户端
+功能：复用HTTP连接池、协商压缩，并以磁盘缓存配合ETag/Last-Modified条件请求，
+使未变化的页面只需一次304响应
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 不参与缓存键计算的参数（避免令牌落盘，也保证更换令牌后缓存仍可用）
+_UNCACHED_PARAMS = {'access_token'}
+
+# 每次同步都会变化的参数（增量同步游标）：不参与缓存键计算，同一接口同一页只保留一个缓存条目；
+# 这些参数与缓存条目不一致时只按ETag条件请求（ETag标识响应内容本身），不使用If-Modified-Since
+_VOLATILE_PARAMS = {'since'}
+
+# 超过该天数未使用的缓存文件在客户端创建时清理
+DEFAULT_CACHE_MAX_AGE_DAYS = 30
+
+class GitcodeClient:
+    """
+    可在多个接口、多个线程之间共享的Gitcode API客户端
+    """
+    def __init__(self, cache_dir: str = None, pool_size: int = 10, timeout: float = 30,
+                 cache_max_age_days: float = DEFAULT_CACHE_MAX_AGE_DAYS):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+        })
+
+        self.stats = {'requests': 0, 'not_modified': 0, 'bytes_received': 0}
+        self._stats_lock = threading.Lock()
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            if cache_max_age_days:
+                self._prune_cache(cache_max_age_days)
+
+    def _prune_cache(self, max_age_days: float):
+        """删除超过max_age_days天未使用（写入或命中）的缓存文件"""
+        cutoff = time.time() - max_age_days * 86400
+        for entry in os.scandir(self.cache_dir):
+            try:
+                if entry.name.endswith('.json') and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                continue
+
+    def _cache_path(self, url: str, params: dict) -> str:
+        """根据URL和查询参数（不含令牌和同步游标）计算缓存文件路径"""
+        key_params = {k: v for k, v in (params or {}).items() if k not in _UNCACHED_PARAMS | _VOLATILE_PARAMS}
+        key = url + '?' + json.dumps(key_params, sort_keys=True, default=str)
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+    @staticmethod
+    def _volatile(params: dict) -> dict:
+        return {k: str(v) for k, v in (params or {}).items() if k in _VOLATILE_PARAMS}
+
+    def _load_cache(self, path: str):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_cache(self, path: str, entry: dict):
+        # 先写临时文件再替换，避免并发写入时读到半个文件
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"警告：写入API缓存失败: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _record(self, response: requests.Response):
+        with self._stats_lock:
+            self.stats['requests'] += 1
+            if response.status_code == 304:
+                self.stats['not_modified'] += 1
+            self.stats['bytes_received'] += len(response.content or b'')
+
+    def get_json(self, url: str, params: dict = None, on_response=None):
+        """
+        发送GET请求并返回解析后的JSON
+
+        命中缓存时携带If-None-Match/If-Modified-Since进行条件请求，服务端返回304时直接使用缓存内容；
+        HTTP错误以requests.exceptions.HTTPError抛出，可通过异常的response属性获取状态码和响应头。
+        on_response在每个响应（包括错误响应）返回后以response为参数回调，用于读取限流响应头
+        """
+        cache_path = self._cache_path(url, params) if self.cache_dir else None
+        cached = self._load_cache(cache_path) if cache_path else None
+
+        headers = {}
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            # If-Modified-Since只说明资源未变化，查询参数不同的响应内容可能不同
+            if cached.get('last_modified') and cached.get('volatile', {}) == self._volatile(params):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+        self._record(response)
+        if on_response:
+            on_response(response)
+
+        if response.status_code == 304 and cached:
+            try:
+                # 记录使用时间，避免常用条目被按时间清理
+                os.utime(cache_path)
+            except OSError:
+                pass
+            return cached['body']
+
+        response.raise_for_status()
+        body = response.json()
+
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if cache_path and (etag or last_modified):
+            self._save_cache(cache_path, {'etag': etag, 'last_modified': last_modified,
+                                          'volatile': self._volatile(params), 'body': body})
+
+        return body
+
+    def close(self):
+        self.session.close()
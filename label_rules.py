@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+标签分类规则
+功能：从配置读取 {类别: [规则]} 形式的标签规则（exact精确匹配、prefix前缀匹配、regex正则搜索，均不区分大小写），
+一次性编译为匹配器：精确规则合并为一张字典，每个类别的前缀合并为一个元组、正则合并为一个正则。
+标签名首次出现时分配整数ID并计算其类别掩码，之后同名标签只需一次字典查找；
+PR的类别为各标签掩码按位或得到的位集合，分析时一遍即可统计任意数量的类别
+"""
+
+import json
+import os
+import re
+import threading
+
+# 失败PR的类别名（is_failed_pr、每日失败数等统计使用）
+FAILED = "failed"
+
+# 默认规则：与原先的失败判断一致（标签名包含sc-fail或ci-pipeline-failed）
+DEFAULT_LABEL_RULES = {
+    FAILED: [{"regex": "sc-fail"}, {"regex": "ci-pipeline-failed"}],
+}
+
+RULE_TYPES = ('exact', 'prefix', 'regex')
+
+def load_label_rules(config: dict = None) -> dict:
+    """
+    读取标签规则：默认规则，被配置文件中的label_rules和环境变量LABEL_RULES（JSON）中的同名类别依次覆盖
+    """
+    rules = dict(DEFAULT_LABEL_RULES)
+    rules.update((config or {}).get("label_rules") or {})
+    if os.environ.get("LABEL_RULES"):
+        rules.update(json.loads(os.environ["LABEL_RULES"]))
+    return rules
+
+class LabelClassifier:
+    """
+    编译后的标签规则
+
+    categories为类别名列表，第i个类别对应掩码的第i位；names/masks按标签ID保存标签名和类别掩码
+    """
+    def __init__(self, rules: dict):
+        self.rules = rules
+        self.categories = list(rules)
+        self.bits = {category: 1 << i for i, category in enumerate(self.categories)}
+        self._exact = {}
+        self._prefixes = []
+        self._patterns = []
+        for category, category_rules in rules.items():
+            bit = self.bits[category]
+            prefixes, patterns = [], []
+            for rule in category_rules:
+                if not isinstance(rule, dict) or len(rule) != 1 or next(iter(rule)) not in RULE_TYPES:
+                    raise ValueError(f"无效的标签规则 {rule!r}（类别 {category}），"
+                                     f"应为 {{\"exact\"|\"prefix\"|\"regex\": \"...\"}}")
+                kind, value = next(iter(rule.items()))
+                if kind == 'exact':
+                    self._exact[value.lower()] = self._exact.get(value.lower(), 0) | bit
+                elif kind == 'prefix':
+                    prefixes.append(value.lower())
+                else:
+                    try:
+                        re.compile(value)
+                    except re.error as e:
+                        raise ValueError(f"无效的标签正则 {value!r}（类别 {category}）: {e}") from e
+                    patterns.append(f"(?:{value})")
+            if prefixes:
+                self._prefixes.append((tuple(prefixes), bit))
+            if patterns:
+                self._patterns.append((re.compile('|'.join(patterns), re.IGNORECASE), bit))
+
+        self._ids = {}
+        self.names = []
+        self.masks = []
+        # 看板刷新线程与webhook线程可能同时遇到新标签
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict = None) -> 'LabelClassifier':
+        return cls(load_label_rules(config))
+
+    def match(self, name: str) -> int:
+        """按规则计算任意文本的类别掩码，不分配标签ID（用于操作日志等自由文本）"""
+        lowered = name.lower()
+        mask = self._exact.get(lowered, 0)
+        for prefixes, bit in self._prefixes:
+            if lowered.startswith(prefixes):
+                mask |= bit
+        for pattern, bit in self._patterns:
+            if pattern.search(lowered):
+                mask |= bit
+        return mask
+
+    def label_id(self, name: str) -> int:
+        """标签名对应的整数ID，首次出现时分配ID并计算类别掩码"""
+        label_id = self._ids.get(name)
+        if label_id is None:
+            with self._lock:
+                label_id = self._ids.get(name)
+                if label_id is None:
+                    self.masks.append(self.match(name))
+                    self.names.append(name)
+                    label_id = self._ids[name] = len(self.names) - 1
+        return label_id
+
+    def classify(self, labels) -> int:
+        """一组标签（标签名或API标签字典）的类别位集合"""
+        mask = 0
+        ids, masks = self._ids, self.masks
+        for label in labels or ():
+            if isinstance(label, dict):
+                label = label.get('name')
+            label_id = ids.get(label)
+            if label_id is None:
+                if not isinstance(label, str):
+                    continue
+                label_id = self.label_id(label)
+            mask |= masks[label_id]
+        return mask
+
+    def classify_pr(self, pr) -> int:
+        """PR的类别位集合"""
+        return self.classify(pr['labels'] if 'labels' in pr else ())
+
+    def categories_of(self, mask: int) -> list:
+        """位集合中的类别名"""
+        return [category for category in self.categories if mask & self.bits[category]]
+
+    def is_failed(self, pr) -> bool:
+        return bool(self.classify_pr(pr) & self.bits.get(FAILED, 0))
+
+_default = None
+_default_lock = threading.Lock()
+
+def configure(config: dict = None) -> LabelClassifier:
+    """按配置编译并设置默认的分类器"""
+    global _default
+    classifier = LabelClassifier.from_config(config)
+    with _default_lock:
+        _default = classifier
+    return classifier
+
+def get_classifier() -> LabelClassifier:
+    """默认的分类器，尚未配置时按配置文件（repos.json）编译"""
+    if _default is None:
+        from repo_config import load_config
+        return configure(load_config())
+    return _default
+
+def is_failed_pr(pr) -> bool:
+    """判断PR是否为失败PR：标签命中标签规则中的failed类别（默认为名称包含sc-fail或ci-pipeline-failed）"""
+    return get_classifier().is_failed(pr)
@@ -1,290 +1,1074 @@
 import requests
+import itertools
 import json
 import os
+import random
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
-from dateutil import parser
+from email.utils import parsedate_to_datetime
 
-def get_all_pull_requests(owner: str, repo: str, access_token: str, max_retries: int = 3, retry_delay: int = 2, max_pages: int = 5) -> list:
+import columnar_analysis
+from daily_index import DailyCountIndex
+from gitcode_client import GitcodeClient
+from label_rules import FAILED, configure as configure_label_rules, get_classifier
+from pipeline_metrics import PipelineMetrics, parse_profile_modes
+from pr_enrichment import DEFAULT_BOT_PATTERN, DEFAULT_ENRICH_CONCURRENCY, enrich_prs, summarize_review_metrics
+from pr_history import record_history
+from pr_record import parse_extra_fields, project_pr
+from pr_store import PRStore
+from quantile_sketch import DDSketch
+from repo_config import get_output_dir, load_config, repo_path
+from rollup_cube import RollupCube
+from serialization import load_data, resolve_data_file
+from timeutil import parse_timestamp
+
+# 合入/关闭时长分位数统计的时间窗口（天，按PR创建时间）
+DURATION_WINDOWS = (7, 14, 30, 90)
+
+# 分析所需的最大时间窗口（天），窗口外创建且已关闭的PR不参与分析
+ANALYSIS_WINDOW_DAYS = max(14, *DURATION_WINDOWS)
+
+# 合入PR详情最多保留的条数（看板展示前20条）
+PR_DETAILS_LIMIT = 20
+
+# 输出的分位数
+DURATION_QUANTILES = (0.5, 0.75, 0.9, 0.99)
+
+# 重建汇总立方体时每次从存储读取的PR数
+ROLLUP_REBUILD_CHUNK_SIZE = 5000
+
+# Gitcode API地址，可通过环境变量GITCODE_API_BASE指向本地模拟服务器进行离线压测
+DEFAULT_API_BASE = "https://api.gitcode.com"
+
+def get_api_base() -> str:
+    """API地址：优先使用环境变量GITCODE_API_BASE，否则使用DEFAULT_API_BASE"""
+    return os.environ.get("GITCODE_API_BASE", DEFAULT_API_BASE).rstrip('/')
+
+class TokenBucket:
     """
-    获取仓库的所有PR，处理分页
+    令牌桶限流器：多个线程共享同一个每秒请求数预算
     """
-    all_pull_requests = []
-    page = 1
-    per_page = 100  # 每页数量，最大为100
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """获取一个令牌，预算不足时阻塞等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    自适应限流器：在令牌桶基础上根据服务端反馈调整速率
+
+    - 收到429/503时速率减半（decrease_cooldown秒内的连续限流只减速一次），并在Retry-After给出的时间内暂停所有请求
+    - 连续increase_after次成功后速率提高increase_factor倍（不超过max_rate），逐步逼近服务端允许的最大吞吐量；
+      速率不会低于min_rate（默认为初始速率的十分之一）
+    - 响应带有剩余配额和重置时间时，将速率限制在"剩余配额/重置秒数"以内，配额耗尽则暂停到重置时刻
+    """
+    def __init__(self, rate: float, max_rate: float = None, min_rate: float = None, increase_after: int = 5,
+                 increase_factor: float = 1.25, decrease_factor: float = 0.5, decrease_cooldown: float = 2.0):
+        super().__init__(rate)
+        self.max_rate = max(max_rate or rate, rate)
+        self.min_rate = min(min_rate if min_rate is not None else rate / 10, rate)
+        self.increase_after = increase_after
+        self.increase_factor = increase_factor
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.successes = 0
+        self.paused_until = 0.0
+        self.decreased_at = None
+        self.stats = {'throttled': 0, 'increases': 0, 'decreases': 0}
+    
+    def _set_rate(self, rate: float):
+        # 调用方需持有锁
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+        self.capacity = max(1.0, self.rate)
+        self.tokens = min(self.tokens, self.capacity)
     
-    print(f"开始获取仓库 {owner}/{repo} 的PR数据...")
+    def _pause(self, seconds: float):
+        # 调用方需持有锁
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
     
+    def acquire(self):
+        """获取一个令牌；处于限流暂停期时先等待暂停结束"""
+        while True:
+            with self.lock:
+                wait = self.paused_until - time.monotonic()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        super().acquire()
+    
+    def observe(self, response):
+        """根据一次响应的状态码和限流响应头调整速率（由GitcodeClient在每个响应后回调）"""
+        headers = response.headers
+        remaining, reset = parse_rate_limit(headers)
+        with self.lock:
+            if response.status_code in THROTTLE_STATUS_CODES:
+                now = time.monotonic()
+                self.successes = 0
+                self.stats['throttled'] += 1
+                if self.decreased_at is None or now - self.decreased_at >= self.decrease_cooldown:
+                    self.decreased_at = now
+                    self.stats['decreases'] += 1
+                    self._set_rate(self.rate * self.decrease_factor)
+                retry_after = parse_retry_after(headers)
+                if retry_after is not None:
+                    self._pause(retry_after)
+            elif response.status_code < 400:
+                self.successes += 1
+                if self.successes >= self.increase_after and self.rate < self.max_rate:
+                    self.successes = 0
+                    self.stats['increases'] += 1
+                    self._set_rate(self.rate * self.increase_factor)
+            
+            if remaining is not None and reset is not None:
+                if remaining < 1:
+                    self._pause(reset)
+                elif reset > 0 and remaining / reset < self.rate:
+                    # 按剩余配额在重置前均匀分配请求，避免触发限流
+                    self._set_rate(remaining / reset)
+
+# 视为暂时性错误、可重试的HTTP状态码
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# 表示服务端过载、需要降低请求速率的HTTP状态码
+THROTTLE_STATUS_CODES = (429, 503)
+
+# 每页最多等待限流的次数的默认值（限流等待不占用错误重试次数，可用THROTTLE_MAX_RETRIES环境变量调整）
+THROTTLE_MAX_RETRIES = 10
+
+def _header_number(headers, *names):
+    """按顺序读取第一个存在且为数字的响应头"""
+    for name in names:
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return float(value)
+        except ValueError:
+            continue
+    return None
+
+def parse_retry_after(headers):
+    """
+    解析Retry-After响应头（秒数或HTTP日期），返回需要等待的秒数，不存在或无法解析时返回None
+    """
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+def parse_rate_limit(headers) -> tuple:
+    """
+    解析限流配额响应头，返回 (剩余请求数, 距离配额重置的秒数)，不存在的项为None
+
+    兼容 X-RateLimit-* 与 RateLimit-* 两种写法；重置时间大于1e9时视为Unix时间戳，否则视为秒数
+    """
+    remaining = _header_number(headers, 'X-RateLimit-Remaining', 'RateLimit-Remaining')
+    reset = _header_number(headers, 'X-RateLimit-Reset', 'RateLimit-Reset')
+    if reset is not None and reset > 1e9:
+        reset = reset - time.time()
+    if reset is not None:
+        reset = max(reset, 0.0)
+    return remaining, reset
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float = 60.0, retry_after: float = None) -> float:
+    """
+    第attempt次重试（从0开始）前的等待秒数：服务端给出Retry-After时以其为准，
+    否则为带抖动的指数退避（上限的一半固定，另一半随机，避免多个线程同时重试）
+    """
+    if retry_after is not None:
+        return min(retry_after, max_delay)
+    cap = min(max_delay, base_delay * 2 ** attempt)
+    return cap / 2 + random.uniform(0, cap / 2)
+
+def _request_page(client: GitcodeClient, url: str, params: dict, max_retries: int, retry_delay: float, rate_limiter: TokenBucket = None, verbose: bool = True, throttle_max_retries: int = THROTTLE_MAX_RETRIES) -> tuple:
+    """
+    请求单页PR数据，处理认证失败、限流、服务端错误和网络错误
+
+    每页各自拥有max_retries次错误重试机会，重试前按backoff_delay()退避；
+    限流响应（429，或带Retry-After的可重试响应）是服务端要求等待而非请求失败，
+    不占用错误重试次数，单独以throttle_max_retries为上限；
+    rate_limiter为AdaptiveRateLimiter时，每个响应的限流信息都会反馈给它以调整请求速率；
+    verbose为False时不打印逐页进度（用于请求量很大的PR详情获取）
+
+    返回 (本页PR列表, 本页重试次数)
+    """
+    on_response = getattr(rate_limiter, 'observe', None)
+    attempt = 0
+    throttled = 0
     while True:
-        # 构建API请求URL
-        url = f"https://api.gitcode.com/api/v5/repos/{owner}/{repo}/pulls"
-        
-        # 设置查询参数
-        params = {
-            'access_token': access_token,
-            'state': 'all',  # 获取所有状态的PR
-            'page': page,
-            'per_page': per_page
-        }
+        if rate_limiter:
+            rate_limiter.acquire()
         
         try:
-            print(f"正在获取第 {page} 页 (每页 {per_page} 条)...")
-            response = requests.get(url, params=params)
-            response.raise_for_status()  # 检查HTTP错误
-            
-            # 解析JSON响应
-            prs = response.json()
-            
-            # 如果没有更多PR，退出循环
-            if not prs:
-                print(f"已获取所有PR，共 {len(all_pull_requests)} 个")
-                break
-                
-            all_pull_requests.extend(prs)
-            print(f"已获取 {len(prs)} 个PR，总计 {len(all_pull_requests)} 个")
-            
-            # 检查是否还有下一页
-            if len(prs) < per_page:
-                print("已获取所有PR")
-                break
-                
-            # 延迟以避免API限流
-            time.sleep(1)
-            
-            # 检查是否达到最大页数限制
-            if page >= max_pages:
-                print(f"已达到最大页数限制 ({max_pages})，停止获取更多PR")
-                break
+            if verbose:
+                print(f"正在获取第 {params['page']} 页 (每页 {params['per_page']} 条)...")
+            # 检查HTTP错误并解析JSON响应（未变化的页面由客户端缓存返回）
+            return client.get_json(url, params, on_response=on_response), attempt + throttled
             
         except requests.exceptions.HTTPError as http_err:
-            if response.status_code == 401:
+            response = http_err.response
+            status_code = response.status_code if response is not None else None
+            if status_code == 401:
                 print("错误：认证失败。请检查access_token是否正确。")
                 raise
-            elif response.status_code == 429:
-                print(f"错误：API请求过于频繁。正在重试... (剩余重试次数: {max_retries})")
-                if max_retries > 0:
-                    max_retries -= 1
-                    time.sleep(retry_delay)
-                    continue
+            elif status_code in RETRYABLE_STATUS_CODES:
+                retry_after = parse_retry_after(response.headers)
+                if status_code == 429 or retry_after is not None:
+                    if throttled >= throttle_max_retries:
+                        print(f"错误：API限流 ({status_code})，已连续等待 {throttled} 次，放弃本页。")
+                        raise
+                    delay = backoff_delay(throttled, retry_delay, retry_after=retry_after)
+                    throttled += 1
+                    print(f"错误：API请求过于频繁 ({status_code})。{delay:.1f} 秒后重试... "
+                          f"(剩余限流等待次数: {throttle_max_retries - throttled + 1})")
                 else:
-                    print("错误：API限流错误，重试次数已用尽。")
-                    raise
+                    if attempt >= max_retries:
+                        print(f"错误：服务端错误 ({status_code})，重试次数已用尽。")
+                        raise
+                    delay = backoff_delay(attempt, retry_delay)
+                    attempt += 1
+                    print(f"错误：服务端错误 ({status_code})。{delay:.1f} 秒后重试... (剩余重试次数: {max_retries - attempt + 1})")
             else:
                 print(f"HTTP错误: {http_err}")
                 raise
-        except requests.exceptions.ConnectionError:
-            print("错误：网络连接失败。正在重试...")
-            if max_retries > 0:
-                max_retries -= 1
-                time.sleep(retry_delay)
-                continue
-            else:
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt >= max_retries:
                 print("错误：网络连接失败，重试次数已用尽。")
                 raise
+            delay = backoff_delay(attempt, retry_delay)
+            attempt += 1
+            print(f"错误：网络连接失败。{delay:.1f} 秒后重试... (剩余重试次数: {max_retries - attempt + 1})")
         except Exception as e:
             print(f"获取PR时发生错误: {e}")
             raise
         
-        page += 1
+        time.sleep(delay)
+
+def _filter_since(prs: list, since_at: datetime) -> tuple:
+    """
+    按同步游标过滤一页PR，返回 (有更新的PR, 是否已到达游标位置)
+    """
+    if not since_at:
+        return prs, False
     
-    return all_pull_requests
+    # 服务端未必支持since过滤，这里按游标再过滤一次
+    changed_prs = [pr for pr in prs if pr.get('updated_at') and parse_timestamp(pr['updated_at']) >= since_at]
+    return changed_prs, len(changed_prs) < len(prs)
 
-def analyze_pr_data(pr_list: list) -> dict:
+def iter_pull_request_pages(owner: str, repo: str, access_token: str, max_retries: int = 3, retry_delay: int = 2, max_pages: int = 5, since: str = None, concurrency: int = 1, requests_per_second: float = 5.0, client: GitcodeClient = None, state: str = 'all', fetch_report: dict = None, rate_limiter: TokenBucket = None, api_base: str = None, metrics: PipelineMetrics = None, throttle_max_retries: int = THROTTLE_MAX_RETRIES):
     """
-    分析PR数据，重点计算近七天已合入PR的平均合入时长
+    逐页获取仓库的PR，每收到一页（按页码顺序）就产出该页的PR列表，调用方不必在内存中保留全部PR
+
+    指定since（上次同步的updated_at游标）时进入增量模式：按更新时间倒序分页，
+    只产出该时间之后有更新的PR，遇到早于游标的PR即停止翻页
+
+    concurrency大于1时并发获取多个页面，仍按页码顺序产出；每页各自拥有max_retries次重试机会，
+    重试间隔以retry_delay为基数指数退避（带抖动，服务端给出Retry-After时以其为准）；
+    限流等待不占用重试次数，每页最多等待throttle_max_retries次
+
+    client为共享的GitcodeClient（连接池与响应缓存），未指定时创建一个不带磁盘缓存的客户端；
+    rate_limiter为多个调用方共享的限流器，未指定时创建一个初始速率为requests_per_second的AdaptiveRateLimiter
+
+    传入fetch_report字典时写入本次获取的页数、停止原因（exhausted/cursor/max_pages）
+    以及窗口是否被完整覆盖（window_covered，仅在因达到最大页数而停止时为False），retries为所有页面的重试总次数；
+    这些字段在生成器耗尽后才是最终值
+
+    api_base为API地址，未指定时由get_api_base()决定（可指向本地模拟服务器）；
+    指定metrics时把每个页面的耗时（含重试与限流等待）记录到该PipelineMetrics
     """
-    # 使用UTC时区来确保一致性
-    now = datetime.now(timezone.utc)
+    if fetch_report is None:
+        fetch_report = {}
+    fetch_report.update({"pages": 0, "stop_reason": None, "window_covered": False, "retries": 0})
     
-    # 计算7天前的时间
-    seven_days_ago = now - timedelta(days=7)
+    if client is None:
+        client = GitcodeClient(pool_size=max(concurrency, 1))
+    if rate_limiter is None:
+        rate_limiter = AdaptiveRateLimiter(requests_per_second)
     
-    # 待合入PR数量
-    open_pr_count = sum(1 for pr in pr_list if pr['state'] == 'open')
+    per_page = 100  # 每页数量，最大为100
+    total = 0
     
-    # 近七天提交的PR
-    recent_submitted_prs = []
-    for pr in pr_list:
-        if pr['created_at']:
-            try:
-                created_at = parser.parse(pr['created_at'])
-                # 确保所有datetime都有时区信息
-                if created_at.tzinfo is None:
-                    created_at = created_at.replace(tzinfo=timezone.utc)
-                if created_at >= seven_days_ago:
-                    recent_submitted_prs.append(pr)
-            except (ValueError, TypeError) as e:
-                # 如果日期解析失败，跳过这个PR
-                continue
-    
-    # 近七天已合入的PR的合入时长分析
-    recent_merged_prs_analysis = {
-        "count": 0,
-        "total_duration_days": 0,
-        "average_duration_days": 0,
-        "min_duration_days": None,
-        "max_duration_days": None,
-        "pr_details": []
-    }
+    since_at = parse_timestamp(since) if since else None
     
-    for pr in pr_list:
-        if pr['state'] == 'merged' and pr['created_at'] and pr['merged_at']:
-            try:
-                created_at = parser.parse(pr['created_at'])
-                merged_at = parser.parse(pr['merged_at'])
-                
-                # 确保所有datetime都有时区信息
-                if created_at.tzinfo is None:
-                    created_at = created_at.replace(tzinfo=timezone.utc)
-                if merged_at.tzinfo is None:
-                    merged_at = merged_at.replace(tzinfo=timezone.utc)
-                    
-                # 只计算近七天创建的PR的合入时长
-                if created_at >= seven_days_ago:
-                    duration = (merged_at - created_at)
-                    duration_days = duration.days + duration.seconds / (24 * 3600)  # 包含小数部分
-                    
-                    recent_merged_prs_analysis["count"] += 1
-                    recent_merged_prs_analysis["total_duration_days"] += duration_days
-                    recent_merged_prs_analysis["pr_details"].append({
-                        "number": pr['number'],
-                        "title": pr['title'],
-                        "created_at": pr['created_at'],
-                        "merged_at": pr['merged_at'],
-                        "duration_days": round(duration_days, 2),
-                        "duration_hours": round(duration_days * 24, 2)
-                    })
-                    
-                    # 更新最小/最大时长
-                    if (recent_merged_prs_analysis["min_duration_days"] is None or 
-                        duration_days < recent_merged_prs_analysis["min_duration_days"]):
-                        recent_merged_prs_analysis["min_duration_days"] = duration_days
-                    
-                    if (recent_merged_prs_analysis["max_duration_days"] is None or 
-                        duration_days > recent_merged_prs_analysis["max_duration_days"]):
-                        recent_merged_prs_analysis["max_duration_days"] = duration_days
-                        
-            except (ValueError, TypeError) as e:
-                # 如果日期解析失败，跳过这个PR
-                continue
-    
-    # 计算平均时长
-    if recent_merged_prs_analysis["count"] > 0:
-        recent_merged_prs_analysis["average_duration_days"] = round(
-            recent_merged_prs_analysis["total_duration_days"] / recent_merged_prs_analysis["count"], 2
-        )
-    
-    # 近两周PR每日提交次数统计
-    fourteen_days_ago = now - timedelta(days=14)
-    daily_submissions = {}
-    daily_failed_submissions = {}
-    
-    def is_failed_pr(pr):
-        """判断PR是否为失败PR"""
-        if 'labels' not in pr or not pr['labels']:
-            return False
-        
-        for label in pr['labels']:
-            if isinstance(label, dict) and 'name' in label:
-                label_name = label['name'].lower()
-                if 'sc-fail' in label_name or 'ci-pipeline-failed' in label_name:
-                    return True
+    if since_at:
+        print(f"开始获取仓库 {owner}/{repo} 自 {since} 以来更新的PR数据...")
+    else:
+        print(f"开始获取仓库 {owner}/{repo} 的PR数据...")
+    
+    # 构建API请求URL
+    url = f"{(api_base or get_api_base()).rstrip('/')}/api/v5/repos/{owner}/{repo}/pulls"
+    
+    repository = f"{owner}/{repo}"
+    
+    def fetch_page(page):
+        """请求一页并记录耗时，返回 (本页PR列表, 本页重试次数)"""
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        prs, retries = _request_page(client, url, build_params(page), max_retries, retry_delay, rate_limiter,
+                                     throttle_max_retries=throttle_max_retries)
+        if metrics:
+            metrics.record_page(repository, page, time.perf_counter() - wall_start, time.thread_time() - cpu_start,
+                                retries, len(prs))
+        return prs, retries
+    
+    def build_params(page):
+        # 设置查询参数
+        params = {
+            'access_token': access_token,
+            'state': state,  # 默认获取所有状态的PR
+            'page': page,
+            'per_page': per_page
+        }
+        if since_at:
+            # 增量模式：按更新时间倒序，便于遇到游标后提前结束
+            params.update({'since': since, 'sort': 'updated', 'direction': 'desc'})
+        return params
+    
+    def stop(reason):
+        fetch_report["stop_reason"] = reason
+        fetch_report["window_covered"] = reason != "max_pages"
+        return True
+    
+    def handle_page(prs, retries=0):
+        """过滤一页结果，返回 (需要产出的PR, 是否应停止翻页)"""
+        nonlocal total
+        fetch_report["pages"] += 1
+        fetch_report["retries"] += retries
+        
+        # 如果没有更多PR，退出循环
+        if not prs:
+            print(f"已获取所有PR，共 {total} 个")
+            return prs, stop("exhausted")
+        
+        page_size = len(prs)
+        prs, reached_cursor = _filter_since(prs, since_at)
+        total += len(prs)
+        print(f"已获取 {len(prs)} 个PR，总计 {total} 个")
+        
+        if reached_cursor:
+            print("已到达上次同步位置，停止获取更多PR")
+            return prs, stop("cursor")
+        
+        # 检查是否还有下一页
+        if page_size < per_page:
+            print("已获取所有PR")
+            return prs, stop("exhausted")
+        return prs, False
+    
+    def reached_max_pages(page):
+        # 检查是否达到最大页数限制
+        if max_pages and page >= max_pages:
+            print(f"已达到最大页数限制 ({max_pages})，停止获取更多PR")
+            return stop("max_pages")
         return False
     
+    if concurrency > 1:
+        pages = _get_pages_concurrently(fetch_page, max_pages, concurrency, rate_limiter)
+    else:
+        # 请求速率由限流器控制，无需在页面之间固定等待
+        pages = ((page, fetch_page(page)) for page in itertools.count(1))
+    
+    try:
+        for page, (prs, retries) in pages:
+            prs, done = handle_page(prs, retries)
+            if prs:
+                yield prs
+            if done or reached_max_pages(page):
+                break
+    finally:
+        # 调用方提前结束或出错时，取消尚未开始的并发请求
+        pages.close()
+
+def get_all_pull_requests(owner: str, repo: str, access_token: str, **kwargs) -> list:
+    """获取仓库的所有PR（处理分页），参数与iter_pull_request_pages相同，返回全部页面合并后的列表"""
+    return [pr for page in iter_pull_request_pages(owner, repo, access_token, **kwargs) for pr in page]
+
+def _get_pages_concurrently(fetch_page, max_pages, concurrency, rate_limiter):
+    """
+    以滑动窗口方式并发获取页面：始终保持concurrency个页面在途，按页码顺序产出 (页码, fetch_page结果)
+    """
+    print(f"并发获取模式: {concurrency} 个并发请求，限速 {rate_limiter.rate:g} 次/秒")
+    
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {}
+        next_page = 1
+        
+        def submit_next():
+            nonlocal next_page
+            if max_pages and next_page > max_pages:
+                return
+            futures[next_page] = executor.submit(fetch_page, next_page)
+            next_page += 1
+        
+        for _ in range(concurrency):
+            submit_next()
+        
+        page = 1
+        try:
+            while page in futures:
+                yield page, futures.pop(page).result()
+                submit_next()
+                page += 1
+        finally:
+            # 已确定结束翻页或出错时，取消尚未开始的请求
+            for future in futures.values():
+                future.cancel()
+
+def spool_pages(pages, spool_file: str):
+    """
+    把逐页产出的PR同时追加写入NDJSON暂存文件（每行一个PR），原样产出各页；只在内存中保留当前页
+    """
+    with open(spool_file, 'a', encoding='utf-8') as f:
+        for prs in pages:
+            f.writelines(json.dumps(pr, ensure_ascii=False, separators=(',', ':')) + '\n' for pr in prs)
+            yield prs
+
+def read_spool(spool_file: str):
+    """逐行读取NDJSON暂存文件中的PR"""
+    with open(spool_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def load_existing_prs(data_file: str) -> tuple:
+    """
+    读取上次运行保存的PR数据集及同步游标，文件不存在或损坏时返回空数据集
+
+    数据文件可以是任意支持的格式；切换DATA_FORMAT后首次运行时会读取旧格式的同名文件
+    """
+    data_file = resolve_data_file(data_file)
+    if not os.path.exists(data_file):
+        return [], None
+    
+    try:
+        data = load_data(data_file)
+    except (OSError, ValueError, EOFError) as e:
+        print(f"警告：读取已有数据失败，将执行全量同步: {e}")
+        return [], None
+    
+    prs = data.get('all_prs', [])
+    return prs, data.get('sync_cursor') or get_sync_cursor(prs)
+
+def get_sync_cursor(pr_list: list):
+    """
+    计算数据集的同步游标，即所有PR中最新的updated_at
+    """
+    cursor = None
+    cursor_at = None
     for pr in pr_list:
-        if pr['created_at']:
-            try:
-                created_at = parser.parse(pr['created_at'])
-                if created_at.tzinfo is None:
-                    created_at = created_at.replace(tzinfo=timezone.utc)
-                
-                if created_at >= fourteen_days_ago:
-                    date_key = created_at.strftime('%Y-%m-%d')
-                    
-                    # 总提交数统计
-                    if date_key not in daily_submissions:
-                        daily_submissions[date_key] = 0
-                        daily_failed_submissions[date_key] = 0
-                    daily_submissions[date_key] += 1
-                    
-                    # 失败PR统计
-                    if is_failed_pr(pr):
-                        daily_failed_submissions[date_key] += 1
-                        
-            except (ValueError, TypeError):
-                continue
+        if not pr.get('updated_at'):
+            continue
+        try:
+            updated_at = parse_timestamp(pr['updated_at'])
+        except (ValueError, TypeError, OverflowError):
+            continue
+        if cursor_at is None or updated_at > cursor_at:
+            cursor, cursor_at = pr['updated_at'], updated_at
+    return cursor
+
+class PRAnalyzer:
+    """
+    单遍PR分析器：逐个PR累积待合入数量、近七天提交、合入时长和近两周每日提交统计，
+    每个时间戳只解析一次；各时间窗口的合入/关闭时长写入分位数草图，内存占用与PR数量无关。
+    每个PR的标签只分类一次（得到类别位集合），同时用于失败统计和各标签类别的计数
+    """
+    def __init__(self, now: datetime = None, classifier=None):
+        # 使用UTC时区来确保一致性
+        self.now = now or datetime.now(timezone.utc)
+        self.seven_days_ago = self.now - timedelta(days=7)
+        self.fourteen_days_ago = self.now - timedelta(days=14)
+        
+        self.open_pr_count = 0
+        self.recent_submitted_prs = []
+        self.recent_merged_prs_analysis = {
+            "count": 0,
+            "total_duration_days": 0,
+            "average_duration_days": 0,
+            "min_duration_days": None,
+            "max_duration_days": None,
+            "pr_details": []
+        }
+        self.daily_submissions = {}
+        self.daily_failed_submissions = {}
+        
+        # 各窗口的合入/关闭时长草图
+        self.window_starts = [(days, self.now - timedelta(days=days)) for days in DURATION_WINDOWS]
+        self.widest_window_start = min(start for _, start in self.window_starts)
+        self.duration_sketches = {days: {"merge": DDSketch(), "close": DDSketch()} for days in DURATION_WINDOWS}
+        
+        # 标签类别：按类别位置计数（open中的数量、各窗口内创建的数量）
+        self.classifier = classifier or get_classifier()
+        self.failed_bit = self.classifier.bits.get(FAILED, 0)
+        self.category_open = [0] * len(self.classifier.categories)
+        self.category_created = {days: [0] * len(self.classifier.categories) for days in DURATION_WINDOWS}
+    
+    def add(self, pr):
+        """累积一个PR"""
+        # 标签只在需要时分类一次：open的PR，以及最宽统计窗口内创建的PR
+        categories = None
+        
+        # 待合入PR数量
+        if pr['state'] == 'open':
+            self.open_pr_count += 1
+            categories = self.classifier.classify_pr(pr)
+            self._count_categories(self.category_open, categories)
+        
+        if not pr['created_at']:
+            return
+        try:
+            created_at = parse_timestamp(pr['created_at'])
+        except (ValueError, TypeError, OverflowError):
+            # 如果日期解析失败，跳过这个PR
+            return
+        
+        if created_at >= self.widest_window_start:
+            if categories is None:
+                categories = self.classifier.classify_pr(pr)
+            if categories:
+                for days, start in self.window_starts:
+                    if created_at >= start:
+                        self._count_categories(self.category_created[days], categories)
+        
+        if created_at >= self.seven_days_ago:
+            # 近七天提交的PR（只保存编号）
+            self.recent_submitted_prs.append(pr['number'])
+        
+        # 合入/关闭时长统计
+        if created_at >= self.widest_window_start:
+            if pr['state'] == 'merged' and pr['merged_at']:
+                self._add_merged(pr, created_at)
+            elif pr['state'] == 'closed' and pr.get('closed_at'):
+                self._add_closed(pr, created_at)
+        
+        # 近两周PR每日提交次数统计
+        if created_at >= self.fourteen_days_ago:
+            date_key = created_at.strftime('%Y-%m-%d')
+            
+            # 总提交数统计
+            if date_key not in self.daily_submissions:
+                self.daily_submissions[date_key] = 0
+                self.daily_failed_submissions[date_key] = 0
+            self.daily_submissions[date_key] += 1
+            
+            # 失败PR统计
+            if categories is None:
+                categories = self.classifier.classify_pr(pr)
+            if categories & self.failed_bit:
+                self.daily_failed_submissions[date_key] += 1
     
+    @staticmethod
+    def _count_categories(counts: list, categories: int):
+        # 逐个取出位集合中的最低位
+        while categories:
+            lowest = categories & -categories
+            counts[lowest.bit_length() - 1] += 1
+            categories ^= lowest
+    
+    def _add_to_sketches(self, kind: str, created_at: datetime, duration_days: float):
+        for days, start in self.window_starts:
+            if created_at >= start:
+                self.duration_sketches[days][kind].add(duration_days)
+    
+    def _add_closed(self, pr, created_at: datetime):
+        try:
+            closed_at = parse_timestamp(pr['closed_at'])
+        except (ValueError, TypeError, OverflowError):
+            return
+        self._add_to_sketches("close", created_at, _duration_days(closed_at - created_at))
+    
+    def _add_merged(self, pr, created_at: datetime):
+        try:
+            merged_at = parse_timestamp(pr['merged_at'])
+        except (ValueError, TypeError, OverflowError):
+            return
+        
+        duration_days = _duration_days(merged_at - created_at)
+        self._add_to_sketches("merge", created_at, duration_days)
+        
+        # 只计算近七天创建的PR的合入时长
+        if created_at < self.seven_days_ago:
+            return
+        
+        analysis = self.recent_merged_prs_analysis
+        analysis["count"] += 1
+        analysis["total_duration_days"] += duration_days
+        if len(analysis["pr_details"]) < PR_DETAILS_LIMIT:
+            analysis["pr_details"].append({
+                "number": pr['number'],
+                "title": pr['title'],
+                "created_at": pr['created_at'],
+                "merged_at": pr['merged_at'],
+                "duration_days": round(duration_days, 2),
+                "duration_hours": round(duration_days * 24, 2)
+            })
+        
+        # 更新最小/最大时长
+        if analysis["min_duration_days"] is None or duration_days < analysis["min_duration_days"]:
+            analysis["min_duration_days"] = duration_days
+        if analysis["max_duration_days"] is None or duration_days > analysis["max_duration_days"]:
+            analysis["max_duration_days"] = duration_days
+    
+    def result(self) -> dict:
+        """返回分析结果"""
+        analysis = self.recent_merged_prs_analysis
+        
+        # 计算平均时长
+        if analysis["count"] > 0:
+            analysis["average_duration_days"] = round(analysis["total_duration_days"] / analysis["count"], 2)
+        
+        return {
+            "total_open_prs": self.open_pr_count,
+            "recent_submitted_prs": self.recent_submitted_prs,
+            "recent_merged_prs_analysis": analysis,
+            "daily_submissions": self.daily_submissions,
+            "daily_failed_submissions": self.daily_failed_submissions,
+            **summarize_duration_sketches(self.duration_sketches),
+            "label_categories": summarize_label_categories(self.classifier.categories, self.category_open,
+                                                           self.category_created)
+        }
+
+def _duration_days(duration: timedelta) -> float:
+    """时长换算为天数（包含小数部分）"""
+    return duration.days + duration.seconds / (24 * 3600)
+
+def summarize_duration_sketches(duration_sketches: dict) -> dict:
+    """
+    把各窗口的时长草图转换为分析输出：duration_percentiles为分位数摘要，
+    duration_sketches为可合并的序列化草图
+    """
     return {
-        "total_open_prs": open_pr_count,
-        "recent_submitted_prs": recent_submitted_prs,
-        "recent_merged_prs_analysis": recent_merged_prs_analysis,
-        "daily_submissions": daily_submissions,
-        "daily_failed_submissions": daily_failed_submissions
+        "duration_percentiles": {
+            str(days): {kind: sketch.summary(DURATION_QUANTILES) for kind, sketch in sketches.items()}
+            for days, sketches in duration_sketches.items()
+        },
+        "duration_sketches": {
+            str(days): {kind: sketch.to_dict() for kind, sketch in sketches.items()}
+            for days, sketches in duration_sketches.items()
+        }
     }
 
+def summarize_label_categories(categories: list, open_counts, created_counts: dict) -> dict:
+    """
+    标签类别统计输出：{类别: {"open": open中的数量, "created": {窗口天数: 窗口内创建的数量}}}
+    """
+    return {
+        category: {
+            "open": int(open_counts[i]),
+            "created": {str(days): int(counts[i]) for days, counts in created_counts.items()},
+        }
+        for i, category in enumerate(categories)
+    }
+
+def analyze_pr_data(pr_list, now: datetime = None, backend: str = "python", details: dict = None) -> dict:
+    """
+    分析PR数据，重点计算近七天已合入PR的平均合入时长
+
+    backend为 "python"（单遍逐个PR统计）或 "numpy"（列式向量化统计，适合大数据集），
+    两者返回结构相同；numpy不可用时回退到python后端。
+    details为PR详情摘要（见pr_enrichment.enrich_prs）时，结果中增加首次评审/失败修复时延统计review_metrics。
+    python后端且不传details时pr_list可以是迭代器（例如PRStore.iter_window_prs()），只遍历一次
+    """
+    if backend == "numpy" and not columnar_analysis.is_available():
+        print("警告：未安装numpy，回退到python分析后端")
+        backend = "python"
+    
+    if backend == "numpy":
+        result = columnar_analysis.analyze_pr_data_columnar(pr_list, now)
+    else:
+        analyzer = PRAnalyzer(now)
+        for pr in pr_list:
+            analyzer.add(pr)
+        result = analyzer.result()
+    
+    if details is not None:
+        result["review_metrics"] = summarize_review_metrics(pr_list, details, DURATION_WINDOWS, DURATION_QUANTILES, now)
+    return result
+
+def enrich_repository(repo_conf: dict, access_token: str, prs: list, store: PRStore, options: dict) -> dict:
+    """
+    按同步选项为仓库的PR补充详情（未开启ENRICH_DETAILS时返回None），access_token为None时只使用缓存
+    """
+    if not options.get("enrich_details"):
+        return None
+    metrics = options.get("metrics") or PipelineMetrics()
+    with metrics.stage("enrich", f"{repo_conf['owner']}/{repo_conf['repo']}"):
+        return enrich_prs(repo_conf["owner"], repo_conf["repo"], access_token, prs, store, options["fetch_options"],
+                          max_workers=options["enrich_concurrency"], bot_pattern=options["bot_pattern"],
+                          metrics=metrics, classifier=options.get("label_classifier"))
+
+def open_rollup(store: PRStore) -> RollupCube:
+    """
+    读取存储中的汇总立方体；首次使用（或关闭后重新开启）时立方体与存储中的PR数量不一致，
+    此时逐块读取全部PR重建（内存中只保留当前块的PR）
+    """
+    cube = RollupCube.load(store)
+    if len(cube.contributions) != store.count():
+        prs = store.iter_prs()
+        for chunk in iter(lambda: list(itertools.islice(prs, ROLLUP_REBUILD_CHUNK_SIZE)), []):
+            cube.update(chunk)
+    return cube
+
+def update_rollup(store: PRStore, prs, options: dict, repository: str) -> dict:
+    """
+    用本次获取的PR增量更新汇总立方体并写回存储，返回导出的切片（未开启ROLLUP时返回None）
+    """
+    if not options.get("rollup"):
+        return None
+    metrics = options.get("metrics") or PipelineMetrics()
+    extra_fields = options.get("extra_fields", ())
+    with metrics.stage("rollup", repository):
+        cube = open_rollup(store)
+        changed = cube.update(project_pr(pr, extra_fields) for pr in prs)
+        cube.save(store)
+        rollups = cube.export()
+    metrics.increment("rollup_changed_prs", changed, repository)
+    return rollups
+
+def next_covered_since(covered_since: str, previous_cursor: str, window_start: datetime, incremental: bool, window_covered: bool) -> str:
+    """
+    一次同步后存储完整覆盖的起点
+
+    获取被页数上限截断时变为未知（None）；增量同步保持不变；按窗口获取后为窗口起点，
+    若原有的覆盖范围更早且上次同步晚于窗口起点（两次同步之间的更新都在本次获取范围内），则保留原有起点
+    """
+    if not window_covered:
+        return None
+    if incremental:
+        return covered_since
+    window_start_at = window_start.isoformat(timespec='seconds')
+    if covered_since and previous_cursor and parse_timestamp(covered_since) < window_start \
+            and parse_timestamp(previous_cursor) >= window_start:
+        return covered_since
+    return window_start_at
+
+def covered_day(covered_since: str):
+    """
+    完整覆盖起点对应的逐日计数起始日：索引按PR自身时区的日期分桶，
+    取在任何时区（最东为UTC+14）下都完全晚于起点的第一天
+    """
+    if not covered_since:
+        return None
+    return (parse_timestamp(covered_since).astimezone(timezone.utc) + timedelta(hours=14)).date() + timedelta(days=1)
+
+def load_sync_options(output_dir: str, config: dict = None, metrics: PipelineMetrics = None) -> dict:
+    """
+    从环境变量（及配置文件中的全局配置）读取同步选项，所有仓库共享同一个API客户端和限速预算
+
+    metrics为调用方的指标收集器（例如refresh_dashboard.py统计整条流水线），未指定时按PIPELINE_PROFILE新建
+    """
+    config = config or {}
+    
+    # 并发获取配置：每个仓库的并发页数与全局共享的每秒请求数预算
+    # （REQUESTS_PER_SECOND为初始速率，持续成功时自适应提高到MAX_REQUESTS_PER_SECOND，默认为初始速率的2倍）
+    concurrency = int(os.environ.get("FETCH_CONCURRENCY", config.get("fetch_concurrency", 1)))
+    requests_per_second = float(os.environ.get("REQUESTS_PER_SECOND", config.get("requests_per_second", 5)))
+    max_requests_per_second = float(os.environ.get("MAX_REQUESTS_PER_SECOND",
+                                                   config.get("max_requests_per_second", requests_per_second * 2)))
+    repo_count = len(config.get("repositories", [])) or 1
+    
+    # 共享的API客户端：连接复用 + 基于ETag/Last-Modified的磁盘响应缓存
+    cache_dir = os.environ.get("GITCODE_CACHE_DIR", os.path.join(output_dir, ".gitcode_cache"))
+    if metrics is None:
+        metrics = PipelineMetrics(parse_profile_modes(os.environ.get("PIPELINE_PROFILE", "")))
+    
+    return {
+        # 同步模式：incremental（默认，基于上次的updated_at游标增量获取）或 full（全量重新获取）
+        "sync_mode": os.environ.get("SYNC_MODE", "incremental"),
+        # 单次获取的最大页数（安全上限，正常情况下在到达同步游标或分析窗口起点时就会停止）
+        "max_pages": int(os.environ.get("MAX_PAGES", "50")),
+        # 分析后端：python（默认）或 numpy（列式向量化）
+        "analysis_backend": os.environ.get("ANALYSIS_BACKEND", "python"),
+        # PR入库时投影为精简记录，PR_EXTRA_FIELDS（逗号分隔）可额外保留字段
+        "extra_fields": parse_extra_fields(os.environ.get("PR_EXTRA_FIELDS", "")),
+        # 阶段/页面耗时统计，PIPELINE_PROFILE=cprofile,tracemalloc（或1）时同时开启性能剖析
+        "metrics": metrics,
+        # PR详情补充（评论、操作日志）：默认关闭，开启后按编号+updated_at缓存，只获取有变化的PR
+        "enrich_details": os.environ.get("ENRICH_DETAILS", str(config.get("enrich_details", ""))).lower()
+                          in ('1', 'true', 'yes'),
+        "enrich_concurrency": int(os.environ.get("ENRICH_CONCURRENCY",
+                                                 config.get("enrich_concurrency", DEFAULT_ENRICH_CONCURRENCY))),
+        # 不计为评审的机器人账号（正则，匹配登录名）
+        "bot_pattern": os.environ.get("REVIEW_BOT_PATTERN", config.get("review_bot_pattern", DEFAULT_BOT_PATTERN)),
+        # 快照历史：每次同步后把有变化的PR追加到历史日志（HISTORY=0关闭）
+        "history": os.environ.get("HISTORY", str(config.get("history", "1"))).lower() not in ('0', 'false', 'no'),
+        # 标签分类规则（repos.json中的label_rules，环境变量LABEL_RULES覆盖），编译一次后所有仓库共用
+        "label_classifier": configure_label_rules(config),
+        # 分维度汇总立方体：按作者/标签/目标分支和周/月增量汇总（ROLLUP=0关闭）
+        "rollup": os.environ.get("ROLLUP", str(config.get("rollup", "1"))).lower() not in ('0', 'false', 'no'),
+        "fetch_options": {
+            "concurrency": concurrency,
+            "client": GitcodeClient(cache_dir=cache_dir, pool_size=max(concurrency, 1) * repo_count),
+            "rate_limiter": AdaptiveRateLimiter(requests_per_second, max_rate=max_requests_per_second),
+            # 每页最多等待限流的次数（环境变量THROTTLE_MAX_RETRIES优先，其次为配置文件中的throttle_max_retries）
+            "throttle_max_retries": int(os.environ.get("THROTTLE_MAX_RETRIES",
+                                                       config.get("throttle_max_retries", THROTTLE_MAX_RETRIES))),
+            # 每个API页面的耗时记录到与各阶段相同的指标收集器
+            "metrics": metrics,
+            # API地址：环境变量GITCODE_API_BASE优先，其次为配置文件中的api_base
+            "api_base": os.environ.get("GITCODE_API_BASE", config.get("api_base", DEFAULT_API_BASE)),
+        },
+    }
+
+def sync_repository(repo_conf: dict, access_token: str, output_dir: str, options: dict, export: bool = True) -> dict:
+    """
+    同步并分析单个仓库：增量/窗口获取PR写入本地存储，分析后导出JSON，返回输出数据
+
+    export为False时不写分析JSON，而是把全部PR（精简记录）放入返回数据的all_prs字段，
+    由调用方在内存中继续使用并通过pr_store.write_analysis_json()一次性写盘
+    """
+    owner, repo = repo_conf["owner"], repo_conf["repo"]
+    output_file = repo_path(output_dir, repo_conf, "data_file")
+    db_file = repo_path(output_dir, repo_conf, "db_file")
+    sync_mode = options["sync_mode"]
+    max_pages = options["max_pages"]
+    fetch_options = options["fetch_options"]
+    repository = f"{owner}/{repo}"
+    # 各阶段耗时统计（未配置时使用一次性的收集器）
+    metrics = options.get("metrics") or PipelineMetrics()
+    
+    # 本地PR存储：SQLite数据库，分析JSON作为兼容导出
+    store = PRStore(db_file, extra_fields=options["extra_fields"])
+    # 获取到的页面先逐页追加到NDJSON暂存文件，全部获取成功后再在一个事务中写入存储，
+    # 内存中只保留当前页；获取中途失败时存储与同步游标保持不变
+    spool_file = f"{db_file}.spool.ndjson"
+    
+    try:
+        if sync_mode == "incremental" and store.count() == 0:
+            # 首次使用存储时，从已有的分析JSON导入历史数据
+            existing_prs, _ = load_existing_prs(output_file)
+            if existing_prs:
+                store.upsert_prs(existing_prs)
+                print(f"[{owner}/{repo}] 已从 {output_file} 导入 {len(existing_prs)} 个历史PR")
+        
+        previous_cursor = store.get_sync_cursor()
+        covered_since = store.get_covered_since()
+        # 完整覆盖的起点未知时（首次同步、从分析JSON导入、上次获取被截断），先按分析窗口完整获取一次
+        sync_cursor = previous_cursor if sync_mode == "incremental" and covered_since else None
+        if sync_mode == "incremental" and previous_cursor and not covered_since:
+            print(f"[{owner}/{repo}] 本地数据的完整范围未知，按分析窗口重新获取")
+        window_start = datetime.now(timezone.utc) - timedelta(days=ANALYSIS_WINDOW_DAYS)
+        # 按窗口获取时多取两天，使按PR自身时区分日的逐日计数索引也完整覆盖整个分析窗口
+        fetch_since = window_start - timedelta(days=2)
+        fetch_report = {}
+        if os.path.exists(spool_file):
+            os.remove(spool_file)
+        
+        if sync_cursor:
+            # 增量获取自上次同步以来有变化的PR
+            with metrics.stage("fetch", repository):
+                fetched_count = sum(len(prs) for prs in spool_pages(
+                    iter_pull_request_pages(owner, repo, access_token, max_pages=max_pages, since=sync_cursor,
+                                            fetch_report=fetch_report, **fetch_options),
+                    spool_file))
+        else:
+            with metrics.stage("fetch", repository):
+                # 获取分析窗口起点之后更新过的PR（窗口内创建、合入或关闭的PR都在其中），越过窗口起点即停止翻页；
+                # 以及窗口之外仍处于open状态的PR（用于统计待合入数量）
+                open_report = {}
+                fetched_count = sum(len(prs) for prs in spool_pages(itertools.chain(
+                    iter_pull_request_pages(owner, repo, access_token, max_pages=max_pages,
+                                            since=fetch_since.isoformat(timespec='seconds'),
+                                            fetch_report=fetch_report, **fetch_options),
+                    iter_pull_request_pages(owner, repo, access_token, max_pages=max_pages, state='open',
+                                            fetch_report=open_report, **fetch_options),
+                ), spool_file))
+            fetch_report["window_covered"] = fetch_report["window_covered"] and open_report["window_covered"]
+        
+        # 快照历史只需要本次内容有变化的PR及其在存储中之前的记录
+        history_changes = [] if options.get("history") else None
+        with metrics.stage("store", repository):
+            # 按编号写入存储（同一PR出现多次时以后写入的为准）
+            store.upsert_prs(read_spool(spool_file), changes=history_changes)
+            store.set_covered_since(
+                next_covered_since(covered_since, previous_cursor, fetch_since, bool(sync_cursor),
+                                   fetch_report["window_covered"]))
+        if sync_cursor:
+            print(f"[{owner}/{repo}] 增量同步: {fetched_count} 个PR有更新，数据集共 {store.count()} 个PR")
+        metrics.increment("fetched_prs", fetched_count, repository)
+        rollups = update_rollup(store, read_spool(spool_file), options, repository)
+        
+        if not fetch_report["window_covered"]:
+            print(f"[{owner}/{repo}] 警告：已达到最大页数限制 ({max_pages})，分析窗口内的PR可能未被完整获取")
+        
+        # 分析PR数据：只查询分析窗口内创建的PR和仍处于open状态的PR；
+        # python后端且不补充详情时逐条读取、单遍统计，内存中只保留统计量
+        if options["analysis_backend"] == "python" and not options.get("enrich_details"):
+            window_prs, details = store.iter_window_prs(window_start), None
+        else:
+            window_prs = store.window_prs(window_start)
+            details = enrich_repository(repo_conf, access_token, window_prs, store, options)
+        with metrics.stage("analyze", repository):
+            analysis_result = analyze_pr_data(window_prs, backend=options["analysis_backend"], details=details)
+        
+        # 逐日计数索引与导出都逐条读取存储；只有需要返回全部PR时才整体载入
+        all_prs = None
+        if not export:
+            with metrics.stage("load", repository):
+                all_prs = store.all_prs()
+        if options.get("history"):
+            record_history(repo_conf, output_dir, store, history_changes, metrics)
+        output_data = build_output_data(repository, analysis_result, store.iter_prs() if all_prs is None else all_prs,
+                                        store.get_sync_cursor(), fetch_report["window_covered"], metrics,
+                                        stored_count=store.count(), covered_since=store.get_covered_since())
+        if rollups is not None:
+            output_data["rollups"] = rollups
+        
+        if export:
+            # 导出为JSON文件（all_prs逐条读取自存储中的全部PR）
+            with metrics.stage("export_json", repository):
+                store.export_json(output_file, output_data)
+        else:
+            output_data["all_prs"] = all_prs
+        return output_data
+    finally:
+        store.close()
+        if os.path.exists(spool_file):
+            os.remove(spool_file)
+
+def build_output_data(repository: str, analysis_result: dict, all_prs, sync_cursor: str, window_covered: bool, metrics: PipelineMetrics = None, stored_count: int = None, covered_since: str = None) -> dict:
+    """
+    由分析结果组装输出数据（分析JSON中除all_prs以外的部分），并基于全部PR生成逐日计数索引
+
+    all_prs可以是迭代器（只遍历一次），此时需通过stored_count给出PR总数；
+    covered_since为存储完整覆盖的起点（见PRStore.get_covered_since），写入逐日计数索引
+    """
+    metrics = metrics or PipelineMetrics()
+    
+    # 准备输出数据
+    output_data = {
+        "repository": repository,
+        "total_open_prs": analysis_result["total_open_prs"],
+        "recent_submitted_prs": analysis_result["recent_submitted_prs"],
+        "recent_merged_prs_analysis": analysis_result["recent_merged_prs_analysis"],
+        "daily_submissions": analysis_result["daily_submissions"],
+        "daily_failed_submissions": analysis_result["daily_failed_submissions"],
+        "duration_percentiles": analysis_result["duration_percentiles"],
+        "duration_sketches": analysis_result["duration_sketches"],
+        "sync_cursor": sync_cursor,
+        "window_covered": window_covered
+    }
+    if "review_metrics" in analysis_result:
+        output_data["review_metrics"] = analysis_result["review_metrics"]
+    if "label_categories" in analysis_result:
+        output_data["label_categories"] = analysis_result["label_categories"]
+    
+    # 覆盖全部历史的逐日计数前缀和索引，看板按任意窗口查询无需再遍历PR
+    with metrics.stage("daily_index", repository):
+        output_data["daily_index"] = DailyCountIndex.build(all_prs, covered_since=covered_day(covered_since)).to_dict()
+    metrics.increment("stored_prs", len(all_prs) if stored_count is None else stored_count, repository)
+    return output_data
+
+def collect_repositories(repositories: list, access_token: str, output_dir: str, options: dict, export: bool = True) -> tuple:
+    """
+    并发同步多个仓库（共享API客户端与全局限速预算），总耗时取决于最慢的仓库；export含义同sync_repository
+
+    返回 ({仓库名: 输出数据}, {仓库名: 异常})
+    """
+    results, errors = {}, {}
+    max_workers = int(os.environ.get("REPO_CONCURRENCY", "8"))
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(repositories)))) as executor:
+        futures = {
+            executor.submit(sync_repository, repo_conf, access_token, output_dir, options, export): repo_conf
+            for repo_conf in repositories
+        }
+        for future in as_completed(futures):
+            repo_conf = futures[future]
+            try:
+                results[repo_conf["name"]] = future.result()
+            except Exception as e:
+                print(f"[{repo_conf['owner']}/{repo_conf['repo']}] 同步失败: {e}")
+                errors[repo_conf["name"]] = e
+    
+    return results, errors
+
+def print_summary(repo_conf: dict, output_data: dict, output_dir: str):
+    """打印单个仓库的统计摘要"""
+    print("\n" + "="*50)
+    print(f"统计完成！")
+    print(f"目标仓库: {output_data['repository']}")
+    print(f"待合入PR数量: {output_data['total_open_prs']}")
+    print(f"近七天提交的PR数量: {len(output_data['recent_submitted_prs'])}")
+    
+    # 近七天已合入PR的合入时长分析
+    merged_analysis = output_data['recent_merged_prs_analysis']
+    print(f"近七天已合入的PR数量: {merged_analysis['count']}")
+    if merged_analysis['count'] > 0:
+        print(f"平均合入时长: {merged_analysis['average_duration_days']} 天")
+        print(f"最短合入时长: {merged_analysis['min_duration_days']} 天")
+        print(f"最长合入时长: {merged_analysis['max_duration_days']} 天")
+    else:
+        print("近七天内没有已合入的PR")
+        
+    print(f"PR数据已保存到: {repo_path(output_dir, repo_conf, 'db_file')}，"
+          f"并导出到: {repo_path(output_dir, repo_conf, 'data_file')}")
+    print("="*50)
+
+def get_access_token() -> str:
+    """优先从环境变量读取访问令牌，如果不存在则使用默认值"""
+    return os.environ.get("GITCODE_ACCESS_TOKEN", "ujpJg3DiifrfP8SooysZq6He")
+
 def main():
-    # 配置
-    owner = "Ascend"
-    repo = "triton-ascend"
+    # 配置：监控的仓库列表来自repos.json（或REPOS_CONFIG指定的文件）
+    config = load_config()
+    repositories = config["repositories"]
     
-    # 优先从环境变量读取访问令牌，如果不存在则使用默认值
-    access_token = os.environ.get("GITCODE_ACCESS_TOKEN", "ujpJg3DiifrfP8SooysZq6He")
+    access_token = get_access_token()
     
     # 输出目录：优先使用环境变量，否则使用当前目录
-    output_dir = os.environ.get("OUTPUT_DIR", os.getcwd())
+    output_dir = get_output_dir()
     
-    print(f"监控仓库: {owner}/{repo}")
+    repo_names = ', '.join(f"{r['owner']}/{r['repo']}" for r in repositories)
+    print(f"监控仓库: {repo_names}")
     print(f"输出目录: {output_dir}")
     print(f"访问令牌: {'已设置' if access_token else '未设置'}")
     
     # 确保输出目录存在
     os.makedirs(output_dir, exist_ok=True)
     
-    try:
-        # 获取所有PR
-        all_prs = get_all_pull_requests(owner, repo, access_token, max_pages=3)
-        
-        # 分析PR数据
-        analysis_result = analyze_pr_data(all_prs)
-        
-        # 准备输出数据
-        output_data = {
-            "repository": f"{owner}/{repo}",
-            "total_open_prs": analysis_result["total_open_prs"],
-            "recent_submitted_prs": analysis_result["recent_submitted_prs"],
-            "recent_merged_prs_analysis": analysis_result["recent_merged_prs_analysis"],
-            "daily_submissions": analysis_result["daily_submissions"],
-            "daily_failed_submissions": analysis_result["daily_failed_submissions"],
-            "all_prs": all_prs
-        }
-        
-        # 保存为JSON文件
-        output_file = os.path.join(output_dir, "triton_ascend_prs_analysis.json")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, ensure_ascii=False, indent=2)
-        
-        print("\n" + "="*50)
-        print(f"统计完成！")
-        print(f"目标仓库: {owner}/{repo}")
-        print(f"待合入PR数量: {analysis_result['total_open_prs']}")
-        print(f"近七天提交的PR数量: {len(analysis_result['recent_submitted_prs'])}")
-        
-        # 近七天已合入PR的合入时长分析
-        merged_analysis = analysis_result['recent_merged_prs_analysis']
-        print(f"近七天已合入的PR数量: {merged_analysis['count']}")
-        if merged_analysis['count'] > 0:
-            print(f"平均合入时长: {merged_analysis['average_duration_days']} 天")
-            print(f"最短合入时长: {merged_analysis['min_duration_days']} 天")
-            print(f"最长合入时长: {merged_analysis['max_duration_days']} 天")
-        else:
-            print("近七天内没有已合入的PR")
-            
-        print(f"PR数据已保存到: {output_file}")
-        print("="*50)
-        
-    except Exception as e:
-        print(f"\n脚本执行过程中发生错误: {e}")
-        raise
+    options = load_sync_options(output_dir, config)
+    print(f"同步模式: {options['sync_mode']}")
+    
+    results, errors = collect_repositories(repositories, access_token, output_dir, options)
+    
+    api_stats = options["fetch_options"]["client"].stats
+    print(f"API请求 {api_stats['requests']} 次，其中 {api_stats['not_modified']} 次未变化(304)")
+    rate_limiter = options["fetch_options"]["rate_limiter"]
+    print(f"限流反馈 {rate_limiter.stats['throttled']} 次，最终请求速率 {rate_limiter.rate:.2f} 次/秒")
+    
+    for repo_conf in repositories:
+        if repo_conf["name"] in results:
+            print_summary(repo_conf, results[repo_conf["name"]], output_dir)
+    
+    if errors:
+        print(f"\n脚本执行过程中发生错误: {len(errors)} 个仓库同步失败 ({', '.join(errors)})")
+        raise next(iter(errors.values()))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+流水线耗时与性能剖析
+功能：按阶段、按API页面记录墙钟时间和CPU时间，可选开启cProfile/tracemalloc，
+并把指标写成JSON和Prometheus文本格式，便于定位一次刷新的时间花在API、分析、序列化还是渲染上
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+# 指标文件名（写在看板所在的输出目录）
+METRICS_JSON_FILE = "pipeline_metrics.json"
+METRICS_PROM_FILE = "pipeline_metrics.prom"
+
+# 剖析结果目录（相对输出目录）
+PROFILE_DIR = "profiles"
+
+# 可选的剖析模式
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+
+# Python 3.12起cProfile基于sys.monitoring，同一时刻只能有一个剖析器启用（它会同时覆盖所有线程）；
+# 更早的版本中剖析器只作用于启用它的线程，每个线程需要各自的剖析器
+_CONCURRENT_PROFILERS = sys.version_info < (3, 12)
+
+def parse_profile_modes(value: str) -> tuple:
+    """
+    解析PIPELINE_PROFILE环境变量：逗号分隔的cprofile/tracemalloc，"1"/"all"表示全部开启
+    """
+    value = (value or '').strip().lower()
+    if not value or value in ('0', 'false', 'no'):
+        return ()
+    if value in ('1', 'true', 'yes', 'all'):
+        return PROFILE_MODES
+    modes = tuple(mode.strip() for mode in value.split(',') if mode.strip())
+    unknown = [mode for mode in modes if mode not in PROFILE_MODES]
+    if unknown:
+        raise ValueError(f"未知的剖析模式: {', '.join(unknown)}（可选: {', '.join(PROFILE_MODES)}）")
+    return modes
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels) -> str:
+    items = [f'{key}="{_escape_label(value)}"' for key, value in labels.items() if value is not None]
+    return '{' + ','.join(items) + '}' if items else ''
+
+class PipelineMetrics:
+    """
+    线程安全的流水线指标收集器
+
+    stage()按(阶段, 仓库)累计墙钟时间和所在线程的CPU时间；record_page()记录每个API页面的耗时和重试次数。
+    profile_modes包含cprofile时，最外层的stage()开启cProfile剖析器，结束时合并输出：
+    Python 3.12之前每个线程各自开启一个；3.12起同一时刻只开启一个（已覆盖所有线程），其他线程的阶段不再重复开启
+    """
+    def __init__(self, profile_modes=()):
+        self.profile_modes = tuple(profile_modes)
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.pages = []
+        self.counters = {}
+        self.started_at = datetime.now()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._local = threading.local()
+        self._profiles = []
+        self._active_profilers = 0
+
+        if 'tracemalloc' in self.profile_modes and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str, repository: str = None):
+        """统计一个阶段的耗时：with metrics.stage("analyze", "owner/repo"): ..."""
+        depth = getattr(self._local, 'depth', 0)
+        profiler = self._start_profiler() if depth == 0 and 'cprofile' in self.profile_modes else None
+        self._local.depth = depth + 1
+
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+            self._local.depth = depth
+            if profiler:
+                profiler.disable()
+            with self.lock:
+                if profiler:
+                    self._active_profilers -= 1
+                entry = self.stages.setdefault((name, repository), {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0})
+                entry['calls'] += 1
+                entry['wall_seconds'] += wall
+                entry['cpu_seconds'] += cpu
+                if profiler:
+                    self._profiles.append(profiler)
+
+    def _start_profiler(self):
+        """开启一个cProfile剖析器，3.12起已有剖析器启用（本收集器或其他剖析工具）时返回None"""
+        with self.lock:
+            if self._active_profilers and not _CONCURRENT_PROFILERS:
+                return None
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # 其他剖析工具已占用sys.monitoring
+                return None
+            self._active_profilers += 1
+        return profiler
+
+    def record_page(self, repository: str, page: int, wall_seconds: float, cpu_seconds: float, retries: int = 0,
+                    items: int = None):
+        """记录一次API页面请求（含重试与限流等待）的耗时"""
+        with self.lock:
+            self.pages.append({
+                'repository': repository,
+                'page': page,
+                'wall_seconds': wall_seconds,
+                'cpu_seconds': cpu_seconds,
+                'retries': retries,
+                'items': items,
+            })
+
+    def increment(self, name: str, value: float = 1, repository: str = None):
+        """累加一个计数器（如PR数量、API字节数）"""
+        with self.lock:
+            key = (name, repository)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def _page_summary(self) -> dict:
+        summary = {}
+        for page in self.pages:
+            entry = summary.setdefault(page['repository'], {'pages': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                                                            'max_wall_seconds': 0.0, 'retries': 0})
+            entry['pages'] += 1
+            entry['wall_seconds'] += page['wall_seconds']
+            entry['cpu_seconds'] += page['cpu_seconds']
+            entry['max_wall_seconds'] = max(entry['max_wall_seconds'], page['wall_seconds'])
+            entry['retries'] += page['retries']
+        return summary
+
+    def to_dict(self) -> dict:
+        """导出为可写入JSON的字典"""
+        with self.lock:
+            stages = [
+                dict(stage=name, repository=repository, **{key: round(value, 6) if isinstance(value, float) else value
+                                                           for key, value in entry.items()})
+                for (name, repository), entry in self.stages.items()
+            ]
+            pages = [dict(page, wall_seconds=round(page['wall_seconds'], 6), cpu_seconds=round(page['cpu_seconds'], 6))
+                     for page in self.pages]
+            counters = [{'name': name, 'repository': repository, 'value': value}
+                        for (name, repository), value in self.counters.items()]
+            page_summary = self._page_summary()
+
+        return {
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'total_wall_seconds': round(time.perf_counter() - self._wall_start, 6),
+            'total_cpu_seconds': round(time.process_time() - self._cpu_start, 6),
+            'stages': stages,
+            'api_pages': page_summary,
+            'pages': pages,
+            'counters': counters,
+        }
+
+    def to_prometheus(self) -> str:
+        """导出为Prometheus文本格式（node_exporter textfile collector可直接采集）"""
+        data = self.to_dict()
+        lines = []
+
+        def metric(name, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(**labels)} {value}")
+
+        metric('pr_pipeline_wall_seconds', '整次运行的墙钟时间（秒）', [({}, data['total_wall_seconds'])])
+        metric('pr_pipeline_cpu_seconds', '整次运行的进程CPU时间（秒）', [({}, data['total_cpu_seconds'])])
+        metric('pr_pipeline_stage_wall_seconds', '各阶段的墙钟时间（秒）',
+               [({'stage': s['stage'], 'repository': s['repository']}, s['wall_seconds']) for s in data['stages']])
+        metric('pr_pipeline_stage_cpu_seconds', '各阶段所在线程的CPU时间（秒）',
+               [({'stage': s['stage'], 'repository': s['repository']}, s['cpu_seconds']) for s in data['stages']])
+        metric('pr_pipeline_stage_calls', '各阶段的执行次数',
+               [({'stage': s['stage'], 'repository': s['repository']}, s['calls']) for s in data['stages']])
+        pages = data['api_pages'].items()
+        metric('pr_pipeline_api_pages', '获取的API页面数',
+               [({'repository': repo}, entry['pages']) for repo, entry in pages])
+        metric('pr_pipeline_api_page_wall_seconds_sum', 'API页面请求的墙钟时间总和（秒，含重试与限流等待）',
+               [({'repository': repo}, round(entry['wall_seconds'], 6)) for repo, entry in pages])
+        metric('pr_pipeline_api_page_wall_seconds_max', '最慢的API页面请求耗时（秒）',
+               [({'repository': repo}, round(entry['max_wall_seconds'], 6)) for repo, entry in pages])
+        metric('pr_pipeline_api_page_retries', 'API页面请求的重试总次数',
+               [({'repository': repo}, entry['retries']) for repo, entry in pages])
+        # 同名计数器（不同仓库）合并为一个指标的多个样本
+        counters = {}
+        for counter in data['counters']:
+            counters.setdefault(counter['name'], []).append(({'repository': counter['repository']}, counter['value']))
+        for name, samples in counters.items():
+            metric(f"pr_pipeline_{name}", name, samples)
+        return '\n'.join(lines) + '\n'
+
+    def write(self, output_dir: str) -> tuple:
+        """在输出目录写入JSON与Prometheus格式的指标文件，返回两个文件路径"""
+        json_file = os.path.join(output_dir, METRICS_JSON_FILE)
+        prom_file = os.path.join(output_dir, METRICS_PROM_FILE)
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        with open(prom_file, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        return json_file, prom_file
+
+    def write_profiles(self, output_dir: str, top: int = 30) -> list:
+        """
+        写入剖析结果：cProfile合并后的.prof文件（可用snakeviz/pstats查看）与tracemalloc内存分配排行，返回文件列表
+        """
+        if not self.profile_modes:
+            return []
+        profile_dir = os.path.join(output_dir, PROFILE_DIR)
+        os.makedirs(profile_dir, exist_ok=True)
+        stamp = self.started_at.strftime('%Y%m%d_%H%M%S')
+        files = []
+
+        with self.lock:
+            profiles = list(self._profiles)
+        if profiles:
+            stats = pstats.Stats(profiles[0])
+            for profiler in profiles[1:]:
+                stats.add(profiler)
+            prof_file = os.path.join(profile_dir, f"cprofile_{stamp}.prof")
+            stats.dump_stats(prof_file)
+            files.append(prof_file)
+
+        if 'tracemalloc' in self.profile_modes and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            mem_file = os.path.join(profile_dir, f"tracemalloc_{stamp}.txt")
+            with open(mem_file, 'w', encoding='utf-8') as f:
+                f.write(f"当前内存: {current / 1024 / 1024:.2f} MB\n峰值内存: {peak / 1024 / 1024:.2f} MB\n\n")
+                f.write(f"内存分配最多的 {top} 处代码:\n")
+                for stat in snapshot.statistics('lineno')[:top]:
+                    f.write(f"{stat}\n")
+            files.append(mem_file)
+        return files
+
+    def summary_lines(self) -> list:
+        """耗时摘要（按阶段墙钟时间从高到低）"""
+        data = self.to_dict()
+        lines = [f"总耗时 {data['total_wall_seconds']:.2f}s（进程CPU {data['total_cpu_seconds']:.2f}s）"]
+        for entry in sorted(data['stages'], key=lambda s: s['wall_seconds'], reverse=True):
+            name = entry['stage'] if not entry['repository'] else f"{entry['stage']} [{entry['repository']}]"
+            lines.append(f"{name:<40} {entry['wall_seconds']:>9.3f}s  CPU {entry['cpu_seconds']:>8.3f}s  "
+                         f"x{entry['calls']}")
+        for repo, entry in data['api_pages'].items():
+            lines.append(f"API页面 [{repo}]: {entry['pages']} 页，合计 {entry['wall_seconds']:.2f}s，"
+                         f"最慢 {entry['max_wall_seconds']:.2f}s，重试 {entry['retries']} 次")
+        return lines
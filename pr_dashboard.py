@@ -1,8 +1,13 @@
 #!/usr/bin/env python3
+import html
 import json
 import os
 from datetime import datetime, timedelta
 
+from daily_index import DailyCountIndex
+from repo_config import INDEX_FILE, get_output_dir, load_repositories, repo_path
+from serialization import load_data, resolve_data_file
+
 def generate_pr_details_html(pr_details):
     """生成PR详情HTML"""
     if not pr_details:
@@ -26,8 +31,178 @@ def generate_pr_details_html(pr_details):
         """
     return html
 
-def generate_daily_chart_data(daily_submissions, daily_failed_submissions=None):
+def generate_duration_percentiles_html(duration_percentiles):
+    """生成各时间窗口合入/关闭时长分位数表格HTML"""
+    if not duration_percentiles:
+        return '<div style="text-align: center; color: #666; padding: 40px;">暂无数据</div>'
+    
+    def fmt(value):
+        return '-' if value is None else f'{value:.2f}'
+    
+    rows = ''
+    for days in sorted(duration_percentiles, key=int):
+        for kind, label in (('merge', '合入'), ('close', '关闭')):
+            stats = duration_percentiles[days].get(kind, {})
+            rows += f"""
+                <tr>
+                    <td>近{days}天</td><td>{label}</td><td>{stats.get('count', 0)}</td>
+                    <td>{fmt(stats.get('p50'))}</td><td>{fmt(stats.get('p75'))}</td>
+                    <td>{fmt(stats.get('p90'))}</td><td>{fmt(stats.get('p99'))}</td>
+                </tr>"""
+    return f"""
+            <table style="width: 100%; border-collapse: collapse; text-align: center;">
+                <tr style="color: #666; border-bottom: 2px solid #f0f0f0;">
+                    <th>创建时间窗口</th><th>类型</th><th>PR数</th><th>P50(天)</th><th>P75(天)</th><th>P90(天)</th><th>P99(天)</th>
+                </tr>{rows}
+            </table>"""
+
+def generate_review_metrics_html(review_metrics):
+    """生成首次评审/失败修复时延分位数表格HTML（开启PR详情补充时才有数据）"""
+    if not review_metrics:
+        return ''
+    
+    def fmt(value):
+        return '-' if value is None else f'{value:.1f}'
+    
+    rows = ''
+    latency = review_metrics.get('latency_percentiles', {})
+    for days in sorted(latency, key=int):
+        for kind, label in (('first_review', '首次评审'), ('failure_fix', '失败修复')):
+            stats = latency[days].get(kind, {})
+            rows += f"""
+                <tr>
+                    <td>近{days}天</td><td>{label}</td><td>{stats.get('count', 0)}</td>
+                    <td>{fmt(stats.get('p50'))}</td><td>{fmt(stats.get('p75'))}</td>
+                    <td>{fmt(stats.get('p90'))}</td><td>{fmt(stats.get('p99'))}</td>
+                </tr>"""
+    ever_failed = ' | '.join(f"近{days}天 {count} 个" for days, count in
+                             sorted(review_metrics.get('ever_failed', {}).items(), key=lambda item: int(item[0])))
+    return f"""
+        <div class="section">
+            <h2 class="section-title">👀 评审与失败修复时延</h2>
+            <table style="width: 100%; border-collapse: collapse; text-align: center;">
+                <tr style="color: #666; border-bottom: 2px solid #f0f0f0;">
+                    <th>创建时间窗口</th><th>类型</th><th>样本数</th><th>P50(小时)</th><th>P75(小时)</th><th>P90(小时)</th><th>P99(小时)</th>
+                </tr>{rows}
+            </table>
+            <div style="text-align: center; margin-top: 15px; color: #666; font-size: 0.9rem;">
+                待首次评审的open PR: {review_metrics.get('awaiting_first_review', 0)} 个 | 仍处于失败状态: {review_metrics.get('still_failing', 0)} 个 |
+                曾出现失败标签: {ever_failed or '-'}
+            </div>
+        </div>"""
+
+def generate_label_categories_html(label_categories):
+    """生成标签类别统计表HTML（只配置了默认的failed类别时不显示，失败数已在上方统计中）"""
+    if not label_categories or set(label_categories) <= {'failed'}:
+        return ''
+    
+    windows = sorted({days for stats in label_categories.values() for days in stats.get('created', {})}, key=int)
+    header = ''.join(f'<th>近{days}天创建</th>' for days in windows)
+    rows = ''
+    for category, stats in label_categories.items():
+        cells = ''.join(f"<td>{stats.get('created', {}).get(days, 0)}</td>" for days in windows)
+        rows += f"""
+                <tr><td>{html.escape(category)}</td><td>{stats.get('open', 0)}</td>{cells}</tr>"""
+    return f"""
+        <div class="section">
+            <h2 class="section-title">🏷️ 标签类别</h2>
+            <table style="width: 100%; border-collapse: collapse; text-align: center;">
+                <tr style="color: #666; border-bottom: 2px solid #f0f0f0;">
+                    <th>类别</th><th>待合入</th>{header}
+                </tr>{rows}
+            </table>
+        </div>"""
+
+def generate_rollup_html(rollups, top=15):
+    """
+    生成分维度统计表HTML：按粒度、周期、维度切片直接读取预先汇总的单元格（未开启汇总立方体时不显示）
+    """
+    if not rollups or not any(rollups.get('slices', {}).values()):
+        return ''
+
+    # 嵌入<script>的JSON中转义"</"，避免标签名等内容提前结束脚本
+    rollup_json = json.dumps(rollups['slices'], ensure_ascii=False).replace('</', '<\\/')
+    return f"""
+        <div class="section">
+            <h2 class="section-title">📊 分维度统计</h2>
+            <div style="text-align: center; margin-bottom: 15px;">
+                <select id="rollupGrain"><option value="week">按周</option><option value="month">按月</option></select>
+                <select id="rollupPeriod"></select>
+                <select id="rollupDimension">
+                    <option value="author">作者</option><option value="label">标签</option>
+                    <option value="target_branch">目标分支</option><option value="all">全仓库</option>
+                </select>
+            </div>
+            <table id="rollupTable" style="width: 100%; border-collapse: collapse; text-align: center;">
+                <tr style="color: #666; border-bottom: 2px solid #f0f0f0;">
+                    <th>取值</th><th>提交</th><th>合入</th><th>关闭</th><th>失败率</th>
+                    <th>平均合入(天)</th><th>P50(天)</th><th>P90(天)</th>
+                </tr>
+            </table>
+            <div style="text-align: center; margin-top: 15px; color: #666; font-size: 0.9rem;">
+                按创建时间所在周期统计，每个切片按提交数显示前{top}项
+            </div>
+        </div>
+        <script>
+            (function() {{
+                const slices = {rollup_json};
+                const grain = document.getElementById('rollupGrain');
+                const period = document.getElementById('rollupPeriod');
+                const dimension = document.getElementById('rollupDimension');
+                const table = document.getElementById('rollupTable');
+                const fmt = (value, digits) => value === null || value === undefined ? '-' : Number(value).toFixed(digits);
+
+                function fillPeriods() {{
+                    const periods = Object.keys(slices[grain.value] || {{}}).sort().reverse();
+                    period.innerHTML = '';
+                    periods.forEach(name => period.add(new Option(name, name)));
+                }}
+
+                function render() {{
+                    while (table.rows.length > 1) table.deleteRow(1);
+                    const cells = ((slices[grain.value] || {{}})[period.value] || {{}})[dimension.value] || {{}};
+                    Object.entries(cells).sort((a, b) => b[1].submitted - a[1].submitted).slice(0, {top}).forEach(([value, cell]) => {{
+                        const row = table.insertRow();
+                        [value === '*' ? '全部' : value, cell.submitted, cell.merged, cell.closed,
+                         cell.failure_rate === null ? '-' : fmt(cell.failure_rate * 100, 1) + '%',
+                         fmt(cell.avg_merge_days, 1), fmt(cell.p50_merge_days, 1), fmt(cell.p90_merge_days, 1)]
+                            .forEach(text => {{ row.insertCell().textContent = text; }});
+                    }});
+                }}
+
+                grain.addEventListener('change', () => {{ fillPeriods(); render(); }});
+                period.addEventListener('change', render);
+                dimension.addEventListener('change', render);
+                fillPeriods();
+                render();
+            }})();
+        </script>"""
+
+def generate_window_totals_html(daily_index, windows=(30, 90, 365)):
+    """生成长周期窗口的提交/合入汇总（来自逐日计数索引）"""
+    if daily_index is None:
+        return ''
+    # 超出本地数据完整范围的窗口不显示，避免少计
+    parts = [
+        f"近{days}天: 提交 {daily_index.window_total('submitted', days)} / 合入 {daily_index.window_total('merged', days)}"
+        for days in windows if daily_index.covers(days)
+    ]
+    if len(parts) < len(windows):
+        parts.append(f"本地数据自 {daily_index.covered_since.strftime('%Y-%m-%d')} 起完整，更长的窗口未显示")
+    return '<br>' + ' | '.join(parts)
+
+def generate_daily_chart_data(daily_submissions, daily_failed_submissions=None, daily_index=None, days=14):
     """生成每日提交折线图数据"""
+    if daily_index is not None:
+        # 直接从逐日计数索引读取，无需逐个解析日期字符串
+        today = datetime.now().date()
+        start = today - timedelta(days=days - 1)
+        return {
+            'labels': [(start + timedelta(days=i)).strftime('%m-%d') for i in range(days)],
+            'total_values': daily_index.daily_counts('submitted', start, today),
+            'failed_values': daily_index.daily_counts('failed', start, today)
+        }
+    
     if not daily_submissions:
         return {
             'labels': ['无数据'],
@@ -57,15 +232,26 @@ def generate_daily_chart_data(daily_submissions, daily_failed_submissions=None):
         'failed_values': failed_value_list
     }
 
-def generate_pr_dashboard():
+def generate_pr_dashboard(data_file=None, title="Triton Ascend"):
     """
-    基于PR分析数据生成HTML看板
+    读取PR分析数据文件并生成HTML看板
+    """
+    if data_file is None:
+        data_file = os.path.join(get_output_dir(), 'triton_ascend_prs_analysis.json')
+    
+    try:
+        # 读取PR分析数据（JSON、压缩JSON或MessagePack）
+        data = load_data(resolve_data_file(data_file))
+    except Exception as e:
+        return f"<h1>错误</h1><p>生成看板时出错: {e}</p>"
+    
+    return render_pr_dashboard(data, title)
+
+def render_pr_dashboard(data, title="Triton Ascend"):
+    """
+    基于内存中的PR分析数据（monitor.sync_repository的返回值或分析JSON的内容）生成HTML看板
     """
     try:
-        # 读取PR分析数据
-        with open('/home/runner/work/monitor_Gitcode_PR_efficiency/monitor_Gitcode_PR_efficiency/triton_ascend_prs_analysis.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
         merged_analysis = data['recent_merged_prs_analysis']
         
         # 准备统计数据
@@ -78,7 +264,8 @@ def generate_pr_dashboard():
             'min_duration': merged_analysis['min_duration_days'],
             'max_duration': merged_analysis['max_duration_days'],
             'daily_submissions': data['daily_submissions'],
-            'daily_failed_submissions': data.get('daily_failed_submissions', {})
+            'daily_failed_submissions': data.get('daily_failed_submissions', {}),
+            'daily_index': DailyCountIndex.from_dict(data['daily_index']) if data.get('daily_index') else None
         }
         
         # 计算失败PR统计
@@ -92,7 +279,7 @@ def generate_pr_dashboard():
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Triton Ascend PR效率看板</title>
+    <title>{html.escape(title)} PR效率看板</title>
     <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
     <style>
         * {{
@@ -264,7 +451,7 @@ def generate_pr_dashboard():
 <body>
     <div class="container">
         <div class="header">
-            <h1>🚀 Triton Ascend PR效率看板</h1>
+            <h1>🚀 {html.escape(title)} PR效率看板</h1>
             <p>实时监控Pull Request提交与合入效率</p>
         </div>
         
@@ -308,10 +495,18 @@ def generate_pr_dashboard():
                 <canvas id="dailyChart"></canvas>
             </div>
             <div style="text-align: center; margin-top: 15px; color: #666; font-size: 0.9rem;">
-                横轴：日期 | 纵轴：PR提交数量 | 总计: {sum(stats['daily_submissions'].values())} 个PR，失败: {sum(stats['daily_failed_submissions'].values())} 个
+                横轴：日期 | 纵轴：PR提交数量 | 总计: {sum(stats['daily_submissions'].values())} 个PR，失败: {sum(stats['daily_failed_submissions'].values())} 个{generate_window_totals_html(stats['daily_index'])}
             </div>
         </div>
         
+        <div class="section">
+            <h2 class="section-title">⏱️ 合入/关闭时长分位数</h2>
+            {generate_duration_percentiles_html(data.get('duration_percentiles', {}))}
+        </div>
+        {generate_review_metrics_html(data.get('review_metrics'))}
+        {generate_label_categories_html(data.get('label_categories'))}
+        {generate_rollup_html(data.get('rollups'))}
+
         <div class="section">
             <h2 class="section-title">⚡ 近期合入PR详情</h2>
             <div class="pr-list">
@@ -346,7 +541,7 @@ def generate_pr_dashboard():
             if (!ctx) return;
             
             // 准备图表数据
-            const chartData = {json.dumps(generate_daily_chart_data(stats['daily_submissions'], stats['daily_failed_submissions']))};
+            const chartData = {json.dumps(generate_daily_chart_data(stats['daily_submissions'], stats['daily_failed_submissions'], stats['daily_index']))};
             const dailyData = {{
                 labels: chartData.labels,
                 totalValues: chartData.total_values,
@@ -497,16 +692,102 @@ def generate_pr_dashboard():
     except Exception as e:
         return f"<h1>错误</h1><p>生成看板时出错: {e}</p>"
 
+def generate_index_html(entries):
+    """
+    生成多仓库看板索引页，entries为 [(仓库配置, 分析数据或None), ...]
+    """
+    rows = ''
+    for repo_conf, data in entries:
+        name = html.escape(repo_conf['title'])
+        link = html.escape(repo_conf['dashboard_file'])
+        if data is None:
+            rows += f"""
+            <tr><td><a href="{link}">{name}</a></td><td colspan="4">暂无数据</td></tr>"""
+            continue
+        merged_analysis = data['recent_merged_prs_analysis']
+        rows += f"""
+            <tr>
+                <td><a href="{link}">{name}</a></td>
+                <td>{data['total_open_prs']}</td>
+                <td>{len(data['recent_submitted_prs'])}</td>
+                <td>{merged_analysis['count']}</td>
+                <td>{merged_analysis['average_duration_days']:.1f}</td>
+            </tr>"""
+    
+    return f"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>PR效率看板总览</title>
+    <style>
+        body {{
+            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            min-height: 100vh;
+            padding: 20px;
+            margin: 0;
+        }}
+        .container {{
+            max-width: 1100px;
+            margin: 0 auto;
+            background: white;
+            border-radius: 15px;
+            padding: 30px;
+            box-shadow: 0 10px 30px rgba(0,0,0,0.1);
+        }}
+        h1 {{ color: #333; margin-bottom: 20px; }}
+        table {{ width: 100%; border-collapse: collapse; }}
+        th, td {{ padding: 12px; border-bottom: 1px solid #eee; text-align: left; }}
+        th {{ color: #666; font-size: 0.9rem; }}
+        a {{ color: #667eea; font-weight: bold; text-decoration: none; }}
+        .footer {{ margin-top: 20px; color: #888; font-size: 0.85rem; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>🚀 PR效率看板总览</h1>
+        <table>
+            <tr><th>仓库</th><th>待合入PR</th><th>近7天提交</th><th>近7天合入</th><th>平均合入时长(天)</th></tr>{rows}
+        </table>
+        <div class="footer">数据更新时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</div>
+    </div>
+</body>
+</html>"""
+
 def main():
-    # 生成HTML看板
-    html_content = generate_pr_dashboard()
+    output_dir = get_output_dir()
+    repositories = load_repositories()
+    index_entries = []
+    
+    for repo_conf in repositories:
+        data_file = repo_path(output_dir, repo_conf, 'data_file')
+        
+        # 读取一次分析数据，看板和索引页共用
+        try:
+            data = load_data(resolve_data_file(data_file))
+        except (OSError, ValueError, EOFError) as e:
+            data = None
+            html_content = f"<h1>错误</h1><p>生成看板时出错: {e}</p>"
+        else:
+            # 生成HTML看板
+            html_content = render_pr_dashboard(data, repo_conf['title'])
+        index_entries.append((repo_conf, data))
+        
+        # 保存到文件
+        output_file = repo_path(output_dir, repo_conf, 'dashboard_file')
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(html_content)
+        print(f"[成功] {repo_conf['title']} PR效率看板已生成: {output_file}")
     
-    # 保存到文件
-    output_file = 'triton_pr_dashboard.html'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    # 监控多个仓库时生成索引页
+    if len(repositories) > 1:
+        index_file = os.path.join(output_dir, INDEX_FILE)
+        with open(index_file, 'w', encoding='utf-8') as f:
+            f.write(generate_index_html(index_entries))
+        print(f"[成功] 看板索引页已生成: {index_file}")
+        output_file = index_file
     
-    print(f"[成功] PR效率看板已生成: {output_file}")
     print(f"[文件] 打开文件: {os.path.abspath(output_file)}")
     print(f"[浏览器] 在浏览器中打开该文件即可查看看板")
 
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+PR详情补充
+功能：列表接口不包含评审评论、CI运行和标签变更历史。本模块以有界并发逐个获取PR的评论和操作日志，
+提炼为首次评审时间、失败标签的出现/消除时段等摘要，按PR编号和updated_at缓存在PRStore中
+（PR未变化时不会再次请求），并据此统计首次评审时延和失败修复时延
+"""
+
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from label_rules import DEFAULT_LABEL_RULES, FAILED, get_classifier
+from quantile_sketch import DDSketch
+from timeutil import parse_timestamp
+
+# 每个PR获取的详情资源（相对 /api/v5/repos/{owner}/{repo}/ 的路径）
+DETAIL_RESOURCES = {
+    "comments": "pulls/{number}/comments",
+    "operate_logs": "pulls/{number}/operate_logs",
+}
+
+# 详情资源单页条数与最大页数
+DETAIL_PER_PAGE = 100
+DETAIL_MAX_PAGES = 10
+
+# 默认的详情获取并发数（与列表获取共享同一个限流器）
+DEFAULT_ENRICH_CONCURRENCY = 4
+
+# 机器人账号（CI、CLA检查等）的评论和操作不计为评审
+DEFAULT_BOT_PATTERN = r'bot|robot'
+
+# 操作日志中表示评审的关键字，以及表示移除标签的关键字
+_REVIEW_KEYWORDS = ('review', 'approve', 'lgtm', '评审', '审查', '审核', '批准')
+_REMOVE_KEYWORDS = ('remove', 'delete', 'unlabel', '删除', '移除', '去除')
+
+# 操作日志内容中的标签名候选按空白、引号和常见分隔符切分
+_LOG_TOKEN_SEPARATORS = re.compile(r'[\s"\'`,，:：;；()（）\[\]【】]+')
+
+def _login(user):
+    if isinstance(user, dict):
+        return user.get('login') or user.get('username') or user.get('name')
+    return user
+
+def _log_text(log: dict) -> str:
+    return ' '.join(str(log.get(key) or '') for key in ('action_type', 'action', 'content')).lower()
+
+def _is_failure_log(log: dict, text: str, classifier) -> bool:
+    """
+    操作日志是否涉及失败标签：日志带有标签字段时按标签名分类，否则把整段内容及其中的每个词作为标签名候选，
+    任一候选命中标签规则中的failed类别即可
+    """
+    bit = classifier.bits.get(FAILED, 0)
+    labels = log.get('labels') or log.get('label')
+    if labels:
+        return bool(classifier.classify(labels if isinstance(labels, list) else [labels]) & bit)
+    return any(classifier.match(candidate) & bit
+               for candidate in [text, *_LOG_TOKEN_SEPARATORS.split(text)] if candidate)
+
+def _parse(timestamp):
+    try:
+        return parse_timestamp(timestamp) if timestamp else None
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+def summarize_pr_details(pr, comments: list, operate_logs: list, bot_pattern: str = DEFAULT_BOT_PATTERN,
+                         classifier=None) -> dict:
+    """
+    把一个PR的评论和操作日志提炼为缓存摘要：
+
+    - comment_count: 评论数量
+    - first_review_at: 作者和机器人以外的用户第一次评论或评审操作的时间
+    - failure_periods: 失败标签的 [添加时间, 移除时间] 列表，尚未移除时移除时间为None
+
+    失败标签按classifier（默认label_rules.get_classifier()）中failed类别的规则识别
+    """
+    classifier = classifier or get_classifier()
+    author = pr.get('user')
+    if isinstance(author, dict):
+        author = author.get('login')
+    bot = re.compile(bot_pattern, re.IGNORECASE) if bot_pattern else None
+
+    def is_reviewer(user):
+        login = _login(user)
+        return bool(login) and login != author and not (bot and bot.search(login))
+
+    review_times = [_parse(comment.get('created_at')) for comment in comments if is_reviewer(comment.get('user'))]
+    events = sorted((log for log in operate_logs if _parse(log.get('created_at'))),
+                    key=lambda log: _parse(log['created_at']))
+    failure_periods = []
+    for log in events:
+        text = _log_text(log)
+        if is_reviewer(log.get('user')) and any(keyword in text for keyword in _REVIEW_KEYWORDS):
+            review_times.append(_parse(log['created_at']))
+        if not _is_failure_log(log, text, classifier):
+            continue
+        if any(keyword in text for keyword in _REMOVE_KEYWORDS):
+            if failure_periods and failure_periods[-1][1] is None:
+                failure_periods[-1][1] = log['created_at']
+        elif not failure_periods or failure_periods[-1][1] is not None:
+            failure_periods.append([log['created_at'], None])
+
+    review_times = [moment for moment in review_times if moment is not None]
+    first_review = min(review_times) if review_times else None
+    return {
+        "comment_count": len(comments),
+        "first_review_at": first_review.isoformat() if first_review else None,
+        "failure_periods": failure_periods,
+    }
+
+def _fetch_resource(client, url: str, access_token: str, fetch_options: dict) -> list:
+    """分页获取一个详情资源的全部条目"""
+    # 延迟导入，避免与monitor（分析时引用本模块）循环导入
+    from monitor import THROTTLE_MAX_RETRIES, _request_page
+
+    items = []
+    for page in range(1, DETAIL_MAX_PAGES + 1):
+        params = {"access_token": access_token, "page": page, "per_page": DETAIL_PER_PAGE}
+        body, _ = _request_page(client, url, params, fetch_options.get("max_retries", 3),
+                                fetch_options.get("retry_delay", 2), fetch_options.get("rate_limiter"), verbose=False,
+                                throttle_max_retries=fetch_options.get("throttle_max_retries", THROTTLE_MAX_RETRIES))
+        if not isinstance(body, list):
+            break
+        items.extend(body)
+        if len(body) < DETAIL_PER_PAGE:
+            break
+    return items
+
+def _cache_key(pr, classifier):
+    """
+    缓存键：PR的updated_at；failed类别的规则不是默认规则时附加规则内容，规则变化后摘要会重新计算
+    """
+    key = pr.get('updated_at') or pr.get('created_at')
+    rules = classifier.rules.get(FAILED)
+    if rules != DEFAULT_LABEL_RULES[FAILED]:
+        key = f"{key}#{json.dumps(rules, ensure_ascii=False, sort_keys=True)}"
+    return key
+
+def enrich_prs(owner: str, repo: str, access_token: str, prs: list, store, fetch_options: dict,
+               max_workers: int = DEFAULT_ENRICH_CONCURRENCY, bot_pattern: str = DEFAULT_BOT_PATTERN,
+               metrics=None, classifier=None) -> dict:
+    """
+    为prs补充详情摘要，返回 {编号: 详情摘要}
+
+    缓存中updated_at与PR一致的直接使用，其余以max_workers个线程并发获取（共享fetch_options中的客户端和限流器）
+    并写回缓存；access_token为None时只使用缓存（离线模式）。某个资源返回404（接口不可用）时本次运行不再请求该资源
+    """
+    from monitor import get_api_base
+
+    classifier = classifier or get_classifier()
+    repository = f"{owner}/{repo}"
+    cached = store.get_details()
+    details, missing = {}, []
+    for pr in prs:
+        entry = cached.get(pr['number'])
+        if entry is not None and entry[0] == _cache_key(pr, classifier):
+            details[pr['number']] = entry[1]
+        elif access_token is not None:
+            missing.append(pr)
+
+    if metrics:
+        metrics.increment("enrich_cache_hits", len(details), repository)
+    if not missing:
+        print(f"[{repository}] PR详情: 缓存命中 {len(details)} 个，无需请求")
+        return details
+
+    client = fetch_options["client"]
+    base_url = f"{(fetch_options.get('api_base') or get_api_base()).rstrip('/')}/api/v5/repos/{owner}/{repo}/"
+    unavailable = set()
+
+    def fetch(pr):
+        resources = {}
+        for name, path in DETAIL_RESOURCES.items():
+            if name in unavailable:
+                resources[name] = []
+                continue
+            try:
+                resources[name] = _fetch_resource(client, base_url + path.format(number=pr['number']), access_token,
+                                                  fetch_options)
+            except requests.exceptions.HTTPError as e:
+                if e.response is None or e.response.status_code != 404:
+                    raise
+                unavailable.add(name)
+                resources[name] = []
+        return summarize_pr_details(pr, resources["comments"], resources["operate_logs"], bot_pattern,
+                                    classifier)
+
+    fetched, failed = {}, 0
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {executor.submit(fetch, pr): pr for pr in missing}
+        for future in as_completed(futures):
+            pr = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[{repository}] 获取PR #{pr['number']} 详情失败，下次运行时重试: {e}")
+                continue
+            fetched[pr['number']] = (_cache_key(pr, classifier), summary)
+            details[pr['number']] = summary
+
+    store.save_details(fetched)
+    if unavailable:
+        print(f"[{repository}] 警告：API不支持 {', '.join(sorted(unavailable))}，相关指标可能不完整")
+    print(f"[{repository}] PR详情: 缓存命中 {len(prs) - len(missing)} 个，新获取 {len(fetched)} 个，失败 {failed} 个")
+    if metrics:
+        metrics.increment("enriched_prs", len(fetched), repository)
+    return details
+
+def summarize_review_metrics(pr_list: list, details: dict, windows, quantiles, now: datetime = None) -> dict:
+    """
+    基于详情摘要统计各创建时间窗口内的首次评审时延和失败修复时延（小时）
+
+    返回 {"enriched_prs", "awaiting_first_review", "still_failing", "ever_failed": {窗口: 数量},
+    "latency_percentiles": {窗口: {"first_review": 摘要, "failure_fix": 摘要}}}；
+    ever_failed统计曾经带过失败标签的PR（is_failed_pr只能看到当前标签）
+    """
+    now = now or datetime.now(timezone.utc)
+    window_starts = [(days, now - timedelta(days=days)) for days in windows]
+    widest_start = min(start for _, start in window_starts)
+    sketches = {days: {"first_review": DDSketch(), "failure_fix": DDSketch()} for days in windows}
+    ever_failed = {days: 0 for days in windows}
+    enriched = awaiting = still_failing = 0
+
+    for pr in pr_list:
+        summary = details.get(pr['number'])
+        created_at = _parse(pr['created_at'])
+        if summary is None or created_at is None:
+            continue
+        enriched += 1
+        periods = summary.get("failure_periods") or []
+        if pr['state'] == 'open':
+            if not summary.get("first_review_at"):
+                awaiting += 1
+            if periods and periods[-1][1] is None:
+                still_failing += 1
+        if created_at < widest_start:
+            continue
+
+        first_review_at = _parse(summary.get("first_review_at"))
+        fix_hours = []
+        for started, ended in periods:
+            started, ended = _parse(started), _parse(ended)
+            if started and ended and ended >= started:
+                fix_hours.append((ended - started).total_seconds() / 3600)
+        for days, start in window_starts:
+            if created_at < start:
+                continue
+            if first_review_at and first_review_at >= created_at:
+                sketches[days]["first_review"].add((first_review_at - created_at).total_seconds() / 3600)
+            for hours in fix_hours:
+                sketches[days]["failure_fix"].add(hours)
+            if periods:
+                ever_failed[days] += 1
+
+    return {
+        "enriched_prs": enriched,
+        "awaiting_first_review": awaiting,
+        "still_failing": still_failing,
+        "ever_failed": {str(days): count for days, count in ever_failed.items()},
+        "latency_percentiles": {
+            str(days): {kind: sketch.summary(quantiles) for kind, sketch in kinds.items()}
+            for days, kinds in sketches.items()
+        },
+    }
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+PR快照历史
+功能：每次同步后把本次内容有变化的PR（与存储中之前的记录比较）作为增量追加到日志（log.ndjson），
+每隔若干次写一个完整检查点（不可变的压缩文件），并从相邻快照推导出状态变化和标签增删事件。
+记录快照时只从日志末尾向前读到最近的检查点，不重放日志，也不在内存中保留完整数据集。
+日志中每条记录都带有当时的状态计数，按月查看待合入数量趋势只需顺序读取日志；
+还原任意时刻的数据集只需读取一个检查点并重放其后的少量增量
+
+用法：
+    python pr_history.py trend --repo triton_ascend
+    python pr_history.py events --repo triton_ascend --since 2026-01-01 --kind state
+    python pr_history.py state --repo triton_ascend --at 2026-01-15
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+from pr_record import PRRecord
+from repo_config import get_output_dir, load_repositories, repo_path
+from serialization import dump_data_stream, load_data
+from timeutil import parse_timestamp
+
+# 日志文件名与检查点文件名（位于每个仓库的历史目录中）
+LOG_FILE = "log.ndjson"
+CHECKPOINT_FILE = "checkpoint_{seq:06d}.json.gz"
+
+# 每隔多少次增量写一个完整检查点
+DEFAULT_CHECKPOINT_INTERVAL = 30
+
+# 单次变化的PR超过数据集的该比例时直接写检查点
+CHECKPOINT_CHANGE_RATIO = 0.5
+
+# 从日志末尾向前读取时每次读取的字节数
+_TAIL_BLOCK_SIZE = 64 * 1024
+
+def _pr_dict(pr) -> dict:
+    return pr.to_dict() if isinstance(pr, PRRecord) else dict(pr)
+
+def _label_set(pr: dict) -> set:
+    return {label['name'] if isinstance(label, dict) else label for label in pr.get('labels') or ()}
+
+def _parse_entry(line):
+    """解析一行日志，空行或写入中断留下的不完整行返回None"""
+    if not line.strip():
+        return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+def store_counts(store) -> dict:
+    """存储中当前数据集的状态计数（与_state_counts的字段一致）"""
+    counts = {'total_prs': store.count()}
+    for state in ('open', 'merged', 'closed'):
+        counts[state] = store.count(state)
+    counts['total_open_prs'] = counts['open']
+    return counts
+
+def _state_counts(state: dict) -> dict:
+    counts = {'total_prs': len(state), 'open': 0, 'merged': 0, 'closed': 0}
+    for pr in state.values():
+        if pr.get('state') in counts:
+            counts[pr['state']] += 1
+    counts['total_open_prs'] = counts['open']
+    return counts
+
+def _transition_time(pr: dict, state: str) -> str:
+    if state == 'merged':
+        return pr.get('merged_at') or pr.get('updated_at')
+    if state == 'closed':
+        return pr.get('closed_at') or pr.get('updated_at')
+    return pr.get('updated_at')
+
+def diff_events(previous, current: dict) -> list:
+    """
+    由同一PR的相邻两个快照推导事件：opened（新出现的PR）、state（状态变化）、label_added/label_removed
+
+    previous为None表示PR首次出现
+    """
+    number = current['number']
+    events = []
+    if previous is None:
+        events.append({'number': number, 'kind': 'opened', 'at': current.get('created_at')})
+        if current.get('state') and current['state'] != 'open':
+            events.append({'number': number, 'kind': 'state', 'from': 'open', 'to': current['state'],
+                           'at': _transition_time(current, current['state'])})
+        previous_labels = set()
+    else:
+        if previous.get('state') != current.get('state'):
+            events.append({'number': number, 'kind': 'state', 'from': previous.get('state'), 'to': current.get('state'),
+                           'at': _transition_time(current, current.get('state'))})
+        previous_labels = _label_set(previous)
+
+    current_labels = _label_set(current)
+    for label in sorted(current_labels - previous_labels):
+        events.append({'number': number, 'kind': 'label_added', 'label': label, 'at': current.get('updated_at')})
+    for label in sorted(previous_labels - current_labels):
+        events.append({'number': number, 'kind': 'label_removed', 'label': label, 'at': current.get('updated_at')})
+    return events
+
+class PRHistory:
+    """
+    单个仓库的快照历史
+
+    日志每行一条记录：{"seq", "at", "type": "checkpoint"|"delta", "counts", ...}，
+    checkpoint记录指向完整快照文件，delta记录包含upserts（变化后的PR）和events；
+    存储不会删除PR，旧日志中delta记录的deletes（消失的PR编号）在重放时仍然生效
+    """
+    def __init__(self, history_dir: str, checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL):
+        self.history_dir = history_dir
+        self.checkpoint_interval = checkpoint_interval
+        self.log_file = os.path.join(history_dir, LOG_FILE)
+
+    def entries(self) -> list:
+        """读取全部日志记录（不含检查点内容）"""
+        if not os.path.exists(self.log_file):
+            return []
+        with open(self.log_file, 'r', encoding='utf-8') as f:
+            return [entry for entry in map(_parse_entry, f) if entry is not None]
+
+    def _reversed_entries(self):
+        """从日志末尾向前逐条读取记录"""
+        if not os.path.exists(self.log_file):
+            return
+        with open(self.log_file, 'rb') as f:
+            position = f.seek(0, os.SEEK_END)
+            head = b''
+            while position > 0:
+                size = min(_TAIL_BLOCK_SIZE, position)
+                position -= size
+                f.seek(position)
+                lines = (f.read(size) + head).split(b'\n')
+                # 第一行可能不完整，与前一个块拼接后再解析
+                head = lines.pop(0)
+                for line in reversed(lines):
+                    entry = _parse_entry(line)
+                    if entry is not None:
+                        yield entry
+            entry = _parse_entry(head)
+            if entry is not None:
+                yield entry
+
+    def _tail(self) -> tuple:
+        """返回 (最后一条记录的seq, 最近的检查点之后的增量记录数)，日志为空时seq为None"""
+        last_seq, deltas = None, 0
+        for entry in self._reversed_entries():
+            if last_seq is None:
+                last_seq = entry['seq']
+            if entry['type'] == 'checkpoint':
+                break
+            deltas += 1
+        return last_seq, deltas
+
+    def _load_checkpoint(self, entry: dict) -> dict:
+        data = load_data(os.path.join(self.history_dir, entry['file']))
+        return {pr['number']: pr for pr in data['prs']}
+
+    def _replay(self, entries: list) -> dict:
+        """从最后一个检查点开始重放entries，返回 {编号: PR字典}"""
+        start = max((i for i, entry in enumerate(entries) if entry['type'] == 'checkpoint'), default=None)
+        if start is None:
+            return {}
+        state = self._load_checkpoint(entries[start])
+        for entry in entries[start + 1:]:
+            for pr in entry.get('upserts', ()):
+                state[pr['number']] = pr
+            for number in entry.get('deletes', ()):
+                state.pop(number, None)
+        return state
+
+    def state_at(self, when: datetime = None) -> dict:
+        """还原when时刻（默认最新）的数据集，返回 {编号: PR字典}；when早于第一条记录时返回空字典"""
+        entries = self.entries()
+        if when is not None:
+            entries = [entry for entry in entries if parse_timestamp(entry['at']) <= when]
+        return self._replay(entries)
+
+    def trend(self, metric: str = 'total_open_prs', since: datetime = None) -> list:
+        """某个计数在各次快照时的取值 [(时间, 值), ...]，只读取日志不重放快照"""
+        return [(entry['at'], entry['counts'].get(metric)) for entry in self.entries()
+                if since is None or parse_timestamp(entry['at']) >= since]
+
+    def events(self, since: datetime = None, until: datetime = None, kinds=None, number: int = None) -> list:
+        """按快照顺序返回事件，可按事件时间、类型和PR编号过滤"""
+        result = []
+        for entry in self.entries():
+            for event in entry.get('events', ()):
+                if kinds and event['kind'] not in kinds:
+                    continue
+                if number is not None and event['number'] != number:
+                    continue
+                if since or until:
+                    at = parse_timestamp(event['at']) if event.get('at') else parse_timestamp(entry['at'])
+                    if (since and at < since) or (until and at > until):
+                        continue
+                result.append(dict(event, snapshot_at=entry['at']))
+        return result
+
+    def _append(self, entry: dict):
+        with open(self.log_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+    def record(self, changes, counts: dict, snapshot, at: datetime = None) -> dict:
+        """
+        记录一次快照，返回追加的日志记录
+
+        changes为本次内容有变化的PR [(之前的PR或None, 现在的PR), ...]（见PRStore.upsert_prs的changes），
+        counts为当前数据集的状态计数，snapshot为返回当前全部PR的函数（逐条写出，只在写检查点时调用）。
+        第一次记录、距上一个检查点已有checkpoint_interval次增量、或变化的PR超过一半时写完整检查点，
+        否则只追加增量；两种记录都包含由变化前后的PR推导出的事件（第一次记录没有事件）
+        """
+        os.makedirs(self.history_dir, exist_ok=True)
+        at = (at or datetime.now(timezone.utc)).isoformat(timespec='seconds')
+        last_seq, since_checkpoint = self._tail()
+
+        upserts, events = [], []
+        for previous, current in changes:
+            previous = _pr_dict(previous) if previous is not None else None
+            current = _pr_dict(current)
+            if previous == current:
+                continue
+            upserts.append(current)
+            if last_seq is not None:
+                events.extend(diff_events(previous, current))
+
+        seq = 0 if last_seq is None else last_seq + 1
+        entry = {'seq': seq, 'at': at, 'counts': counts}
+        if last_seq is None or since_checkpoint >= self.checkpoint_interval or \
+                len(upserts) > CHECKPOINT_CHANGE_RATIO * max(counts['total_prs'], 1):
+            entry['type'] = 'checkpoint'
+            entry['file'] = CHECKPOINT_FILE.format(seq=seq)
+            entry['changed'] = len(upserts)
+            dump_data_stream({'seq': seq, 'at': at}, 'prs', map(_pr_dict, snapshot()),
+                             os.path.join(self.history_dir, entry['file']))
+        else:
+            entry['type'] = 'delta'
+            entry['upserts'] = upserts
+        entry['events'] = events
+        self._append(entry)
+        return entry
+
+def record_history(repo_conf: dict, output_dir: str, store, changes, metrics=None) -> dict:
+    """
+    按仓库配置记录一次快照（见PRHistory.record），计数和检查点内容来自store中的当前数据集
+    """
+    repository = f"{repo_conf['owner']}/{repo_conf['repo']}"
+    interval = int(os.environ.get("HISTORY_CHECKPOINT_INTERVAL", DEFAULT_CHECKPOINT_INTERVAL))
+    history = PRHistory(repo_path(output_dir, repo_conf, "history_dir"), checkpoint_interval=interval)
+    if metrics is None:
+        return history.record(changes, store_counts(store), store.iter_prs)
+    with metrics.stage("history", repository):
+        entry = history.record(changes, store_counts(store), store.iter_prs)
+    metrics.increment("history_events", len(entry['events']), repository)
+    return entry
+
+def _parse_date(value: str, end: bool = False) -> datetime:
+    parsed = parse_timestamp(value)
+    # 只给日期时，截止时间和时间点按当天结束计算（还原"某天的状态"），起始时间为当天开始
+    if end and len(value) <= 10:
+        parsed = parsed.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return parsed
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="PR快照历史查询")
+    arg_parser.add_argument("command", choices=("trend", "events", "state"),
+                            help="trend: 计数趋势；events: 状态/标签事件；state: 还原某一时刻的统计")
+    arg_parser.add_argument("--repo", help="仓库name（repos.json中的name），默认第一个仓库")
+    arg_parser.add_argument("--metric", default="total_open_prs", help="trend的计数：total_open_prs/total_prs/merged/closed")
+    arg_parser.add_argument("--since", help="起始时间（ISO 8601日期或时间）")
+    arg_parser.add_argument("--until", help="events的截止时间")
+    arg_parser.add_argument("--at", help="state的时间点，默认最新")
+    arg_parser.add_argument("--kind", action="append", help="events的事件类型，可重复指定")
+    arg_parser.add_argument("--number", type=int, help="events只看某个PR")
+    args = arg_parser.parse_args()
+
+    repositories = load_repositories()
+    repo_conf = next((conf for conf in repositories if conf['name'] == args.repo), None) if args.repo \
+        else repositories[0]
+    if repo_conf is None:
+        print(f"错误：未找到仓库 {args.repo}")
+        return 1
+    history = PRHistory(repo_path(get_output_dir(), repo_conf, "history_dir"))
+
+    if args.command == "trend":
+        for at, value in history.trend(args.metric, _parse_date(args.since) if args.since else None):
+            print(f"{at}  {value}")
+    elif args.command == "events":
+        for event in history.events(_parse_date(args.since) if args.since else None,
+                                    _parse_date(args.until, end=True) if args.until else None, args.kind, args.number):
+            detail = f"{event.get('from')} -> {event.get('to')}" if event['kind'] == 'state' else event.get('label', '')
+            print(f"{event.get('at') or event['snapshot_at']}  #{event['number']:<6} {event['kind']:<14} {detail}")
+    else:
+        state = history.state_at(_parse_date(args.at, end=True) if args.at else None)
+        counts = _state_counts(state)
+        print(json.dumps(counts, ensure_ascii=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+PR数据查询
+功能：按状态、作者、标签、标签类别、目标分支、是否失败和各时间字段的范围过滤本地PR数据集，
+可按维度或创建周期分组聚合，输出为表格、CSV或JSON。
+查询前一次性建立内存索引：每个时间字段按时间戳排序的数组（范围条件用二分查找）和
+状态/作者/标签/目标分支的倒排索引（取值 -> PR位置集合），过滤只对候选集合求交集，不遍历全部PR；
+--shell模式下索引只建立一次，可以连续执行多条查询
+
+用法：
+    python pr_query.py --author alice --target-branch main --failed --created-since 2026-09-01 --created-until 2026-09-30
+    python pr_query.py --state merged --merged-since 2026-01-01 --group-by author --format csv
+    python pr_query.py --label ci-pipeline-failed --group-by month --group-by target_branch
+    python pr_query.py --author alice --list
+    python pr_query.py --category blocked --group-by author
+    python pr_query.py --shell
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import shlex
+import sys
+import time
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+from label_rules import FAILED, get_classifier
+from monitor import load_existing_prs
+from pr_record import project_pr
+from pr_store import PRStore
+from quantile_sketch import DDSketch
+from repo_config import get_output_dir, load_repositories, repo_path
+from rollup_cube import period_key
+from timeutil import parse_timestamp
+
+# 支持范围过滤的时间字段
+TIME_FIELDS = ('created_at', 'updated_at', 'merged_at', 'closed_at')
+
+# 建立倒排索引的字段
+TERM_FIELDS = ('state', 'author', 'label', 'category', 'target_branch')
+
+# 分组维度：倒排索引字段，以及按创建时间划分的周/月
+GROUP_FIELDS = TERM_FIELDS + ('week', 'month')
+
+# 聚合输出的度量列
+AGGREGATE_COLUMNS = ('count', 'open', 'merged', 'closed', 'failed', 'failure_rate',
+                     'avg_merge_days', 'p50_merge_days', 'p90_merge_days')
+
+# 明细输出的列
+LIST_COLUMNS = ('number', 'state', 'author', 'target_branch', 'created_at', 'merged_at', 'failed', 'categories',
+                'title')
+
+# 缺少作者、标签等取值时的分组名
+NONE_VALUE = '(无)'
+
+def _epoch(timestamp):
+    try:
+        return parse_timestamp(timestamp).timestamp() if timestamp else None
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+def index_row(pr) -> tuple:
+    """把一个PR（API对象、精简字典或PRRecord）转换为与PRStore.index_rows()相同的列"""
+    record = project_pr(pr)
+    return (record.number, record.state, _epoch(record.created_at), _epoch(record.updated_at),
+            _epoch(record.merged_at), _epoch(record.closed_at), record.user, record.target_branch,
+            tuple(record.labels or ()), record.created_at, record.merged_at, record.title)
+
+class PRIndex:
+    """
+    PR查询索引
+
+    PR按加载顺序编号为位置0..n-1，各列按位置保存；times为 {时间字段: (升序时间戳, 对应位置)}，
+    terms为 {字段: {取值: 位置集合}}，failed为失败PR的位置集合；标签类别按classifier（默认分类器）划分
+    """
+    def __init__(self, rows, classifier=None):
+        self.classifier = classifier or get_classifier()
+        failed_bit = self.classifier.bits.get(FAILED, 0)
+        self.numbers, self.states, self.authors, self.branches = [], [], [], []
+        self.labels, self.created_at, self.merged_at, self.titles = [], [], [], []
+        self.created_days, self.merge_days, self.categories = [], [], []
+        self.terms = {field: {} for field in TERM_FIELDS}
+        self.failed = set()
+        epochs = {field: [] for field in TIME_FIELDS}
+
+        for position, row in enumerate(rows):
+            number, state, created, updated, merged, closed, author, branch, labels, created_at, merged_at, title = row
+            self.numbers.append(number)
+            self.states.append(state)
+            self.authors.append(author)
+            self.branches.append(branch)
+            self.labels.append(labels)
+            self.created_at.append(created_at)
+            self.merged_at.append(merged_at)
+            self.titles.append(title)
+            for field, epoch in zip(TIME_FIELDS, (created, updated, merged, closed)):
+                if epoch is not None:
+                    epochs[field].append((epoch, position))
+            # 周期按创建时间在其自身时区下的日期划分（与汇总立方体一致）
+            try:
+                self.created_days.append(parse_timestamp(created_at).date() if created_at else None)
+            except (ValueError, TypeError, OverflowError):
+                self.created_days.append(None)
+            self.merge_days.append(max((merged - created) / 86400, 0.0)
+                                   if state == 'merged' and merged is not None and created is not None else None)
+
+            mask = self.classifier.classify(labels)
+            categories = self.classifier.categories_of(mask) if mask else []
+            self.categories.append(categories)
+            for field, values in (('state', (state,)), ('author', (author,)), ('label', labels),
+                                  ('category', categories), ('target_branch', (branch,))):
+                for value in values:
+                    if value:
+                        self.terms[field].setdefault(value, set()).add(position)
+            if mask & failed_bit:
+                self.failed.add(position)
+
+        self.times = {}
+        for field, pairs in epochs.items():
+            pairs.sort()
+            self.times[field] = ([epoch for epoch, _ in pairs], [position for _, position in pairs])
+
+    @classmethod
+    def from_store(cls, store: PRStore) -> 'PRIndex':
+        return cls(store.index_rows())
+
+    @classmethod
+    def from_prs(cls, prs) -> 'PRIndex':
+        return cls(index_row(pr) for pr in prs)
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def _range(self, field: str, since: float = None, until: float = None) -> set:
+        epochs, positions = self.times[field]
+        start = bisect_left(epochs, since) if since is not None else 0
+        end = bisect_right(epochs, until) if until is not None else len(epochs)
+        return set(positions[start:end])
+
+    def select(self, terms: dict = None, ranges: dict = None, failed: bool = None) -> list:
+        """
+        返回满足全部条件的PR位置（按PR编号倒序）
+
+        terms为 {字段: [取值]}，同一字段的多个取值之间为"或"，不同条件之间为"且"；
+        ranges为 {时间字段: (起始时间戳, 截止时间戳)}，端点为None表示不限；failed为None时不按失败状态过滤
+        """
+        candidates = []
+        for field, values in (terms or {}).items():
+            if values:
+                index = self.terms[field]
+                candidates.append(set().union(*(index.get(value, ()) for value in values)))
+        for field, (since, until) in (ranges or {}).items():
+            if since is not None or until is not None:
+                candidates.append(self._range(field, since, until))
+        if failed is True:
+            candidates.append(self.failed)
+
+        if candidates:
+            # 从最小的候选集合开始求交集
+            candidates.sort(key=len)
+            matched = set(candidates[0])
+            for candidate in candidates[1:]:
+                matched &= candidate
+                if not matched:
+                    break
+        else:
+            matched = set(range(len(self.numbers)))
+        if failed is False:
+            matched -= self.failed
+        return sorted(matched, key=lambda position: self.numbers[position], reverse=True)
+
+    def _group_values(self, position: int, field: str) -> list:
+        if field == 'label':
+            return list(self.labels[position]) or [NONE_VALUE]
+        if field == 'category':
+            return self.categories[position] or [NONE_VALUE]
+        if field in ('week', 'month'):
+            day = self.created_days[position]
+            return [period_key(day, field) if day else NONE_VALUE]
+        value = {'state': self.states, 'author': self.authors, 'target_branch': self.branches}[field][position]
+        return [value or NONE_VALUE]
+
+    @staticmethod
+    def _new_group() -> dict:
+        return {'count': 0, 'open': 0, 'merged': 0, 'closed': 0, 'failed': 0, 'merge_days_sum': 0.0,
+                'sketch': DDSketch()}
+
+    def aggregate(self, positions, group_by=()) -> list:
+        """
+        按group_by中的字段分组统计，返回行字典列表；按标签/类别分组时带多个标签的PR计入每个标签/类别
+        """
+        groups = {}
+        if not group_by:
+            # 不分组时即使没有匹配的PR也输出一行（各计数为0）
+            groups[()] = self._new_group()
+        for position in positions:
+            values = [self._group_values(position, field) for field in group_by]
+            for key in itertools.product(*values):
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = self._new_group()
+                group['count'] += 1
+                if self.states[position] in ('open', 'merged', 'closed'):
+                    group[self.states[position]] += 1
+                if position in self.failed:
+                    group['failed'] += 1
+                if self.merge_days[position] is not None:
+                    group['merge_days_sum'] += self.merge_days[position]
+                    group['sketch'].add(self.merge_days[position])
+
+        rows = []
+        for key, group in groups.items():
+            sketch = group.pop('sketch')
+            merge_days_sum = group.pop('merge_days_sum')
+            durations = sketch.summary((0.5, 0.9))
+            rows.append({
+                **dict(zip(group_by, key)),
+                **group,
+                'failure_rate': round(group['failed'] / group['count'], 4) if group['count'] else None,
+                'avg_merge_days': round(merge_days_sum / durations['count'], 2) if durations['count'] else None,
+                'p50_merge_days': durations['p50'],
+                'p90_merge_days': durations['p90'],
+            })
+        return rows
+
+    def details(self, positions) -> list:
+        """匹配PR的明细行"""
+        return [{
+            'number': self.numbers[position],
+            'state': self.states[position],
+            'author': self.authors[position],
+            'target_branch': self.branches[position],
+            'created_at': self.created_at[position],
+            'merged_at': self.merged_at[position],
+            'failed': position in self.failed,
+            'categories': ','.join(self.categories[position]),
+            'title': self.titles[position],
+        } for position in positions]
+
+def _display_width(text: str) -> int:
+    return sum(2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1 for char in text)
+
+def _cell(value) -> str:
+    if value is None or value == '':
+        return '-'
+    if isinstance(value, bool):
+        return 'Y' if value else ''
+    return str(value)
+
+def _sort_key(value) -> tuple:
+    """倒序排序的键：空值（None或空字符串）排在最后；同一列的非空值类型一致，可直接比较"""
+    if value is None or value == '':
+        return (False,)
+    return (True, value)
+
+def format_rows(rows: list, columns: list, fmt: str = 'table') -> str:
+    """把行字典列表格式化为表格（按显示宽度对齐，兼容中文）、CSV或JSON"""
+    if fmt == 'json':
+        return json.dumps([{column: row.get(column) for column in columns} for row in rows], ensure_ascii=False,
+                          indent=2)
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(columns)
+        writer.writerows([['' if row.get(column) is None else row.get(column) for column in columns] for row in rows])
+        return buffer.getvalue().rstrip('\n')
+
+    cells = [[_cell(row.get(column)) for column in columns] for row in rows]
+    widths = [max([_display_width(column)] + [_display_width(line[i]) for line in cells])
+              for i, column in enumerate(columns)]
+
+    def render(values):
+        return '  '.join(value + ' ' * (width - _display_width(value))
+                         for value, width in zip(values, widths)).rstrip()
+
+    lines = [render(columns), render(['-' * width for width in widths])]
+    lines.extend(render(line) for line in cells)
+    return '\n'.join(lines)
+
+def _parse_date(value: str, end: bool = False) -> float:
+    parsed = parse_timestamp(value)
+    # 只给日期时，截止时间按当天结束计算
+    if end and len(value) <= 10:
+        parsed = parsed.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return parsed.timestamp()
+
+def build_parser() -> argparse.ArgumentParser:
+    """查询参数（命令行和--shell模式中的每一行共用）"""
+    arg_parser = argparse.ArgumentParser(description="PR数据查询：过滤、分组聚合，输出表格/CSV/JSON")
+    arg_parser.add_argument("--state", action="append", choices=("open", "merged", "closed"), help="PR状态，可重复指定")
+    arg_parser.add_argument("--author", action="append", help="作者登录名，可重复指定")
+    arg_parser.add_argument("--label", action="append", help="标签名，可重复指定（带其中任一标签即匹配）")
+    arg_parser.add_argument("--category", action="append", help="标签类别（见label_rules），可重复指定")
+    arg_parser.add_argument("--target-branch", action="append", help="目标分支，可重复指定")
+    failed = arg_parser.add_mutually_exclusive_group()
+    failed.add_argument("--failed", dest="failed", action="store_const", const=True, help="只看失败PR")
+    failed.add_argument("--not-failed", dest="failed", action="store_const", const=False, help="排除失败PR")
+    for field in TIME_FIELDS:
+        name = field[:-len('_at')]
+        arg_parser.add_argument(f"--{name}-since", help=f"{field}不早于该时间（ISO 8601日期或时间）")
+        arg_parser.add_argument(f"--{name}-until", help=f"{field}不晚于该时间（只给日期时包含当天）")
+    arg_parser.add_argument("--group-by", action="append", choices=GROUP_FIELDS,
+                            help="分组维度，可重复指定；week/month按创建时间划分")
+    arg_parser.add_argument("--list", action="store_true", help="输出匹配PR的明细而不是聚合统计")
+    arg_parser.add_argument("--sort", help="排序列（倒序），默认聚合按count、明细按编号")
+    arg_parser.add_argument("--limit", type=int, help="最多输出的行数")
+    arg_parser.add_argument("--format", choices=("table", "csv", "json"), default="table", help="输出格式")
+    return arg_parser
+
+def run_query(index: PRIndex, args) -> str:
+    """执行一条查询，返回格式化后的输出"""
+    started = time.perf_counter()
+    terms = {'state': args.state, 'author': args.author, 'label': args.label, 'category': args.category,
+             'target_branch': args.target_branch}
+    ranges = {}
+    for field in TIME_FIELDS:
+        name = field[:-len('_at')]
+        since, until = getattr(args, f"{name}_since"), getattr(args, f"{name}_until")
+        ranges[field] = (_parse_date(since) if since else None, _parse_date(until, end=True) if until else None)
+    positions = index.select(terms, ranges, args.failed)
+
+    if args.list:
+        rows, columns = index.details(positions), list(LIST_COLUMNS)
+    else:
+        group_by = args.group_by or []
+        rows, columns = index.aggregate(positions, group_by), group_by + list(AGGREGATE_COLUMNS)
+        if not args.sort:
+            rows.sort(key=lambda row: row['count'], reverse=True)
+    if args.sort:
+        if args.sort not in columns:
+            raise ValueError(f"未知的排序列: {args.sort}（可选: {', '.join(columns)}）")
+        rows.sort(key=lambda row: _sort_key(row.get(args.sort)), reverse=True)
+    if args.limit is not None:
+        rows = rows[:args.limit]
+
+    output = format_rows(rows, columns, args.format)
+    if args.format == 'table':
+        output += f"\n\n匹配 {len(positions)} 个PR（共 {len(index)} 个），查询耗时 {(time.perf_counter() - started) * 1000:.1f}ms"
+    return output
+
+def load_index(repo_conf: dict, output_dir: str, data_file: str = None) -> PRIndex:
+    """优先从仓库的PR存储建立索引；存储不存在或指定了data_file时从分析数据文件的all_prs建立"""
+    db_file = repo_path(output_dir, repo_conf, "db_file")
+    if data_file is None and os.path.exists(db_file):
+        store = PRStore(db_file)
+        try:
+            return PRIndex.from_store(store)
+        finally:
+            store.close()
+    prs, _ = load_existing_prs(data_file or repo_path(output_dir, repo_conf, "data_file"))
+    return PRIndex.from_prs(prs)
+
+def shell(index: PRIndex, arg_parser: argparse.ArgumentParser):
+    """交互模式：每行一条查询（参数与命令行相同），索引只建立一次；空行或quit退出"""
+    while True:
+        try:
+            line = input("query> ").strip()
+        except EOFError:
+            break
+        if line in ('', 'quit', 'exit'):
+            break
+        try:
+            print(run_query(index, arg_parser.parse_args(shlex.split(line))))
+        except SystemExit:
+            # argparse在参数错误或--help时会退出，交互模式下继续等待下一条查询
+            continue
+        except ValueError as e:
+            print(f"错误：{e}")
+
+def main():
+    arg_parser = build_parser()
+    arg_parser.add_argument("--repo", help="仓库name（repos.json中的name），默认第一个仓库")
+    arg_parser.add_argument("--data-file", help="从指定的分析数据文件读取PR，而不是仓库的PR存储")
+    arg_parser.add_argument("--shell", action="store_true", help="交互模式：建立一次索引后连续执行多条查询")
+    args = arg_parser.parse_args()
+
+    repositories = load_repositories()
+    repo_conf = next((conf for conf in repositories if conf['name'] == args.repo), None) if args.repo \
+        else repositories[0]
+    if repo_conf is None:
+        print(f"错误：未找到仓库 {args.repo}")
+        return 1
+
+    started = time.perf_counter()
+    index = load_index(repo_conf, get_output_dir(), args.data_file)
+    if args.shell or args.format == 'table':
+        print(f"已加载 {len(index)} 个PR，建立索引耗时 {time.perf_counter() - started:.2f}s", file=sys.stderr)
+    if args.shell:
+        shell(index, build_parser())
+        return 0
+    try:
+        print(run_query(index, args))
+    except ValueError as e:
+        print(f"错误：{e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
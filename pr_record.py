@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+精简PR记录
+功能：入库时把Gitcode API返回的完整PR对象（约38个字段）投影为只包含分析和看板所需字段的
+__slots__记录，可通过白名单额外保留字段
+"""
+
+# 分析和看板使用的字段
+SLIM_FIELDS = (
+    'number', 'title', 'state', 'html_url',
+    'created_at', 'updated_at', 'merged_at', 'closed_at',
+    'target_branch', 'source_branch', 'labels', 'user',
+)
+
+class PRRecord:
+    """
+    精简PR记录，支持 pr['field'] / pr.get('field') 形式的只读访问
+
+    labels保存为标签名元组，user保存为登录名；to_dict()还原为与API一致的字段结构
+    """
+    __slots__ = SLIM_FIELDS + ('extra',)
+
+    def __init__(self, **fields):
+        for name in SLIM_FIELDS:
+            setattr(self, name, fields.get(name))
+        self.extra = fields.get('extra') or None
+
+    def __getitem__(self, key):
+        if key in SLIM_FIELDS:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in SLIM_FIELDS or bool(self.extra and key in self.extra)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return f"PRRecord(number={self.number!r}, state={self.state!r}, title={self.title!r})"
+
+    def to_dict(self) -> dict:
+        """转换为与API字段结构一致的精简字典，用于持久化和导出"""
+        data = {name: getattr(self, name) for name in SLIM_FIELDS}
+        data['labels'] = [{'name': name} for name in (self.labels or ())]
+        data['user'] = {'login': self.user} if self.user else None
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+def _label_names(labels) -> tuple:
+    names = []
+    for label in labels or ():
+        if isinstance(label, dict):
+            if 'name' in label:
+                names.append(label['name'])
+        elif isinstance(label, str):
+            names.append(label)
+    return tuple(names)
+
+def _user_login(user):
+    if isinstance(user, dict):
+        return user.get('login')
+    return user
+
+def project_pr(pr, extra_fields=()) -> PRRecord:
+    """
+    把API返回的PR对象（或已导出的精简字典）投影为PRRecord
+
+    extra_fields为需要额外保留的字段名白名单
+    """
+    if isinstance(pr, PRRecord):
+        return pr
+
+    fields = {name: pr.get(name) for name in SLIM_FIELDS}
+    fields['labels'] = _label_names(pr.get('labels'))
+    fields['user'] = _user_login(pr.get('user'))
+    extra = {name: pr[name] for name in extra_fields if name in pr}
+    return PRRecord(extra=extra, **fields)
+
+def parse_extra_fields(value: str) -> tuple:
+    """解析逗号分隔的额外字段配置"""
+    if not value:
+        return ()
+    return tuple(field.strip() for field in value.split(',') if field.strip() and field.strip() not in SLIM_FIELDS)
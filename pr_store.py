@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+PR本地存储
+功能：以SQLite保存PR数据集，按编号upsert，并通过时间/状态索引做窗口查询，
+替代每次整体读写的分析JSON文件
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+
+from pr_record import PRRecord, project_pr
+from serialization import dump_data_stream
+from timeutil import parse_timestamp
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prs (
+    number INTEGER PRIMARY KEY,
+    state TEXT,
+    created_at REAL,
+    updated_at REAL,
+    merged_at REAL,
+    closed_at REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_prs_state ON prs (state);
+CREATE INDEX IF NOT EXISTS idx_prs_created_at ON prs (created_at);
+CREATE INDEX IF NOT EXISTS idx_prs_merged_at ON prs (merged_at);
+CREATE INDEX IF NOT EXISTS idx_prs_updated_at ON prs (updated_at);
+CREATE TABLE IF NOT EXISTS pr_details (
+    number INTEGER PRIMARY KEY,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollup_cells (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollup_contributions (
+    number INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def _to_epoch(timestamp):
+    """把API返回的时间字符串转换为UTC时间戳（秒），为空或无法解析时返回None"""
+    if not timestamp:
+        return None
+    try:
+        return parse_timestamp(timestamp).timestamp()
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+def in_analysis_window(record, since_epoch: float) -> bool:
+    """与PRStore.window_prs()相同的窗口条件：since之后创建，或仍处于open状态"""
+    if record.state == 'open':
+        return True
+    created_at = _to_epoch(record.created_at)
+    return created_at is not None and created_at >= since_epoch
+
+class PRStore:
+    """
+    以PR编号为主键的SQLite存储
+
+    时间列保存为UTC时间戳以便建立可比较的索引；PR入库时投影为精简记录，以JSON保存在data列中，
+    查询结果为PRRecord。extra_fields为额外保留的字段白名单；
+    check_same_thread为False时允许在其他线程中使用连接（由调用方保证串行访问）
+    """
+    def __init__(self, db_path: str, extra_fields=(), check_same_thread: bool = True):
+        self.db_path = db_path
+        self.extra_fields = tuple(extra_fields)
+        self.conn = sqlite3.connect(db_path, check_same_thread=check_same_thread)
+        self.conn.executescript(_SCHEMA)
+
+    def upsert_prs(self, prs, changes: list = None) -> int:
+        """
+        按编号插入或更新PR（API对象或PRRecord），返回写入条数
+
+        prs可以是迭代器：逐条投影后写入，全部写入在同一事务中完成，迭代中途出错时整体回滚。
+        changes为列表时，内容与存储中已有记录不同的PR以 (之前的PRRecord或None, 写入的PRRecord) 追加到其中
+        """
+        count = 0
+        lookup = self.conn.cursor() if changes is not None else None
+
+        def rows():
+            nonlocal count
+            for pr in prs:
+                record = project_pr(pr, self.extra_fields)
+                count += 1
+                data = json.dumps(record.to_dict(), ensure_ascii=False)
+                if lookup is not None:
+                    row = lookup.execute("SELECT data FROM prs WHERE number = ?", (record.number,)).fetchone()
+                    if row is None:
+                        changes.append((None, record))
+                    elif row[0] != data:
+                        changes.append((project_pr(json.loads(row[0]), self.extra_fields), record))
+                yield (
+                    record.number,
+                    record.state,
+                    _to_epoch(record.created_at),
+                    _to_epoch(record.updated_at),
+                    _to_epoch(record.merged_at),
+                    _to_epoch(record.closed_at),
+                    data,
+                )
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO prs (number, state, created_at, updated_at, merged_at, closed_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows(),
+            )
+        return count
+
+    def count(self, state: str = None) -> int:
+        """PR总数，指定state时只统计该状态"""
+        if state is None:
+            return self.conn.execute("SELECT COUNT(*) FROM prs").fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM prs WHERE state = ?", (state,)).fetchone()[0]
+
+    def get_sync_cursor(self):
+        """返回updated_at最新的PR的原始updated_at字符串，作为增量同步游标"""
+        row = self.conn.execute(
+            "SELECT data FROM prs WHERE updated_at IS NOT NULL ORDER BY updated_at DESC LIMIT 1"
+        ).fetchone()
+        return json.loads(row[0]).get('updated_at') if row else None
+
+    def get_covered_since(self):
+        """
+        存储完整覆盖的起点（ISO时间字符串）：此后创建、合入、关闭或更新过的PR都已按最近一次同步时的状态入库；
+        未知（从未完整获取过，或上次获取因页数上限被截断）时返回None
+        """
+        row = self.conn.execute("SELECT value FROM sync_meta WHERE key = 'covered_since'").fetchone()
+        return row[0] if row else None
+
+    def set_covered_since(self, covered_since):
+        """记录完整覆盖的起点，为None时清除"""
+        with self.conn:
+            if covered_since is None:
+                self.conn.execute("DELETE FROM sync_meta WHERE key = 'covered_since'")
+            else:
+                self.conn.execute("INSERT OR REPLACE INTO sync_meta (key, value) VALUES ('covered_since', ?)",
+                                  (covered_since,))
+
+    def _iter_query(self, where: str = "", args: tuple = ()):
+        sql = "SELECT data FROM prs"
+        if where:
+            sql += " WHERE " + where
+        sql += " ORDER BY number DESC"
+        for row in self.conn.execute(sql, args):
+            yield project_pr(json.loads(row[0]), self.extra_fields)
+
+    def _query(self, where: str = "", args: tuple = ()) -> list:
+        return list(self._iter_query(where, args))
+
+    def all_prs(self) -> list:
+        """全部PR，按编号倒序"""
+        return self._query()
+
+    def iter_prs(self):
+        """逐条读取全部PR（按编号倒序），不在内存中保留整个数据集"""
+        return self._iter_query()
+
+    def created_since(self, since: datetime) -> list:
+        """创建时间不早于since的PR"""
+        return self._query("created_at >= ?", (since.timestamp(),))
+
+    def merged_since(self, since: datetime) -> list:
+        """合入时间不早于since的PR"""
+        return self._query("merged_at >= ?", (since.timestamp(),))
+
+    def updated_since(self, since: datetime) -> list:
+        """更新时间不早于since的PR"""
+        return self._query("updated_at >= ?", (since.timestamp(),))
+
+    def window_prs(self, since: datetime) -> list:
+        """
+        分析窗口所需的PR：since之后创建的PR，加上所有仍处于open状态的PR（用于待合入数量统计）
+        """
+        return self._query("created_at >= ? OR state = 'open'", (since.timestamp(),))
+
+    def iter_window_prs(self, since: datetime):
+        """逐条读取window_prs()的结果"""
+        return self._iter_query("created_at >= ? OR state = 'open'", (since.timestamp(),))
+
+    def index_rows(self) -> list:
+        """
+        建立查询索引所需的列：(编号, 状态, 创建/更新/合入/关闭时间戳, 作者, 目标分支, 标签名元组,
+        创建时间, 合入时间, 标题)
+
+        作者、目标分支、标签和标题由SQLite的JSON函数从data列中提取，不必在Python中逐行解码整条记录
+        """
+        rows = self.conn.execute(
+            "SELECT number, state, created_at, updated_at, merged_at, closed_at, "
+            "json_extract(data, '$.user.login'), json_extract(data, '$.target_branch'), "
+            "(SELECT group_concat(json_extract(value, '$.name'), char(31)) FROM json_each(data, '$.labels')), "
+            "json_extract(data, '$.created_at'), json_extract(data, '$.merged_at'), json_extract(data, '$.title') "
+            "FROM prs"
+        )
+        return [row[:8] + (tuple(row[8].split('\x1f')) if row[8] else (),) + row[9:] for row in rows]
+
+    def export_json(self, output_file: str, extra: dict = None, prs: list = None):
+        """
+        导出兼容旧格式的分析JSON（extra中的分析结果在前，all_prs为全部PR）
+
+        调用方已查询过全部PR时可通过prs传入，避免重复查询；否则逐条读取并写出，不整体载入内存
+        """
+        write_analysis_json(output_file, dict(extra or {}), self.iter_prs() if prs is None else prs)
+
+    def get_details(self) -> dict:
+        """PR详情缓存：{编号: (获取时PR的updated_at, 详情摘要)}"""
+        return {number: (updated_at, json.loads(data))
+                for number, updated_at, data in self.conn.execute("SELECT number, updated_at, data FROM pr_details")}
+
+    def save_details(self, details: dict):
+        """写入PR详情缓存，details为 {编号: (updated_at, 详情摘要)}"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pr_details (number, updated_at, data) VALUES (?, ?, ?)",
+                [(number, updated_at, json.dumps(data, ensure_ascii=False))
+                 for number, (updated_at, data) in details.items()],
+            )
+
+    def load_rollup(self) -> tuple:
+        """汇总立方体：({单元格键: 度量}, {PR编号: 贡献})"""
+        cells = {key: json.loads(data) for key, data in self.conn.execute("SELECT key, data FROM rollup_cells")}
+        contributions = {number: json.loads(data)
+                         for number, data in self.conn.execute("SELECT number, data FROM rollup_contributions")}
+        return cells, contributions
+
+    def save_rollup(self, cells: dict, contributions: dict):
+        """写回修改过的单元格和贡献，值为None的条目被删除"""
+        with self.conn:
+            for table, column, items in (("rollup_cells", "key", cells), ("rollup_contributions", "number", contributions)):
+                self.conn.executemany(f"DELETE FROM {table} WHERE {column} = ?",
+                                      [(key,) for key, data in items.items() if data is None])
+                self.conn.executemany(f"INSERT OR REPLACE INTO {table} ({column}, data) VALUES (?, ?)",
+                                      [(key, json.dumps(data, ensure_ascii=False))
+                                       for key, data in items.items() if data is not None])
+
+    def close(self):
+        self.conn.close()
+
+def write_analysis_json(output_file: str, data: dict, prs=None):
+    """
+    写入分析数据，all_prs的精简记录转换为API格式的字典；格式由文件扩展名决定（见serialization.py）
+
+    all_prs取自prs（可以是迭代器，逐条编码写出），未传入时取data["all_prs"]；
+    用于在内存中完成分析与渲染后一次性落盘（见refresh_dashboard.py）
+    """
+    prs = data.get("all_prs", []) if prs is None else prs
+    dump_data_stream(data, "all_prs", (pr.to_dict() if isinstance(pr, PRRecord) else pr for pr in prs), output_file)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+流式分位数草图
+功能：DDSketch（相对误差保证的对数分桶直方图），用于在有界内存下估计合入/关闭时长的分位数；
+草图可序列化并与其他运行或其他仓库的草图合并，无需原始数据
+"""
+
+import math
+
+# 小于该值的样本计入零桶
+_MIN_INDEXABLE = 1e-9
+
+class DDSketch:
+    """
+    相对误差为relative_accuracy的分位数草图，桶数超过max_buckets时合并最低的桶以限制内存
+    """
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value: float):
+        """加入一个样本"""
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+        if value <= _MIN_INDEXABLE:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.bins[key] = self.bins.get(key, 0) + 1
+        if len(self.bins) > self.max_buckets:
+            self._collapse()
+
+    def remove(self, value: float):
+        """
+        移除一个之前加入过的样本（用于增量维护的汇总）；min/max不回退，仍是剩余样本的上下界
+        """
+        self.count -= 1
+        self.sum -= value
+        if self.count <= 0:
+            self.bins.clear()
+            self.zero_count = self.count = 0
+            self.sum = 0.0
+            self.min = self.max = None
+            return
+
+        if value <= _MIN_INDEXABLE:
+            self.zero_count -= 1
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        if key not in self.bins:
+            # 样本所在的桶已被合并进更高的最低桶
+            key = min((k for k in self.bins if k >= key), default=None)
+            if key is None:
+                return
+        self.bins[key] -= 1
+        if not self.bins[key]:
+            del self.bins[key]
+
+    def _collapse(self):
+        """把最低的若干个桶合并，使桶数回到上限以内"""
+        keys = sorted(self.bins)
+        excess = len(keys) - self.max_buckets + 1
+        target = keys[excess]
+        for key in keys[:excess]:
+            self.bins[target] += self.bins.pop(key)
+
+    def merge(self, other: 'DDSketch'):
+        """合并另一个草图（两者的相对误差必须一致）"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("无法合并相对误差不同的分位数草图")
+        if not other.count:
+            return
+        self.count += other.count
+        self.sum += other.sum
+        self.zero_count += other.zero_count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        for key, bin_count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + bin_count
+        while len(self.bins) > self.max_buckets:
+            self._collapse()
+
+    def quantile(self, q: float):
+        """估计第q分位数（0 <= q <= 1），无样本时返回None"""
+        if not self.count:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return max(self.min, 0.0) if self.min is not None else 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self, quantiles=(0.5, 0.75, 0.9, 0.99), digits: int = 2) -> dict:
+        """返回 {"count", "p50", "p75", ...} 形式的分位数摘要"""
+        result = {"count": self.count}
+        for q in quantiles:
+            value = self.quantile(q)
+            result[f"p{round(q * 100):d}"] = round(value, digits) if value is not None else None
+        return result
+
+    def to_dict(self) -> dict:
+        """序列化为可写入JSON的字典"""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "max_buckets": self.max_buckets,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "zero_count": self.zero_count,
+            "bins": {str(key): bin_count for key, bin_count in sorted(self.bins.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'DDSketch':
+        """从to_dict()的结果恢复草图"""
+        sketch = cls(data["relative_accuracy"], data.get("max_buckets", 2048))
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        sketch.zero_count = data["zero_count"]
+        sketch.bins = {int(key): bin_count for key, bin_count in data["bins"].items()}
+        return sketch
+
+def merge_sketch_dicts(*sketch_dicts) -> DDSketch:
+    """合并多个序列化后的草图，例如多次运行或多个仓库的分析结果"""
+    merged = None
+    for data in sketch_dicts:
+        sketch = DDSketch.from_dict(data)
+        if merged is None:
+            merged = sketch
+        else:
+            merged.merge(sketch)
+    return merged or DDSketch()
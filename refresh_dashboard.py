@@ -2,14 +2,18 @@
 """
 Triton Ascend PR数据看板一键更新脚本
 功能：自动获取最新PR数据并生成更新的看板
+（数据收集、看板生成和验证在同一进程内完成，分析数据只在内存中传递，最后一次性写盘）
 """
 
 import os
 import sys
-import subprocess
-import time
 from datetime import datetime
-import json
+
+from pipeline_metrics import PipelineMetrics, parse_profile_modes
+from pr_dashboard import generate_index_html, render_pr_dashboard
+from pr_store import write_analysis_json
+from repo_config import INDEX_FILE, get_output_dir, load_config, repo_path
+from verify_dashboard import verify_analysis
 
 def print_header():
     """打印脚本标题"""
@@ -41,60 +45,12 @@ def print_warning(message):
     print(f"⚠️  {message}")
     print()
 
-def run_command(command, description=""):
-    """执行命令并返回结果"""
-    try:
-        print(f"🔄 执行命令: {command}")
-        if description:
-            print(f"   {description}")
-        
-        # 使用 bytes 模式处理编码，避免UnicodeDecodeError
-        result = subprocess.run(
-            command, 
-            shell=True, 
-            capture_output=True, 
-            cwd=os.getcwd()
-        )
-        
-        # 尝试多种编码解码输出
-        def decode_output(output_bytes):
-            if not output_bytes:
-                return ""
-            
-            # 尝试的编码列表
-            encodings = ['utf-8', 'gbk', 'gb2312', 'cp936', 'latin1']
-            
-            for encoding in encodings:
-                try:
-                    return output_bytes.decode(encoding)
-                except UnicodeDecodeError:
-                    continue
-            
-            # 如果所有编码都失败，使用错误处理
-            return output_bytes.decode('utf-8', errors='replace')
-        
-        stdout_text = decode_output(result.stdout)
-        stderr_text = decode_output(result.stderr)
-        
-        if result.returncode == 0:
-            print_success("命令执行成功")
-            return True, stdout_text
-        else:
-            print_error(f"命令执行失败 (退出码: {result.returncode})")
-            if stderr_text:
-                print(f"错误信息: {stderr_text}")
-            return False, stderr_text
-            
-    except Exception as e:
-        print_error(f"命令执行异常: {str(e)}")
-        return False, str(e)
-
 def check_dependencies():
     """检查依赖"""
     print_step(0, "检查环境和依赖")
     
     # 检查Python模块
-    required_modules = ['requests', 'json', 'os', 'subprocess']
+    required_modules = ['requests', 'dateutil']
     missing_modules = []
     
     for module in required_modules:
@@ -105,133 +61,152 @@ def check_dependencies():
     
     if missing_modules:
         print_error(f"缺少必要的Python模块: {', '.join(missing_modules)}")
-        print("请运行: pip install requests")
+        print("请运行: pip install requests python-dateutil")
         return False
     
     print_success("环境检查通过")
     return True
 
-def run_pr_data_collection():
-    """执行PR数据收集"""
+def run_pr_data_collection(output_dir, config, metrics):
+    """
+    执行PR数据收集（进程内调用monitor，不写分析JSON），返回 {仓库名: 分析数据}，失败时返回None
+    """
     print_step(1, "收集最新PR数据", "从Gitcode API获取仓库PR信息...")
     
-    success, output = run_command("python monitor.py", "正在从Ascend/triton-ascend仓库获取PR数据...")
+    repositories = config["repositories"]
+    repo_names = ', '.join(f"{r['owner']}/{r['repo']}" for r in repositories)
+    print(f"🔄 正在从{repo_names}仓库获取PR数据...")
     
-    if not success:
-        return False
+    try:
+        # 依赖检查通过后再导入数据收集模块
+        import monitor
+        
+        os.makedirs(output_dir, exist_ok=True)
+        options = monitor.load_sync_options(output_dir, config, metrics)
+        results, errors = monitor.collect_repositories(repositories, monitor.get_access_token(), output_dir,
+                                                       options, export=False)
+        client = options["fetch_options"]["client"]
+        metrics.increment("api_requests", client.stats['requests'])
+        metrics.increment("api_not_modified", client.stats['not_modified'])
+        metrics.increment("api_bytes_received", client.stats['bytes_received'])
+        client.close()
+    except Exception as e:
+        print_error(f"PR数据收集异常: {str(e)}")
+        return None
     
-    # 检查是否生成了数据文件
-    data_file = "/home/runner/work/monitor_Gitcode_PR_efficiency/monitor_Gitcode_PR_efficiency/triton_ascend_prs_analysis.json"
-    if os.path.exists(data_file):
-        try:
-            with open(data_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            total_prs = len(data.get('all_prs', []))
-            total_open_prs = data.get('total_open_prs', 0)
-            
-            print_success(f"数据收集完成")
-            print(f"   - 获取PR总数: {total_prs}")
-            print(f"   - 待合入PR: {total_open_prs}")
-            
-            # 检查失败PR数据
-            daily_failed = data.get('daily_failed_submissions', {})
-            total_failed = sum(daily_failed.values())
-            if total_failed > 0:
-                print(f"   - 失败PR数量: {total_failed}")
-            
-            return True
-        except Exception as e:
-            print_error(f"读取数据文件失败: {str(e)}")
-            return False
-    else:
-        print_error("数据文件未生成")
-        return False
+    if errors:
+        for name, error in errors.items():
+            print_error(f"{name} 数据收集失败: {error}")
+        return None
+    
+    for repo_conf in repositories:
+        data = results[repo_conf['name']]
+        print_success(f"{data.get('repository', repo_conf['title'])} 数据收集完成")
+        print(f"   - 获取PR总数: {len(data.get('all_prs', []))}")
+        print(f"   - 待合入PR: {data.get('total_open_prs', 0)}")
+        
+        # 检查失败PR数据
+        total_failed = sum(data.get('daily_failed_submissions', {}).values())
+        if total_failed > 0:
+            print(f"   - 失败PR数量: {total_failed}")
+    
+    return results
 
-def run_dashboard_generation():
-    """执行看板生成"""
+def run_dashboard_generation(config, results, metrics):
+    """
+    基于内存中的分析数据生成HTML看板，返回 {仓库名: HTML内容}（监控多个仓库时还包括索引页，键为INDEX_FILE）
+    """
     print_step(2, "生成HTML看板", "基于最新数据生成交互式看板...")
     
-    success, output = run_command("python pr_dashboard.py", "正在生成HTML看板文件...")
+    repositories = config["repositories"]
+    pages = {}
+    for repo_conf in repositories:
+        with metrics.stage("render", results[repo_conf['name']].get('repository')):
+            html_content = render_pr_dashboard(results[repo_conf['name']], repo_conf['title'])
+        pages[repo_conf['name']] = html_content
+        print_success(f"{repo_conf['title']} 看板生成完成")
+        print(f"   - 大小: {len(html_content.encode('utf-8')) / 1024:.1f} KB")
     
-    if success:
-        dashboard_file = "triton_pr_dashboard.html"
-        if os.path.exists(dashboard_file):
-            file_size = os.path.getsize(dashboard_file)
-            print_success(f"看板生成完成")
-            print(f"   - 文件: {dashboard_file}")
-            print(f"   - 大小: {file_size / 1024:.1f} KB")
-            return True
-        else:
-            print_error("看板文件未生成")
-            return False
-    else:
-        return False
+    if len(repositories) > 1:
+        pages[INDEX_FILE] = generate_index_html([(repo_conf, results[repo_conf['name']]) for repo_conf in repositories])
+    return pages
 
-def validate_results():
-    """验证结果"""
-    print_step(3, "验证结果", "检查生成的文件和数据...")
-    
-    # 检查数据文件
-    data_file = "/home/runner/work/monitor_Gitcode_PR_efficiency/monitor_Gitcode_PR_efficiency/triton_ascend_prs_analysis.json"
-    if os.path.exists(data_file):
-        print_success("✅ 数据文件存在")
-    else:
-        print_error("❌ 数据文件不存在")
-        return False
+def validate_results(config, results, pages):
+    """验证内存中的分析数据和看板内容（与verify_dashboard.py的检查相同）"""
+    print_step(3, "验证结果", "检查生成的数据和看板...")
     
-    # 检查看板文件
-    dashboard_file = "triton_pr_dashboard.html"
-    if os.path.exists(dashboard_file):
-        print_success("✅ 看板文件存在")
-    else:
-        print_error("❌ 看板文件不存在")
-        return False
+    for repo_conf in config["repositories"]:
+        data = results.get(repo_conf['name'])
+        if data is None:
+            print_error("❌ 缺少分析数据")
+            return False
+        if not verify_analysis(data, pages.get(repo_conf['name']), repo_conf['name']):
+            print_error(f"❌ 验证未通过: {data.get('repository', repo_conf['name'])}")
+            return False
+    print_success("数据格式正确，看板内容已生成")
+    return True
+
+def write_outputs(output_dir, config, results, pages, metrics):
+    """所有步骤成功后一次性写入分析JSON、看板和索引页"""
+    print_step(4, "写入结果文件")
     
-    # 验证数据内容
     try:
-        with open(data_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        required_fields = ['repository', 'total_open_prs', 'daily_submissions', 'daily_failed_submissions']
-        missing_fields = []
-        
-        for field in required_fields:
-            if field not in data:
-                missing_fields.append(field)
-        
-        if missing_fields:
-            print_error(f"❌ 数据文件缺少必要字段: {', '.join(missing_fields)}")
-            return False
-        else:
-            print_success("✅ 数据文件格式正确")
+        for repo_conf in config["repositories"]:
+            repository = results[repo_conf['name']].get('repository')
+            data_file = repo_path(output_dir, repo_conf, 'data_file')
+            with metrics.stage("export_json", repository):
+                write_analysis_json(data_file, results[repo_conf['name']])
+            print(f"   - 数据文件: {data_file}")
             
-        # 检查失败PR数据
-        daily_failed = data.get('daily_failed_submissions', {})
-        if daily_failed:
-            total_failed = sum(daily_failed.values())
-            print_success(f"✅ 失败PR数据完整 ({total_failed}个失败PR)")
-        else:
-            print_warning("⚠️  未检测到失败PR数据")
-            
-    except Exception as e:
-        print_error(f"❌ 数据文件验证失败: {str(e)}")
+            dashboard_file = repo_path(output_dir, repo_conf, 'dashboard_file')
+            with metrics.stage("write_dashboard", repository), open(dashboard_file, 'w', encoding='utf-8') as f:
+                f.write(pages[repo_conf['name']])
+            print(f"   - 看板文件: {dashboard_file} ({os.path.getsize(dashboard_file) / 1024:.1f} KB)")
+        
+        if INDEX_FILE in pages:
+            index_file = os.path.join(output_dir, INDEX_FILE)
+            with open(index_file, 'w', encoding='utf-8') as f:
+                f.write(pages[INDEX_FILE])
+            print(f"   - 看板索引页: {index_file}")
+    except OSError as e:
+        print_error(f"写入结果文件失败: {str(e)}")
         return False
     
+    print_success("结果文件写入完成")
     return True
 
-def print_final_summary():
+def print_timing_summary(output_dir, metrics):
+    """打印各阶段耗时摘要，并在看板旁写入指标文件（JSON与Prometheus文本格式）及剖析结果"""
+    print("=" * 70)
+    print("⏱️  耗时统计")
+    print("=" * 70)
+    for line in metrics.summary_lines():
+        print(f"   {line}")
+    
+    try:
+        json_file, prom_file = metrics.write(output_dir)
+        print(f"\n📈 指标文件: {json_file}")
+        print(f"   Prometheus格式: {prom_file}")
+        for profile_file in metrics.write_profiles(output_dir):
+            print(f"   剖析结果: {profile_file}")
+    except OSError as e:
+        print_warning(f"写入指标文件失败: {str(e)}")
+    print()
+
+def print_final_summary(output_dir, config):
     """打印最终总结"""
     print("=" * 70)
     print("🎉 任务完成总结")
     print("=" * 70)
     
-    data_file = "/home/runner/work/monitor_Gitcode_PR_efficiency/monitor_Gitcode_PR_efficiency/triton_ascend_prs_analysis.json"
-    dashboard_file = "triton_pr_dashboard.html"
+    repositories = config["repositories"]
     
     print("📁 生成的文件:")
-    print(f"   • 数据文件: {data_file}")
-    print(f"   • 看板文件: {os.path.abspath(dashboard_file)}")
+    for repo_conf in repositories:
+        print(f"   • {repo_conf['title']} 数据文件: {repo_path(output_dir, repo_conf, 'data_file')}")
+        print(f"   • {repo_conf['title']} 看板文件: {os.path.abspath(repo_path(output_dir, repo_conf, 'dashboard_file'))}")
+    if len(repositories) > 1:
+        print(f"   • 看板索引页: {os.path.abspath(os.path.join(output_dir, INDEX_FILE))}")
     
     print("\n🌐 查看方式:")
     print("   • 在浏览器中打开HTML文件即可查看看板")
@@ -250,23 +225,39 @@ def main():
             print_error("环境检查失败，请解决依赖问题后重试")
             return 1
         
+        # 各步骤在同一进程内通过内存传递分析数据，全部成功后才写盘
+        output_dir = get_output_dir()
+        config = load_config()
+        # 各阶段耗时统计，PIPELINE_PROFILE=cprofile,tracemalloc（或1）时同时开启性能剖析
+        metrics = PipelineMetrics(parse_profile_modes(os.environ.get("PIPELINE_PROFILE", "")))
+        
         # 步骤1: 收集PR数据
-        if not run_pr_data_collection():
+        with metrics.stage("collect"):
+            results = run_pr_data_collection(output_dir, config, metrics)
+        if results is None:
             print_error("PR数据收集失败")
             return 1
         
         # 步骤2: 生成看板
-        if not run_dashboard_generation():
-            print_error("看板生成失败")
-            return 1
+        with metrics.stage("generate"):
+            pages = run_dashboard_generation(config, results, metrics)
         
         # 步骤3: 验证结果
-        if not validate_results():
+        with metrics.stage("validate"):
+            valid = validate_results(config, results, pages)
+        if not valid:
             print_error("结果验证失败")
             return 1
         
-        # 打印最终总结
-        print_final_summary()
+        # 步骤4: 写入结果文件
+        with metrics.stage("write"):
+            written = write_outputs(output_dir, config, results, pages, metrics)
+        if not written:
+            return 1
+        
+        # 打印耗时统计与最终总结
+        print_timing_summary(output_dir, metrics)
+        print_final_summary(output_dir, config)
         
         return 0
         
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+监控仓库配置
+功能：读取仓库列表配置文件（默认repos.json），为每个仓库补全输出文件名等默认值
+"""
+
+import json
+import os
+
+from serialization import FORMAT_EXTENSIONS, get_data_format
+
+# 未提供配置文件时的默认监控仓库
+DEFAULT_REPOSITORIES = [
+    {
+        "owner": "Ascend",
+        "repo": "triton-ascend",
+        "name": "triton_ascend",
+        "title": "Triton Ascend",
+        "dashboard_file": "triton_pr_dashboard.html",
+    }
+]
+
+# 多仓库看板索引页文件名
+INDEX_FILE = "index.html"
+
+def get_output_dir() -> str:
+    """输出目录：优先使用环境变量，否则使用当前目录"""
+    return os.environ.get("OUTPUT_DIR", os.getcwd())
+
+def get_config_file() -> str:
+    """配置文件路径：优先使用环境变量REPOS_CONFIG，否则使用脚本所在目录下的repos.json"""
+    return os.environ.get("REPOS_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "repos.json"))
+
+def _with_defaults(entry: dict, data_format: str = "json") -> dict:
+    """补全单个仓库配置的默认值，分析数据文件的扩展名由data_format决定"""
+    if not entry.get("owner") or not entry.get("repo"):
+        raise ValueError(f"仓库配置缺少owner或repo字段: {entry}")
+
+    repo_conf = dict(entry)
+    name = repo_conf.setdefault("name", repo_conf["repo"].replace('-', '_').replace('.', '_'))
+    repo_conf.setdefault("title", f"{repo_conf['owner']}/{repo_conf['repo']}")
+    repo_conf.setdefault("data_file", f"{name}_prs_analysis{FORMAT_EXTENSIONS[data_format]}")
+    repo_conf.setdefault("db_file", f"{name}_prs.db")
+    repo_conf.setdefault("dashboard_file", f"{name}_pr_dashboard.html")
+    repo_conf.setdefault("history_dir", os.path.join("history", name))
+    return repo_conf
+
+def load_config(config_file: str = None) -> dict:
+    """
+    读取配置文件，返回 {"repositories": [...], 其他全局配置...}
+
+    配置文件不存在时使用DEFAULT_REPOSITORIES；未指定data_file的仓库按DATA_FORMAT（或data_format）确定数据文件扩展名
+    """
+    config_file = config_file or get_config_file()
+    if os.path.exists(config_file):
+        with open(config_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    else:
+        config = {}
+
+    data_format = get_data_format(config)
+    config["repositories"] = [_with_defaults(entry, data_format)
+                              for entry in config.get("repositories") or DEFAULT_REPOSITORIES]
+    return config
+
+def load_repositories(config_file: str = None) -> list:
+    """读取并补全所有仓库配置"""
+    return load_config(config_file)["repositories"]
+
+def repo_path(output_dir: str, repo_conf: dict, key: str) -> str:
+    """仓库某个输出文件（data_file/db_file/dashboard_file/history_dir）的完整路径"""
+    return os.path.join(output_dir, repo_conf[key])
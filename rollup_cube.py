@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+分维度汇总立方体
+功能：按 (维度, 取值, 时间粒度, 周期) 预先聚合PR的提交数、合入数、关闭数、失败数、合入时长总和与时长分位数草图，
+维度为作者、标签、目标分支（以及全仓库总计），周期按PR创建时间分为周和月。
+每个PR对各单元格的贡献单独记录，PR变化时先减去旧贡献再加上新贡献，只更新受影响的单元格；
+看板按维度切片时直接查表，无需遍历PR
+"""
+
+from datetime import datetime
+
+from label_rules import is_failed_pr
+from quantile_sketch import DDSketch
+from timeutil import parse_timestamp
+
+# 切片维度（"all"为全仓库总计，取值固定为"*"）
+DIMENSIONS = ('all', 'author', 'label', 'target_branch')
+ALL_VALUE = '*'
+
+# 时间粒度
+GRAINS = ('week', 'month')
+
+# 导出到分析数据中的最近周期数
+DEFAULT_EXPORT_PERIODS = {'week': 12, 'month': 12}
+
+# 计数度量
+COUNT_MEASURES = ('submitted', 'merged', 'closed', 'failed')
+
+def period_key(day, grain: str) -> str:
+    """日期所在的周期：周为ISO周（如2026-W03），月为自然月（如2026-01）"""
+    if grain == 'week':
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    return f"{day.year}-{day.month:02d}"
+
+def _parse(timestamp):
+    try:
+        return parse_timestamp(timestamp) if timestamp else None
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+def cell_key(dimension: str, value: str, grain: str, period: str) -> str:
+    """单元格键：维度、取值、粒度、周期以制表符连接"""
+    return f"{dimension}\t{value}\t{grain}\t{period}"
+
+def pr_contribution(pr, is_failed=None) -> dict:
+    """
+    一个PR对立方体的贡献：{"keys": [单元格键], "failed", "state", "merge_days"}，缺少创建时间时返回None
+
+    周期按创建时间在其自身时区下的日期划分（与逐日计数索引的口径一致）；
+    is_failed默认使用 label_rules.is_failed_pr
+    """
+    is_failed = is_failed or is_failed_pr
+    created_at = _parse(pr['created_at'])
+    if created_at is None:
+        return None
+
+    values = [('all', ALL_VALUE)]
+    author = pr.get('user')
+    if isinstance(author, dict):
+        author = author.get('login')
+    if author:
+        values.append(('author', author))
+    if pr.get('target_branch'):
+        values.append(('target_branch', pr['target_branch']))
+    for label in pr.get('labels') or ():
+        name = label.get('name') if isinstance(label, dict) else label
+        if name:
+            values.append(('label', name))
+
+    merge_days = None
+    if pr['state'] == 'merged':
+        merged_at = _parse(pr['merged_at'])
+        if merged_at is not None:
+            merge_days = max((merged_at - created_at).total_seconds() / 86400, 0.0)
+
+    day = created_at.date()
+    periods = [(grain, period_key(day, grain)) for grain in GRAINS]
+    return {
+        "keys": [cell_key(dimension, value, grain, period)
+                 for grain, period in periods for dimension, value in values],
+        "failed": bool(is_failed(pr)),
+        "state": pr['state'],
+        "merge_days": merge_days,
+    }
+
+class RollupCell:
+    """单元格度量：各计数、合入时长总和（天）与合入时长草图"""
+    __slots__ = COUNT_MEASURES + ('merge_days_sum', 'merge_sketch')
+
+    def __init__(self):
+        for measure in COUNT_MEASURES:
+            setattr(self, measure, 0)
+        self.merge_days_sum = 0.0
+        self.merge_sketch = DDSketch()
+
+    def apply(self, contribution: dict, sign: int):
+        """加上（sign=1）或减去（sign=-1）一个PR的贡献"""
+        self.submitted += sign
+        self.failed += sign * contribution["failed"]
+        if contribution["state"] == 'closed':
+            self.closed += sign
+        if contribution["state"] == 'merged':
+            self.merged += sign
+            if contribution["merge_days"] is not None:
+                self.merge_days_sum += sign * contribution["merge_days"]
+                if sign > 0:
+                    self.merge_sketch.add(contribution["merge_days"])
+                else:
+                    self.merge_sketch.remove(contribution["merge_days"])
+
+    @property
+    def empty(self) -> bool:
+        return self.submitted <= 0
+
+    def summary(self) -> dict:
+        """导出用的度量摘要：计数、失败率、平均/P50/P90合入时长（天）"""
+        durations = self.merge_sketch.summary((0.5, 0.9))
+        return {
+            **{measure: getattr(self, measure) for measure in COUNT_MEASURES},
+            "failure_rate": round(self.failed / self.submitted, 4) if self.submitted else None,
+            "avg_merge_days": round(self.merge_days_sum / durations["count"], 2) if durations["count"] else None,
+            "p50_merge_days": durations["p50"],
+            "p90_merge_days": durations["p90"],
+        }
+
+    def to_dict(self) -> dict:
+        return {**{measure: getattr(self, measure) for measure in COUNT_MEASURES},
+                "merge_days_sum": self.merge_days_sum, "merge_sketch": self.merge_sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'RollupCell':
+        cell = cls()
+        for measure in COUNT_MEASURES:
+            setattr(cell, measure, data[measure])
+        cell.merge_days_sum = data["merge_days_sum"]
+        cell.merge_sketch = DDSketch.from_dict(data["merge_sketch"])
+        return cell
+
+class RollupCube:
+    """
+    汇总立方体：cells为 {单元格键: RollupCell}，contributions为 {PR编号: 贡献}
+
+    update()只处理贡献发生变化的PR，并记录被修改的单元格和贡献，save()时只写回这些条目
+    """
+    def __init__(self, cells: dict = None, contributions: dict = None):
+        self.cells = cells or {}
+        self.contributions = contributions or {}
+        self.dirty_cells = set()
+        self.dirty_contributions = set()
+
+    @classmethod
+    def load(cls, store) -> 'RollupCube':
+        """从PRStore读取立方体"""
+        cells, contributions = store.load_rollup()
+        return cls({key: RollupCell.from_dict(data) for key, data in cells.items()}, contributions)
+
+    def save(self, store):
+        """把修改过的单元格和贡献写回PRStore（空单元格和已消失的贡献会被删除）"""
+        store.save_rollup(
+            {key: self.cells[key].to_dict() if key in self.cells else None for key in self.dirty_cells},
+            {number: self.contributions.get(number) for number in self.dirty_contributions},
+        )
+        self.dirty_cells.clear()
+        self.dirty_contributions.clear()
+
+    def _apply(self, contribution: dict, sign: int):
+        for key in contribution["keys"]:
+            cell = self.cells.get(key)
+            if cell is None:
+                cell = self.cells[key] = RollupCell()
+            cell.apply(contribution, sign)
+            if cell.empty:
+                del self.cells[key]
+            self.dirty_cells.add(key)
+
+    def update(self, prs, is_failed=None) -> int:
+        """按PR的最新内容更新立方体，返回贡献发生变化的PR数量"""
+        changed = 0
+        for pr in prs:
+            number = pr['number']
+            contribution = pr_contribution(pr, is_failed)
+            previous = self.contributions.get(number)
+            if previous == contribution:
+                continue
+            if previous is not None:
+                self._apply(previous, -1)
+            if contribution is not None:
+                self._apply(contribution, 1)
+                self.contributions[number] = contribution
+            else:
+                self.contributions.pop(number, None)
+            self.dirty_contributions.add(number)
+            changed += 1
+        return changed
+
+    def lookup(self, dimension: str, value: str, grain: str, period: str):
+        """单个单元格的度量摘要，不存在时返回None"""
+        cell = self.cells.get(cell_key(dimension, value, grain, period))
+        return cell.summary() if cell else None
+
+    def periods(self, grain: str) -> list:
+        """某个粒度下有数据的周期（升序）"""
+        return sorted({key.split('\t')[3] for key in self.cells if key.split('\t')[2] == grain})
+
+    def export(self, periods: dict = None) -> dict:
+        """
+        导出最近若干周期的切片供看板查表：{粒度: {周期: {维度: {取值: 度量摘要}}}}
+        """
+        periods = periods or DEFAULT_EXPORT_PERIODS
+        recent = {grain: set(self.periods(grain)[-periods.get(grain, 0):]) if periods.get(grain) else set()
+                  for grain in GRAINS}
+        result = {grain: {} for grain in GRAINS}
+        for key, cell in self.cells.items():
+            dimension, value, grain, period = key.split('\t')
+            if period in recent[grain]:
+                result[grain].setdefault(period, {}).setdefault(dimension, {})[value] = cell.summary()
+        return {
+            "generated_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "dimensions": list(DIMENSIONS),
+            "slices": {grain: dict(sorted(slices.items())) for grain, slices in result.items()},
+        }
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+分析数据序列化
+功能：分析数据可保存为JSON（默认，缩进便于阅读和diff）、gzip/zstd压缩的JSON或MessagePack，
+读取时按扩展名或文件头魔数自动识别格式；安装了orjson时JSON编解码走orjson快速路径。
+zstandard、msgpack、orjson均为可选依赖
+"""
+
+import contextlib
+import gzip
+import json
+import os
+import uuid
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard为可选依赖
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack为可选依赖
+    msgpack = None
+
+# 支持的格式及对应的文件扩展名
+FORMAT_EXTENSIONS = {
+    "json": ".json",
+    "json.gz": ".json.gz",
+    "json.zst": ".json.zst",
+    "msgpack": ".msgpack",
+}
+DEFAULT_FORMAT = "json"
+
+# 文件头魔数
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# 压缩级别：gzip取6（体积与速度的折中），zstd取3（zstd默认值）
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+def is_available(fmt: str) -> bool:
+    """格式所需的可选依赖是否已安装"""
+    if fmt == "json.zst":
+        return zstandard is not None
+    if fmt == "msgpack":
+        return msgpack is not None
+    return fmt in FORMAT_EXTENSIONS
+
+def _check_format(fmt: str):
+    if fmt not in FORMAT_EXTENSIONS:
+        raise ValueError(f"未知的数据格式: {fmt}（可选: {', '.join(FORMAT_EXTENSIONS)}）")
+    if not is_available(fmt):
+        package = "zstandard" if fmt == "json.zst" else "msgpack"
+        raise ValueError(f"数据格式 {fmt} 需要安装 {package}（pip install {package}）")
+
+def get_data_format(config: dict = None) -> str:
+    """
+    分析数据的保存格式：环境变量DATA_FORMAT优先，其次为配置文件中的data_format，默认json
+    """
+    fmt = os.environ.get("DATA_FORMAT") or (config or {}).get("data_format") or DEFAULT_FORMAT
+    _check_format(fmt)
+    return fmt
+
+def format_from_path(path: str):
+    """按扩展名判断格式，无法判断时返回None"""
+    lowered = path.lower()
+    # 先匹配较长的扩展名（.json.gz优先于.json）
+    for fmt, extension in sorted(FORMAT_EXTENSIONS.items(), key=lambda item: -len(item[1])):
+        if lowered.endswith(extension):
+            return fmt
+    if lowered.endswith('.gz'):
+        return "json.gz"
+    if lowered.endswith('.zst'):
+        return "json.zst"
+    if lowered.endswith('.mpk'):
+        return "msgpack"
+    return None
+
+def format_from_bytes(head: bytes) -> str:
+    """按文件头魔数判断格式：gzip、zstd、JSON（{或[开头），否则视为MessagePack"""
+    if head.startswith(_GZIP_MAGIC):
+        return "json.gz"
+    if head.startswith(_ZSTD_MAGIC):
+        return "json.zst"
+    stripped = head.lstrip(b' \t\r\n\xef\xbb\xbf')
+    if not stripped or stripped[:1] in (b'{', b'['):
+        return "json"
+    return "msgpack"
+
+def _encode_json(data, indent: bool) -> bytes:
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(data, option=option)
+    if indent:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def _decode_json(raw: bytes):
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw.decode('utf-8-sig'))
+
+def encode(data, fmt: str = DEFAULT_FORMAT) -> bytes:
+    """
+    编码为指定格式；未压缩的JSON保留2空格缩进，压缩格式内部使用紧凑JSON
+    """
+    _check_format(fmt)
+    if fmt == "json":
+        return _encode_json(data, indent=True)
+    if fmt == "json.gz":
+        # mtime固定为0，内容相同时输出的字节也相同
+        return gzip.compress(_encode_json(data, indent=False), compresslevel=GZIP_LEVEL, mtime=0)
+    if fmt == "json.zst":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(_encode_json(data, indent=False))
+    return msgpack.packb(data, use_bin_type=True)
+
+def decode(raw: bytes, fmt: str = None):
+    """解码，未指定格式时按魔数识别"""
+    fmt = fmt or format_from_bytes(raw[:16])
+    _check_format(fmt)
+    if fmt == "json":
+        return _decode_json(raw)
+    if fmt == "json.gz":
+        return _decode_json(gzip.decompress(raw))
+    if fmt == "json.zst":
+        return _decode_json(zstandard.ZstdDecompressor().decompressobj().decompress(raw))
+    return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+
+@contextlib.contextmanager
+def _atomic_write(path: str):
+    """
+    以二进制方式写入同目录下的唯一临时文件，成功后替换为path，失败时删除临时文件；
+    多个进程（例如常驻模式与webhook接收器）同时写同一文件时互不截断对方的临时文件
+    """
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def dump_data(data, path: str, fmt: str = None):
+    """
+    写入数据文件，未指定格式时按扩展名判断（无法判断时为JSON）；先写临时文件再替换，读取方不会读到半个文件
+    """
+    raw = encode(data, fmt or format_from_path(path) or DEFAULT_FORMAT)
+    with _atomic_write(path) as f:
+        f.write(raw)
+
+def _json_stream_chunks(data: dict, key: str, items, indent: bool):
+    """
+    逐块生成与encode(dict(data, key=list(items)))相同的JSON（key对应的列表放在最后），每次只编码一个元素
+    """
+    header = {name: value for name, value in data.items() if name != key}
+    if not indent:
+        yield _encode_json(header, indent=False)[:-1]
+        yield (b',' if header else b'') + _encode_json(key, indent=False) + b':['
+        for i, item in enumerate(items):
+            yield (b',' if i else b'') + _encode_json(item, indent=False)
+        yield b']}'
+        return
+
+    # 缩进格式：各字段值与列表元素单独编码后按所在层级补齐缩进
+    yield b'{\n'
+    for name, value in header.items():
+        yield b'  ' + _encode_json(name, indent=False) + b': ' + _encode_json(value, indent=True).replace(b'\n', b'\n  ') + b',\n'
+    yield b'  ' + _encode_json(key, indent=False) + b': ['
+    empty = True
+    for item in items:
+        yield (b'\n    ' if empty else b',\n    ') + _encode_json(item, indent=True).replace(b'\n', b'\n    ')
+        empty = False
+    yield b']\n}' if empty else b'\n  ]\n}'
+
+def dump_data_stream(data: dict, key: str, items, path: str, fmt: str = None):
+    """
+    写入数据文件，其中data[key]的列表由迭代器items逐项编码写入（内存中只保留当前元素），
+    结果与dump_data(dict(data, key=list(items)))等价；MessagePack需要预先知道列表长度，此时先收集为列表
+    """
+    fmt = fmt or format_from_path(path) or DEFAULT_FORMAT
+    _check_format(fmt)
+    if fmt == "msgpack":
+        dump_data(dict({name: value for name, value in data.items() if name != key}, **{key: list(items)}), path, fmt)
+        return
+
+    with _atomic_write(path) as raw:
+        if fmt == "json.gz":
+            # 文件名留空：否则gzip头部会写入随机的临时文件名，内容相同时输出的字节不同
+            out = gzip.GzipFile(filename='', fileobj=raw, mode='wb', compresslevel=GZIP_LEVEL, mtime=0)
+        elif fmt == "json.zst":
+            out = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=False)
+        else:
+            out = raw
+        for chunk in _json_stream_chunks(data, key, items, indent=fmt == "json"):
+            out.write(chunk)
+        if out is not raw:
+            out.close()
+
+def load_data(path: str):
+    """
+    读取任意支持格式的数据文件：扩展名与文件头魔数不一致时以魔数为准（例如改了扩展名的压缩文件）
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    by_magic = format_from_bytes(raw[:16])
+    by_path = format_from_path(path)
+    # 魔数无法区分"非JSON文本"与MessagePack，此时以扩展名为准
+    fmt = by_path if by_magic == "msgpack" and by_path else by_magic
+    return decode(raw, fmt)
+
+def data_file_path(path: str, fmt: str) -> str:
+    """把数据文件路径的扩展名替换为指定格式的扩展名"""
+    current = format_from_path(path)
+    if current:
+        for extension in (FORMAT_EXTENSIONS[current], '.gz', '.zst', '.mpk'):
+            if path.lower().endswith(extension):
+                path = path[:-len(extension)]
+                break
+    return path + FORMAT_EXTENSIONS[fmt]
+
+def resolve_data_file(path: str) -> str:
+    """
+    数据文件不存在时查找同名的其他格式文件（例如切换DATA_FORMAT后首次运行时读取旧的.json），都不存在时返回原路径
+    """
+    if os.path.exists(path):
+        return path
+    for fmt in FORMAT_EXTENSIONS:
+        candidate = data_file_path(path, fmt)
+        if os.path.exists(candidate):
+            return candidate
+    return path
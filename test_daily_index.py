@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+daily_index 单元测试：前缀和查询与逐个PR暴力计数一致、序列化往返、覆盖范围
+"""
+
+import json
+import random
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from daily_index import SERIES, DailyCountIndex
+
+_ZONES = [timezone.utc, timezone(timedelta(hours=8)), timezone(timedelta(hours=-5, minutes=-30))]
+
+def _random_prs(count, seed=11):
+    """跨越约一年、带不同时区偏移的PR，部分时间字段缺失或无法解析"""
+    rng = random.Random(seed)
+    base = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    prs = []
+    for number in range(1, count + 1):
+        zone = rng.choice(_ZONES)
+        created = (base + timedelta(minutes=rng.randrange(365 * 24 * 60))).astimezone(zone)
+        finished = (created + timedelta(hours=rng.expovariate(1 / 60))).astimezone(rng.choice(_ZONES))
+        state = rng.choice(('open', 'merged', 'merged', 'closed'))
+        prs.append({
+            'number': number,
+            'state': state,
+            'created_at': created.isoformat() if number % 97 else None,
+            'merged_at': finished.isoformat() if state == 'merged' else None,
+            'closed_at': (finished.isoformat() if number % 89 else 'not a date') if state != 'open' else None,
+            'labels': [{'name': 'ci-pipeline-failed'}] if rng.random() < 0.2 else [],
+        })
+    return prs
+
+def _is_failed(pr):
+    return any(label['name'] == 'ci-pipeline-failed' for label in pr['labels'])
+
+def _local_day(timestamp):
+    try:
+        return datetime.fromisoformat(timestamp).date() if timestamp else None
+    except ValueError:
+        return None
+
+def _brute_force(prs, series, start, end):
+    """逐个PR判断日期是否落在 [start, end] 内"""
+    total = 0
+    for pr in prs:
+        if series == 'submitted':
+            day = _local_day(pr['created_at'])
+        elif series == 'failed':
+            day = _local_day(pr['created_at']) if _is_failed(pr) else None
+        elif series == 'merged':
+            day = _local_day(pr['merged_at']) if pr['state'] == 'merged' else None
+        else:
+            day = _local_day(pr['closed_at']) if pr['state'] == 'closed' else None
+        total += day is not None and start <= day <= end
+    return total
+
+@pytest.fixture(scope="module")
+def prs():
+    return _random_prs(3000)
+
+@pytest.fixture(scope="module")
+def index(prs):
+    return DailyCountIndex.build(prs, is_failed=_is_failed)
+
+def test_totals_match_brute_force(prs, index):
+    rng = random.Random(3)
+    # 随机窗口，包括超出索引范围两端的窗口
+    first, last = index.start_date - timedelta(days=10), index.end_date + timedelta(days=10)
+    span = (last - first).days
+    for _ in range(200):
+        start = first + timedelta(days=rng.randrange(span))
+        end = start + timedelta(days=rng.randrange(120))
+        for series in SERIES:
+            assert index.total(series, start, end) == _brute_force(prs, series, start, end), (series, start, end)
+
+def test_whole_range_counts_every_event(prs, index):
+    for series in SERIES:
+        assert index.total(series, index.start_date, index.end_date) == \
+            _brute_force(prs, series, date.min, date.max)
+
+def test_window_total_and_moving_average(prs, index):
+    end = index.end_date - timedelta(days=30)
+    for days in (1, 7, 30, 90, 365):
+        expected = _brute_force(prs, 'submitted', end - timedelta(days=days - 1), end)
+        assert index.window_total('submitted', days, end) == expected
+        assert index.moving_average('submitted', days, end) == pytest.approx(expected / days)
+
+def test_daily_counts(prs, index):
+    start = index.start_date + timedelta(days=100)
+    counts = index.daily_counts('merged', start, start + timedelta(days=13))
+    assert counts == [_brute_force(prs, 'merged', day, day)
+                      for day in (start + timedelta(days=offset) for offset in range(14))]
+
+def test_reversed_window_is_empty(index):
+    assert index.total('submitted', index.end_date, index.start_date) == 0
+
+def test_round_trip_through_json(index):
+    restored = DailyCountIndex.from_dict(json.loads(json.dumps(index.to_dict())))
+    assert restored.start_date == index.start_date
+    assert restored.prefix == index.prefix
+    assert restored.end_date == index.end_date
+
+def test_empty_index():
+    index = DailyCountIndex.build([], is_failed=_is_failed)
+    assert all(index.window_total(series, 30) == 0 for series in SERIES)
+
+def test_covered_since():
+    index = DailyCountIndex.build(_random_prs(50), is_failed=_is_failed, covered_since=date(2026, 3, 1))
+    assert index.covers(30, end=date(2026, 3, 30))
+    assert not index.covers(31, end=date(2026, 3, 30))
+    restored = DailyCountIndex.from_dict(index.to_dict())
+    assert restored.covered_since == date(2026, 3, 1)
+    assert DailyCountIndex.build([], is_failed=_is_failed).covers(10000)
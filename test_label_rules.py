@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+label_rules 单元测试：三种规则的匹配、类别位集合、无效规则、配置与环境变量覆盖、默认的失败判断
+"""
+
+import json
+
+import pytest
+
+import label_rules
+from label_rules import DEFAULT_LABEL_RULES, FAILED, LabelClassifier, is_failed_pr, load_label_rules
+
+RULES = {
+    FAILED: [{"regex": "sc-fail"}, {"regex": "ci-pipeline-failed"}],
+    "approved": [{"exact": "lgtm"}, {"exact": "Approved"}],
+    "ci": [{"prefix": "ci-"}, {"regex": r"^build/\d+$"}],
+}
+
+@pytest.fixture
+def classifier():
+    return LabelClassifier(RULES)
+
+def test_rule_types(classifier):
+    assert classifier.categories_of(classifier.match("LGTM")) == ["approved"]
+    # 精确匹配不匹配子串
+    assert classifier.match("lgtm-bot") == 0
+    assert classifier.categories_of(classifier.match("CI-Running")) == ["ci"]
+    assert classifier.categories_of(classifier.match("build/42")) == ["ci"]
+    assert classifier.match("build/42x") == 0
+    # 正则为搜索而非整体匹配，一个标签可以同时属于多个类别
+    assert classifier.categories_of(classifier.match("ci-pipeline-failed")) == [FAILED, "ci"]
+    assert classifier.categories_of(classifier.match("xx-SC-FAIL-yy")) == [FAILED]
+
+def test_classify_combines_labels(classifier):
+    labels = [{"name": "lgtm"}, "ci-running", {"name": None}, None, 3]
+    assert classifier.categories_of(classifier.classify(labels)) == ["approved", "ci"]
+    assert classifier.classify([]) == classifier.classify(None) == 0
+    assert classifier.classify_pr({"number": 1}) == 0
+
+def test_label_ids_are_stable(classifier):
+    first = classifier.label_id("lgtm")
+    classifier.classify(["ci-running", "lgtm", "other"])
+    assert classifier.label_id("lgtm") == first
+    assert classifier.names == ["lgtm", "ci-running", "other"]
+    assert [classifier.categories_of(mask) for mask in classifier.masks] == [["approved"], ["ci"], []]
+
+def test_is_failed(classifier):
+    assert classifier.is_failed({"labels": [{"name": "lgtm"}, {"name": "ci-pipeline-failed"}]})
+    assert not classifier.is_failed({"labels": [{"name": "lgtm"}]})
+    assert not LabelClassifier({"approved": [{"exact": "lgtm"}]}).is_failed({"labels": ["sc-fail"]})
+
+@pytest.mark.parametrize("rule", [
+    {"glob": "ci-*"},
+    {"exact": "a", "prefix": "b"},
+    "sc-fail",
+    {"regex": "("},
+])
+def test_invalid_rules_raise(rule):
+    with pytest.raises(ValueError):
+        LabelClassifier({"bad": [rule]})
+
+def test_load_label_rules_overrides(monkeypatch):
+    monkeypatch.delenv("LABEL_RULES", raising=False)
+    assert load_label_rules() == DEFAULT_LABEL_RULES
+    config = {"label_rules": {FAILED: [{"exact": "broken"}], "ci": [{"prefix": "ci-"}]}}
+    assert load_label_rules(config) == config["label_rules"]
+
+    monkeypatch.setenv("LABEL_RULES", json.dumps({"ci": [{"prefix": "pipeline-"}]}))
+    rules = load_label_rules(config)
+    assert rules[FAILED] == [{"exact": "broken"}]
+    assert rules["ci"] == [{"prefix": "pipeline-"}]
+
+def test_default_is_failed_pr(monkeypatch):
+    monkeypatch.delenv("LABEL_RULES", raising=False)
+    monkeypatch.setattr(label_rules, "_default", None)
+    label_rules.configure({})
+    assert is_failed_pr({"labels": [{"name": "sc-fail-compile"}]})
+    assert is_failed_pr({"labels": [{"name": "CI-Pipeline-Failed"}]})
+    assert not is_failed_pr({"labels": [{"name": "ci-pipeline-passed"}]})
+
+    label_rules.configure({"label_rules": {FAILED: [{"exact": "broken"}]}})
+    assert is_failed_pr({"labels": ["broken"]})
+    assert not is_failed_pr({"labels": ["sc-fail"]})
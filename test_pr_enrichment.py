@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+pr_enrichment 单元测试：评论和操作日志的摘要、失败标签时段识别、详情缓存键、评审与修复时延统计
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from label_rules import DEFAULT_LABEL_RULES, FAILED, LabelClassifier
+from pr_enrichment import _cache_key, _is_failure_log, enrich_prs, summarize_pr_details, summarize_review_metrics
+from pr_store import PRStore
+
+NOW = datetime(2025, 3, 31, tzinfo=timezone.utc)
+CLASSIFIER = LabelClassifier(DEFAULT_LABEL_RULES)
+
+def _at(hours):
+    return (NOW - timedelta(days=10) + timedelta(hours=hours)).isoformat()
+
+def _pr(number=1, state='open', created=0, updated=0):
+    return {'number': number, 'state': state, 'user': {'login': 'alice'}, 'labels': [],
+            'created_at': _at(created), 'updated_at': _at(updated)}
+
+def _log(hours, content, user='carol', **fields):
+    return dict({'created_at': _at(hours), 'user': {'login': user}, 'content': content}, **fields)
+
+def test_first_review_ignores_author_and_bots():
+    comments = [
+        {'created_at': _at(1), 'user': {'login': 'alice'}},
+        {'created_at': _at(2), 'user': {'login': 'ci-bot'}},
+        {'created_at': _at(5), 'user': {'login': 'bob'}},
+    ]
+    logs = [_log(3, 'add label lgtm', user='carol'), _log(0.5, 'add label lgtm', user='alice')]
+    summary = summarize_pr_details(_pr(), comments, logs, classifier=CLASSIFIER)
+    assert summary['comment_count'] == 3
+    assert summary['first_review_at'] == _at(3)
+
+def test_no_review():
+    summary = summarize_pr_details(_pr(), [{'created_at': _at(1), 'user': 'alice'}], [], classifier=CLASSIFIER)
+    assert summary == {'comment_count': 1, 'first_review_at': None, 'failure_periods': []}
+
+def test_failure_periods_in_time_order():
+    logs = [
+        _log(30, 'remove label ci-pipeline-failed'),
+        _log(10, 'add label ci-pipeline-failed'),
+        _log(12, 'add label "sc-fail"'),
+        _log(40, '添加标签 ci-pipeline-failed'),
+        _log(20, 'add label ci-pipeline-passed'),
+        {'content': 'add label ci-pipeline-failed'},
+    ]
+    summary = summarize_pr_details(_pr(), [], logs, classifier=CLASSIFIER)
+    # 重复添加不开启新时段；最后一次添加尚未移除
+    assert summary['failure_periods'] == [[_at(10), _at(30)], [_at(40), None]]
+
+def test_failure_log_detection():
+    assert _is_failure_log({}, 'add label [ci-pipeline-failed]', CLASSIFIER)
+    assert _is_failure_log({'labels': [{'name': 'sc-fail'}]}, 'label changed', CLASSIFIER)
+    assert _is_failure_log({'label': 'sc-fail'}, '', CLASSIFIER)
+    # 日志带有标签字段时只按标签判断
+    assert not _is_failure_log({'labels': ['lgtm']}, 'ci-pipeline-failed', CLASSIFIER)
+    assert not _is_failure_log({}, 'add label ci-pipeline-passed', CLASSIFIER)
+
+    custom = LabelClassifier({FAILED: [{'exact': 'broken'}]})
+    assert _is_failure_log({}, 'add label broken', custom)
+    assert not _is_failure_log({}, 'add label ci-pipeline-failed', custom)
+
+def test_cache_key_changes_with_failed_rules():
+    pr = _pr(updated=7)
+    assert _cache_key(pr, CLASSIFIER) == pr['updated_at']
+    custom = _cache_key(pr, LabelClassifier({FAILED: [{'exact': 'broken'}]}))
+    assert custom.startswith(pr['updated_at'] + '#') and 'broken' in custom
+
+def test_offline_enrich_uses_cache_only(tmp_path):
+    store = PRStore(str(tmp_path / 'prs.db'))
+    try:
+        prs = [_pr(1, updated=1), _pr(2, updated=2)]
+        summary = {'comment_count': 1, 'first_review_at': _at(3), 'failure_periods': []}
+        # PR #2 在缓存后又有更新，缓存失效
+        store.save_details({1: (prs[0]['updated_at'], summary), 2: (_at(1), summary)})
+        assert enrich_prs('owner', 'repo', None, prs, store, {}, classifier=CLASSIFIER) == {1: summary}
+    finally:
+        store.close()
+
+def test_review_metrics():
+    prs = [_pr(1, created=0), _pr(2, created=0), _pr(3, 'merged', created=0), _pr(4, created=0)]
+    prs.append(dict(_pr(5), created_at=(NOW - timedelta(days=40)).isoformat()))
+    details = {
+        1: {'first_review_at': _at(2), 'failure_periods': [[_at(1), _at(4)], [_at(6), None]]},
+        2: {'first_review_at': None, 'failure_periods': []},
+        3: {'first_review_at': _at(10), 'failure_periods': [[_at(1), _at(9)]]},
+        5: {'first_review_at': None, 'failure_periods': [[_at(0), None]]},
+    }
+    metrics = summarize_review_metrics(prs, details, windows=(7, 30), quantiles=(0.5,), now=NOW)
+    assert metrics['enriched_prs'] == 4
+    # 统计窗口之外的PR也计入当前的待评审和仍失败数量
+    assert metrics['awaiting_first_review'] == 2
+    assert metrics['still_failing'] == 2
+    assert metrics['ever_failed'] == {'7': 0, '30': 2}
+
+    latency = metrics['latency_percentiles']['30']
+    assert latency['first_review']['count'] == 2
+    assert latency['failure_fix']['count'] == 2
+    assert latency['first_review']['p50'] == pytest.approx(2, rel=0.01)
+    assert metrics['latency_percentiles']['7']['first_review']['count'] == 0
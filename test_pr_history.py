@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+pr_history 单元测试：快照事件推导、记录后重放与存储一致、检查点间隔、从日志末尾向前读取
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import pr_history
+from pr_history import CHECKPOINT_FILE, PRHistory, diff_events, store_counts
+from pr_store import PRStore
+
+BASE = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+def _pr(number, state='open', labels=(), updated=0):
+    created = BASE + timedelta(hours=number)
+    updated_at = created + timedelta(hours=updated)
+    return {
+        'number': number, 'title': f'PR {number}', 'state': state, 'html_url': None,
+        'created_at': created.isoformat(), 'updated_at': updated_at.isoformat(),
+        'merged_at': updated_at.isoformat() if state == 'merged' else None,
+        'closed_at': updated_at.isoformat() if state != 'open' else None,
+        'target_branch': 'main', 'source_branch': None,
+        'labels': [{'name': label} for label in labels], 'user': {'login': 'alice'},
+    }
+
+@pytest.fixture
+def store(tmp_path):
+    store = PRStore(str(tmp_path / 'prs.db'))
+    yield store
+    store.close()
+
+def _sync(history, store, prs, at):
+    """模拟一次同步：写入存储并记录快照"""
+    changes = []
+    store.upsert_prs(prs, changes=changes)
+    return history.record(changes, store_counts(store), store.iter_prs, at=at)
+
+def _store_state(store):
+    return {record.number: record.to_dict() for record in store.iter_prs()}
+
+def test_diff_events_for_new_pr():
+    events = diff_events(None, _pr(1, 'merged', labels=('lgtm',)))
+    assert [event['kind'] for event in events] == ['opened', 'state', 'label_added']
+    assert events[1]['from'] == 'open' and events[1]['to'] == 'merged'
+    assert events[1]['at'] == _pr(1, 'merged')['merged_at']
+
+def test_diff_events_for_changed_pr():
+    previous = _pr(1, labels=('lgtm', 'ci-pipeline-running'))
+    current = _pr(1, 'closed', labels=('lgtm', 'ci-pipeline-failed'), updated=5)
+    events = diff_events(previous, current)
+    assert [(event['kind'], event.get('label')) for event in events] == \
+        [('state', None), ('label_added', 'ci-pipeline-failed'), ('label_removed', 'ci-pipeline-running')]
+    assert events[0]['at'] == current['closed_at']
+    assert diff_events(previous, dict(previous)) == []
+
+def test_record_and_replay_match_store(tmp_path, store):
+    rng = random.Random(5)
+    history = PRHistory(str(tmp_path / 'history'), checkpoint_interval=4)
+    prs = {number: _pr(number) for number in range(1, 41)}
+    for cycle in range(12):
+        # 每轮更新部分PR并新增几个PR
+        updated = []
+        for number in rng.sample(sorted(prs), 5):
+            state = rng.choice(('open', 'merged', 'closed'))
+            prs[number] = _pr(number, state, labels=rng.sample(('lgtm', 'approved', 'ci-pipeline-failed'), 2),
+                              updated=cycle + 1)
+            updated.append(prs[number])
+        for number in range(len(prs) + 1, len(prs) + 3):
+            prs[number] = _pr(number)
+            updated.append(prs[number])
+        _sync(history, store, updated, BASE + timedelta(days=cycle))
+
+    assert history.state_at() == _store_state(store)
+    entries = history.entries()
+    assert [entry['seq'] for entry in entries] == list(range(12))
+    assert entries[-1]['counts'] == store_counts(store)
+
+def test_state_at_earlier_time(tmp_path, store):
+    history = PRHistory(str(tmp_path / 'history'))
+    _sync(history, store, [_pr(1), _pr(2)], BASE)
+    before = _store_state(store)
+    _sync(history, store, [_pr(1, 'merged', updated=3)], BASE + timedelta(days=1))
+
+    assert history.state_at(BASE + timedelta(hours=12)) == before
+    assert history.state_at(BASE - timedelta(days=1)) == {}
+    assert history.state_at()[1]['state'] == 'merged'
+
+def test_unchanged_sync_records_empty_delta(tmp_path, store):
+    history = PRHistory(str(tmp_path / 'history'))
+    _sync(history, store, [_pr(1), _pr(2)], BASE)
+    entry = _sync(history, store, [_pr(1), _pr(2)], BASE + timedelta(days=1))
+    assert entry['type'] == 'delta'
+    assert entry['upserts'] == [] and entry['events'] == []
+
+def test_first_record_is_checkpoint_without_events(tmp_path, store):
+    history = PRHistory(str(tmp_path / 'history'))
+    entry = _sync(history, store, [_pr(1, 'merged')], BASE)
+    assert entry['type'] == 'checkpoint'
+    assert entry['events'] == []
+    assert (tmp_path / 'history' / CHECKPOINT_FILE.format(seq=0)).exists()
+
+def test_checkpoint_interval(tmp_path, store):
+    history = PRHistory(str(tmp_path / 'history'), checkpoint_interval=3)
+    _sync(history, store, [_pr(number) for number in range(1, 11)], BASE)
+    types = [_sync(history, store, [_pr(1, updated=day)], BASE + timedelta(days=day))['type']
+             for day in range(1, 9)]
+    assert types == ['delta', 'delta', 'delta', 'checkpoint', 'delta', 'delta', 'delta', 'checkpoint']
+
+def test_large_change_writes_checkpoint(tmp_path, store):
+    history = PRHistory(str(tmp_path / 'history'))
+    _sync(history, store, [_pr(number) for number in range(1, 11)], BASE)
+    entry = _sync(history, store, [_pr(number, 'merged', updated=1) for number in range(1, 7)],
+                  BASE + timedelta(days=1))
+    assert entry['type'] == 'checkpoint'
+    assert entry['changed'] == 6
+    assert [event['kind'] for event in entry['events']] == ['state'] * 6
+
+def test_reversed_entries_with_small_blocks(tmp_path, store, monkeypatch):
+    history = PRHistory(str(tmp_path / 'history'))
+    _sync(history, store, [_pr(number) for number in range(1, 5)], BASE)
+    for day in range(1, 6):
+        _sync(history, store, [_pr(1, labels=('lgtm',) * (day % 2), updated=day)], BASE + timedelta(days=day))
+    # 写入中断留下的不完整行被忽略
+    with open(history.log_file, 'a', encoding='utf-8') as f:
+        f.write('{"seq": 6, "at"')
+
+    expected = history.entries()[::-1]
+    for block_size in (1, 7, 64, 10 ** 6):
+        monkeypatch.setattr(pr_history, '_TAIL_BLOCK_SIZE', block_size)
+        assert list(history._reversed_entries()) == expected
+    assert history._tail() == (5, 5)
+
+def test_replays_legacy_deletes(tmp_path, store):
+    history = PRHistory(str(tmp_path / 'history'))
+    _sync(history, store, [_pr(1), _pr(2)], BASE)
+    history._append({'seq': 1, 'at': (BASE + timedelta(days=1)).isoformat(), 'type': 'delta',
+                     'counts': {}, 'upserts': [], 'deletes': [2], 'events': []})
+    assert sorted(history.state_at()) == [1]
+
+def test_trend_and_events(tmp_path, store):
+    history = PRHistory(str(tmp_path / 'history'))
+    _sync(history, store, [_pr(1), _pr(2), _pr(3)], BASE)
+    _sync(history, store, [_pr(1, 'merged', updated=30), _pr(2, labels=('lgtm',), updated=30)],
+          BASE + timedelta(days=2))
+    _sync(history, store, [_pr(3, 'closed', updated=80)], BASE + timedelta(days=4))
+
+    assert [value for _, value in history.trend()] == [3, 2, 1]
+    assert [value for _, value in history.trend('merged', since=BASE + timedelta(days=1))] == [1, 1]
+    assert [(event['number'], event['to']) for event in history.events(kinds=['state'])] == \
+        [(1, 'merged'), (3, 'closed')]
+    assert [event['kind'] for event in history.events(number=2)] == ['label_added']
+    assert [event['number'] for event in history.events(since=BASE + timedelta(days=3))] == [3]
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+quantile_sketch 单元测试：分位数相对误差、合并、序列化与移除样本
+"""
+
+import json
+import random
+
+import pytest
+
+from quantile_sketch import DDSketch, merge_sketch_dicts
+
+QUANTILES = (0.01, 0.25, 0.5, 0.75, 0.9, 0.99, 1.0)
+
+def _values(count, seed=7):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(0.5, 1.5) for _ in range(count)]
+
+def _exact_quantile(values, q):
+    """与DDSketch.quantile相同的秩定义：排序后第floor(q * (n - 1))个样本"""
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+def _sketch(values, **kwargs):
+    sketch = DDSketch(**kwargs)
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+@pytest.mark.parametrize("relative_accuracy", [0.01, 0.02, 0.05])
+def test_quantiles_within_relative_accuracy(relative_accuracy):
+    values = _values(5000)
+    sketch = _sketch(values, relative_accuracy=relative_accuracy)
+    for q in QUANTILES:
+        exact = _exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - exact) <= relative_accuracy * exact + 1e-12, q
+
+def test_count_sum_min_max_are_exact():
+    values = _values(1000)
+    sketch = _sketch(values)
+    assert sketch.count == len(values)
+    assert sketch.sum == pytest.approx(sum(values))
+    assert sketch.min == min(values)
+    assert sketch.max == max(values)
+    assert sketch.quantile(0) == min(values)
+
+def test_empty_sketch():
+    sketch = DDSketch()
+    assert sketch.quantile(0.5) is None
+    assert sketch.summary() == {"count": 0, "p50": None, "p75": None, "p90": None, "p99": None}
+
+def test_zero_and_tiny_values_go_to_zero_bucket():
+    sketch = _sketch([0.0, 0.0, 1e-12, 5.0])
+    assert sketch.zero_count == 3
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(1.0) == pytest.approx(5.0, rel=0.01)
+
+def test_merge_matches_single_sketch():
+    values = _values(3000)
+    merged = _sketch(values[:1000])
+    merged.merge(_sketch(values[1000:2000]))
+    merged.merge(_sketch(values[2000:]))
+    single = _sketch(values)
+    assert merged.bins == single.bins
+    assert (merged.count, merged.zero_count, merged.min, merged.max) == \
+        (single.count, single.zero_count, single.min, single.max)
+    for q in QUANTILES:
+        assert merged.quantile(q) == single.quantile(q)
+
+def test_merge_rejects_different_accuracy():
+    with pytest.raises(ValueError):
+        DDSketch(0.01).merge(_sketch([1.0], relative_accuracy=0.02))
+
+def test_round_trip_through_json():
+    sketch = _sketch(_values(500))
+    restored = DDSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+    assert restored.to_dict() == sketch.to_dict()
+    assert restored.summary() == sketch.summary()
+
+def test_merge_sketch_dicts():
+    values = _values(800)
+    parts = [_sketch(values[:300]).to_dict(), _sketch(values[300:]).to_dict()]
+    assert merge_sketch_dicts(*parts).summary() == _sketch(values).summary()
+    assert merge_sketch_dicts().count == 0
+
+def test_remove_undoes_add():
+    values = _values(400)
+    sketch = _sketch(values)
+    for value in values[200:]:
+        sketch.remove(value)
+    expected = _sketch(values[:200])
+    assert sketch.bins == expected.bins
+    assert sketch.count == expected.count
+    assert sketch.sum == pytest.approx(expected.sum)
+
+def test_remove_last_sample_resets():
+    sketch = _sketch([3.0])
+    sketch.remove(3.0)
+    assert sketch.count == 0 and sketch.bins == {} and sketch.min is None
+
+def test_bucket_limit_keeps_upper_quantiles_accurate():
+    # 1200个样本各占一个桶，桶数超过上限时合并最低的桶，最高的63个桶（约5%的样本）保持原有精度
+    values = [10 ** (i / 100) for i in range(-600, 600)]
+    sketch = _sketch(values, max_buckets=64)
+    assert len(sketch.bins) <= 64
+    for q in (0.96, 0.99, 1.0):
+        exact = _exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact + 1e-12
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+rollup_cube 单元测试：增量更新与全量重建一致、单元格计数与暴力统计一致、PR移除、经PRStore保存与读取
+"""
+
+import random
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from pr_store import PRStore
+from rollup_cube import RollupCube, cell_key, period_key
+
+BASE = datetime(2025, 1, 1, tzinfo=timezone(timedelta(hours=8)))
+AUTHORS = ('alice', 'bob', 'carol')
+LABELS = ('lgtm', 'approved', 'ci-pipeline-failed')
+
+def _is_failed(pr):
+    return any(label['name'] == 'ci-pipeline-failed' for label in pr['labels'])
+
+def _random_pr(rng, number, version=0):
+    created = BASE + timedelta(hours=rng.randrange(120 * 24))
+    state = rng.choice(('open', 'merged', 'closed'))
+    finished = created + timedelta(hours=rng.randrange(1, 500))
+    return {
+        'number': number, 'state': state, 'title': f'PR {number} v{version}',
+        'created_at': created.isoformat(),
+        'merged_at': finished.isoformat() if state == 'merged' else None,
+        'closed_at': finished.isoformat() if state != 'open' else None,
+        'target_branch': rng.choice(('main', 'dev')),
+        'user': {'login': rng.choice(AUTHORS)},
+        'labels': [{'name': name} for name in rng.sample(LABELS, rng.randrange(3))],
+    }
+
+def _cells(cube):
+    return {key: cell.to_dict() for key, cell in cube.cells.items()}
+
+def _assert_same_cells(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key in expected:
+        sum_actual, sum_expected = actual[key].pop('merge_days_sum'), expected[key].pop('merge_days_sum')
+        assert sum_actual == pytest.approx(sum_expected, abs=1e-9), key
+        sketch_actual, sketch_expected = actual[key].pop('merge_sketch'), expected[key].pop('merge_sketch')
+        assert actual[key] == expected[key], key
+        # 移除样本后草图的min/max不回退，只保证仍是剩余样本的上下界
+        assert sketch_actual['sum'] == pytest.approx(sketch_expected['sum'], abs=1e-9), key
+        for field in ('count', 'zero_count', 'bins'):
+            assert sketch_actual[field] == sketch_expected[field], key
+        if sketch_expected['count']:
+            assert sketch_actual['min'] <= sketch_expected['min'] and sketch_actual['max'] >= sketch_expected['max']
+
+@pytest.fixture
+def prs():
+    rng = random.Random(9)
+    return {number: _random_pr(rng, number) for number in range(1, 301)}
+
+def test_incremental_update_matches_rebuild(prs):
+    rng = random.Random(2)
+    cube = RollupCube()
+    assert cube.update(prs.values(), _is_failed) == len(prs)
+    for version in range(1, 6):
+        changed = [_random_pr(rng, number, version) for number in rng.sample(sorted(prs), 40)]
+        prs.update((pr['number'], pr) for pr in changed)
+        cube.update(changed, _is_failed)
+
+    rebuilt = RollupCube()
+    rebuilt.update(prs.values(), _is_failed)
+    _assert_same_cells(_cells(cube), _cells(rebuilt))
+    assert cube.contributions == rebuilt.contributions
+
+def test_unchanged_pr_is_skipped(prs):
+    cube = RollupCube()
+    cube.update(prs.values(), _is_failed)
+    cube.dirty_cells.clear()
+    # 标题不影响贡献
+    assert cube.update([dict(prs[1], title='renamed')], _is_failed) == 0
+    assert cube.dirty_cells == set()
+
+def test_counts_match_brute_force(prs):
+    cube = RollupCube()
+    cube.update(prs.values(), _is_failed)
+    for author in AUTHORS:
+        for grain in ('week', 'month'):
+            for period in cube.periods(grain):
+                selected = [pr for pr in prs.values() if pr['user']['login'] == author and
+                            period_key(datetime.fromisoformat(pr['created_at']).date(), grain) == period]
+                summary = cube.lookup('author', author, grain, period)
+                if not selected:
+                    assert summary is None
+                    continue
+                assert summary['submitted'] == len(selected)
+                assert summary['merged'] == sum(pr['state'] == 'merged' for pr in selected)
+                assert summary['closed'] == sum(pr['state'] == 'closed' for pr in selected)
+                assert summary['failed'] == sum(map(_is_failed, selected))
+
+def test_removal_empties_cells(prs):
+    cube = RollupCube()
+    cube.update(prs.values(), _is_failed)
+    # 缺少创建时间的PR不参与汇总，相当于移除
+    cube.update([dict(pr, created_at=None) for pr in prs.values()], _is_failed)
+    assert cube.cells == {}
+    assert cube.contributions == {}
+
+def test_merge_duration_summary():
+    created = BASE
+    prs = [{'number': number, 'state': 'merged', 'created_at': created.isoformat(),
+            'merged_at': (created + timedelta(days=days)).isoformat(), 'labels': [], 'user': None}
+           for number, days in enumerate((1, 2, 3, 10), start=1)]
+    cube = RollupCube()
+    cube.update(prs, _is_failed)
+    summary = cube.lookup('all', '*', 'month', '2025-01')
+    assert summary['merged'] == 4
+    assert summary['avg_merge_days'] == 4.0
+    assert summary['p50_merge_days'] == pytest.approx(2, rel=0.01)
+    assert summary['failure_rate'] == 0
+
+def test_period_key():
+    assert period_key(date(2026, 1, 1), 'week') == '2026-W01'
+    assert period_key(date(2027, 1, 1), 'week') == '2026-W53'
+    assert period_key(date(2026, 1, 1), 'month') == '2026-01'
+    assert cell_key('label', 'lgtm', 'week', '2026-W01') == 'label\tlgtm\tweek\t2026-W01'
+
+def test_save_and_load_through_store(tmp_path, prs):
+    store = PRStore(str(tmp_path / 'prs.db'))
+    try:
+        cube = RollupCube()
+        cube.update(prs.values(), _is_failed)
+        cube.save(store)
+        # 只写回修改过的条目：移除一个PR后保存，读取结果与内存中的立方体一致
+        cube.update([dict(prs[1], created_at=None)], _is_failed)
+        cube.save(store)
+
+        loaded = RollupCube.load(store)
+        _assert_same_cells(_cells(loaded), _cells(cube))
+        assert loaded.contributions == cube.contributions
+        assert 1 not in loaded.contributions
+    finally:
+        store.close()
+
+def test_export_recent_periods(prs):
+    cube = RollupCube()
+    cube.update(prs.values(), _is_failed)
+    exported = cube.export({'week': 2, 'month': 1})
+    assert sorted(exported['slices']['week']) == cube.periods('week')[-2:]
+    assert sorted(exported['slices']['month']) == cube.periods('month')[-1:]
+    latest = cube.periods('month')[-1]
+    assert exported['slices']['month'][latest]['all']['*'] == cube.lookup('all', '*', 'month', latest)
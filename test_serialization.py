@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+serialization 单元测试：各格式往返、流式写入与一次性写入等价、格式识别、临时文件清理
+"""
+
+import os
+
+import pytest
+
+import serialization
+from serialization import (FORMAT_EXTENSIONS, data_file_path, decode, dump_data, dump_data_stream, encode,
+                           format_from_bytes, format_from_path, load_data, resolve_data_file)
+
+FORMATS = [pytest.param(fmt, marks=pytest.mark.skipif(not serialization.is_available(fmt),
+                                                      reason=f"{fmt} 所需的可选依赖未安装"))
+           for fmt in FORMAT_EXTENSIONS]
+
+# 是否使用orjson快速路径（未安装orjson时两组参数相同）
+JSON_BACKENDS = [pytest.param(True, id="orjson"), pytest.param(False, id="json")]
+
+def _data():
+    return {
+        "repository": "owner/repo",
+        "generated_at": "2025-03-01T10:00:00+08:00",
+        "stats": {"total": 3, "rate": 0.5, "empty": {}, "none": None, "nested": {"list": [1, [2, 3]]}},
+        "prs": [
+            {"number": number, "title": f"修复 #{number}", "labels": [{"name": "lgtm"}] if number % 2 else [],
+             "merged_at": None, "user": {"login": "alice"}}
+            for number in range(1, 4)
+        ],
+    }
+
+@pytest.fixture(params=JSON_BACKENDS)
+def json_backend(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(serialization, "orjson", None)
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_round_trip(tmp_path, fmt, json_backend):
+    path = str(tmp_path / ("data" + FORMAT_EXTENSIONS[fmt]))
+    dump_data(_data(), path)
+    assert load_data(path) == _data()
+    assert decode(encode(_data(), fmt)) == _data()
+
+@pytest.mark.parametrize("fmt", FORMATS)
+@pytest.mark.parametrize("count", [0, 1, 3])
+def test_stream_matches_dump(tmp_path, fmt, count, json_backend):
+    data = _data()
+    data["prs"] = data["prs"][:count]
+    whole, streamed = str(tmp_path / "whole"), str(tmp_path / "streamed")
+    dump_data(data, whole, fmt)
+    dump_data_stream({name: value for name, value in data.items() if name != "prs"}, "prs",
+                     iter(data["prs"]), streamed, fmt)
+    with open(whole, 'rb') as a, open(streamed, 'rb') as b:
+        whole_raw, streamed_raw = a.read(), b.read()
+    assert decode(streamed_raw, fmt) == data
+    if fmt == "json":
+        assert streamed_raw == whole_raw
+    elif fmt == "json.gz":
+        # gzip（mtime固定、不含文件名）的输出逐字节一致；头部第10字节为操作系统标识，随Python版本而不同
+        assert streamed_raw[:9] == whole_raw[:9] and streamed_raw[10:] == whole_raw[10:]
+
+def test_stream_without_other_fields(tmp_path, json_backend):
+    path = str(tmp_path / "items.json.gz")
+    dump_data_stream({}, "items", iter([1, 2]), path)
+    assert load_data(path) == {"items": [1, 2]}
+
+def test_format_from_path():
+    assert format_from_path("a/b.json") == "json"
+    assert format_from_path("B.JSON.GZ") == "json.gz"
+    assert format_from_path("b.json.zst") == "json.zst"
+    assert format_from_path("b.gz") == "json.gz"
+    assert format_from_path("b.mpk") == "msgpack"
+    assert format_from_path("b.msgpack") == "msgpack"
+    assert format_from_path("b.txt") is None
+
+def test_format_from_bytes():
+    assert format_from_bytes(encode(_data(), "json.gz")[:16]) == "json.gz"
+    assert format_from_bytes(b'\x28\xb5\x2f\xfd\x00') == "json.zst"
+    assert format_from_bytes(b'\xef\xbb\xbf  {"a": 1}') == "json"
+    assert format_from_bytes(b'\n[1]') == "json"
+    assert format_from_bytes(b'') == "json"
+    assert format_from_bytes(b'\x82\xa1a\x01') == "msgpack"
+
+def test_load_detects_renamed_compressed_file(tmp_path):
+    # 扩展名与内容不一致时以魔数为准
+    path = str(tmp_path / "data.json")
+    dump_data(_data(), path, "json.gz")
+    assert load_data(path) == _data()
+
+def test_unknown_format_raises(tmp_path):
+    with pytest.raises(ValueError):
+        encode({}, "yaml")
+    with pytest.raises(ValueError):
+        dump_data({}, str(tmp_path / "data.json"), "yaml")
+
+def test_failed_write_keeps_old_file_and_removes_temp(tmp_path):
+    path = str(tmp_path / "data.json")
+    dump_data(_data(), path)
+
+    def failing_items():
+        yield {"number": 1}
+        raise RuntimeError("中断")
+
+    with pytest.raises(RuntimeError):
+        dump_data_stream({}, "prs", failing_items(), path)
+    assert load_data(path) == _data()
+    assert os.listdir(tmp_path) == ["data.json"]
+
+def test_data_file_path_and_resolve(tmp_path):
+    assert data_file_path("out/a.json", "json.gz") == "out/a.json.gz"
+    assert data_file_path("out/a.json.gz", "json") == "out/a.json"
+    assert data_file_path("out/a", "msgpack") == "out/a.msgpack"
+
+    path = str(tmp_path / "a.json.gz")
+    assert resolve_data_file(path) == path
+    dump_data(_data(), str(tmp_path / "a.json"))
+    assert resolve_data_file(path) == str(tmp_path / "a.json")
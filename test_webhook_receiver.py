@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+webhook_receiver 单元测试：两种载荷风格的解析、事件合并到已有PR、过期事件与乱序事件的处理
+"""
+
+import json
+from types import SimpleNamespace
+
+from pr_record import project_pr
+from webhook_receiver import WebhookReceiver, load_deliveries, merge_update, parse_webhook_event
+
+GITLAB_HEADERS = {'X-GitCode-Event': 'Merge Request Hook'}
+
+def _gitlab_payload(**attrs):
+    return {
+        'object_kind': 'merge_request',
+        'project': {'path_with_namespace': 'owner/repo'},
+        'object_attributes': dict({'iid': 42}, **attrs),
+    }
+
+def _existing(**fields):
+    pr = {
+        'number': 42, 'title': 'fix build', 'state': 'open', 'html_url': 'https://example.com/42',
+        'created_at': '2025-03-01T10:00:00+08:00', 'updated_at': '2025-03-02T10:00:00+08:00',
+        'merged_at': None, 'closed_at': None, 'labels': [{'name': 'lgtm'}], 'user': {'login': 'alice'},
+    }
+    pr.update(fields)
+    return project_pr(pr)
+
+def test_parse_gitlab_style_event():
+    payload = _gitlab_payload(
+        title='fix build', state='opened', action='open', url='https://example.com/42',
+        target_branch='main', source_branch='fix', created_at='2025-03-01 02:00:00 UTC',
+        updated_at='2025-03-01 02:00:00 UTC', labels=[{'title': 'lgtm'}])
+    payload['user'] = {'username': 'alice'}
+
+    repository, update = parse_webhook_event(payload, GITLAB_HEADERS)
+    assert repository == 'owner/repo'
+    assert update == {
+        'number': 42, 'title': 'fix build', 'state': 'open', 'html_url': 'https://example.com/42',
+        'target_branch': 'main', 'source_branch': 'fix', 'user': {'login': 'alice'},
+        'labels': [{'name': 'lgtm'}],
+        'created_at': '2025-03-01T02:00:00+00:00', 'updated_at': '2025-03-01T02:00:00+00:00',
+    }
+
+def test_parse_gitee_style_event():
+    payload = {
+        'pull_request': {
+            'number': '7', 'title': 'feat', 'state': 'merged', 'user': {'login': 'bob'},
+            'base': {'ref': 'main'}, 'head': {'ref': 'feat'}, 'labels': [{'name': 'ci-pipeline-passed'}],
+            'created_at': '2025-03-01T09:00:00+08:00', 'merged_at': '2025-03-02T09:00:00+08:00',
+        },
+        'repository': {'full_name': 'owner/repo'},
+    }
+    repository, update = parse_webhook_event(payload, {'X-Gitee-Event': 'Merge Request Hook'})
+    assert repository == 'owner/repo'
+    assert update['number'] == 7
+    assert update['state'] == 'merged'
+    assert update['target_branch'] == 'main' and update['source_branch'] == 'feat'
+    assert update['user'] == {'login': 'bob'}
+    assert update['merged_at'] == '2025-03-02T09:00:00+08:00'
+    # 事件中没有的字段不出现在更新中，合并时保留已有值
+    assert 'closed_at' not in update and 'html_url' not in update
+
+def test_non_merge_request_events_are_ignored():
+    assert parse_webhook_event({'object_kind': 'push'}, {'X-GitCode-Event': 'Push Hook'}) == (None, None)
+    assert parse_webhook_event(_gitlab_payload(), {'X-Gitlab-Event': 'Note Hook'}) == (None, None)
+    assert parse_webhook_event({'object_kind': 'merge_request', 'object_attributes': {}}) == (None, None)
+    assert parse_webhook_event(['not', 'a', 'dict']) == (None, None)
+
+def test_merge_update_keeps_existing_fields():
+    _, update = parse_webhook_event(_gitlab_payload(labels=[{'title': 'lgtm'}, {'title': 'approved'}],
+                                                    updated_at='2025-03-03T10:00:00+08:00'), GITLAB_HEADERS)
+    pr = merge_update(_existing(), update)
+    assert pr['title'] == 'fix build'
+    assert pr['user'] == {'login': 'alice'}
+    assert pr['labels'] == [{'name': 'lgtm'}, {'name': 'approved'}]
+    assert pr['updated_at'] == '2025-03-03T10:00:00+08:00'
+
+def test_merge_update_fills_merged_and_closed_times():
+    _, update = parse_webhook_event(_gitlab_payload(state='merged', updated_at='2025-03-03T10:00:00+08:00'),
+                                    GITLAB_HEADERS)
+    pr = merge_update(_existing(), update)
+    assert pr['state'] == 'merged'
+    assert pr['merged_at'] == pr['closed_at'] == '2025-03-03T10:00:00+08:00'
+
+    _, update = parse_webhook_event(_gitlab_payload(state='closed', updated_at='2025-03-04T10:00:00+08:00'),
+                                    GITLAB_HEADERS)
+    pr = merge_update(_existing(), update)
+    assert pr['state'] == 'closed'
+    assert pr['merged_at'] is None
+    assert pr['closed_at'] == '2025-03-04T10:00:00+08:00'
+
+def test_merge_update_rejects_stale_event():
+    # 事件的updated_at早于已有数据（按时间点比较，与时区写法无关）
+    update = {'number': 42, 'state': 'closed', 'updated_at': '2025-03-02T01:59:59+00:00'}
+    assert merge_update(_existing(), update) is None
+    update['updated_at'] = '2025-03-02T02:00:00+00:00'
+    assert merge_update(_existing(), update)['state'] == 'closed'
+
+def test_merge_update_without_created_at_waits_for_poll():
+    _, update = parse_webhook_event(_gitlab_payload(state='opened', updated_at='2025-03-01 02:00:00 UTC'),
+                                    GITLAB_HEADERS)
+    assert merge_update(None, update) is None
+    assert merge_update(_existing(created_at=None), update) is None
+
+def test_load_deliveries(tmp_path):
+    delivery = {'headers': GITLAB_HEADERS, 'payload': _gitlab_payload(state='opened')}
+    (tmp_path / 'a.json').write_text(json.dumps(delivery), encoding='utf-8')
+    (tmp_path / 'b.ndjson').write_text(json.dumps(delivery) + '\n\n' + json.dumps(_gitlab_payload()) + '\n',
+                                       encoding='utf-8')
+    (tmp_path / 'notes.txt').write_text('ignored', encoding='utf-8')
+
+    deliveries = load_deliveries([str(tmp_path)])
+    assert deliveries == [(GITLAB_HEADERS, delivery['payload']), (GITLAB_HEADERS, delivery['payload']),
+                          ({}, _gitlab_payload())]
+
+def _receiver(secret=None):
+    watched = SimpleNamespace(repository='Owner/Repo')
+    return WebhookReceiver(SimpleNamespace(repositories=[watched]), secret=secret)
+
+def test_receive_merges_out_of_order_events():
+    receiver = _receiver()
+    newer = _gitlab_payload(state='merged', updated_at='2025-03-03T10:00:00+08:00')
+    older = _gitlab_payload(state='opened', title='fix build', updated_at='2025-03-02T10:00:00+08:00')
+    assert receiver.receive(GITLAB_HEADERS, newer) == 'queued'
+    assert receiver.receive(GITLAB_HEADERS, older) == 'queued'
+
+    # 仓库名不区分大小写；旧事件只补充缺失的字段，不覆盖较新的状态
+    queued = receiver.pending['Owner/Repo'][42]
+    assert queued['state'] == 'merged'
+    assert queued['updated_at'] == '2025-03-03T10:00:00+08:00'
+    assert queued['title'] == 'fix build'
+
+def test_receive_ignores_unwatched_repositories():
+    receiver = _receiver()
+    payload = _gitlab_payload()
+    payload['project'] = {'path_with_namespace': 'other/repo'}
+    assert receiver.receive(GITLAB_HEADERS, payload) == 'ignored'
+    assert receiver.receive({'X-GitCode-Event': 'Push Hook'}, {'object_kind': 'push'}) == 'ignored'
+    assert receiver.pending == {}
+    assert receiver.stats['ignored'] == 2
+
+def test_authorized():
+    assert _receiver().authorized({})
+    receiver = _receiver(secret='s3cret')
+    assert receiver.authorized({'x-gitlab-token': 's3cret'})
+    assert not receiver.authorized({'X-GitCode-Token': 'wrong'})
+    assert not receiver.authorized({})
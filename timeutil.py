@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+时间解析工具
+功能：优先使用标准库的ISO 8601快速解析，格式不兼容时再回退到dateutil
+"""
+
+from datetime import datetime, timezone
+
+from dateutil import parser
+
+def parse_timestamp(timestamp: str) -> datetime:
+    """
+    解析API返回的时间字符串，缺少时区信息时按UTC处理
+
+    解析失败时抛出ValueError/TypeError（与dateutil.parser.parse一致）
+    """
+    try:
+        if timestamp.endswith('Z'):
+            # Python 3.11之前的fromisoformat不支持Z后缀
+            parsed = datetime.fromisoformat(timestamp[:-1] + '+00:00')
+        else:
+            parsed = datetime.fromisoformat(timestamp)
+    except (ValueError, AttributeError):
+        parsed = parser.parse(timestamp)
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
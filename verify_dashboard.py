@@ -1,113 +1,163 @@
 #!/usr/bin/env python3
-import json
 import re
+import sys
 
-try:
-    # 读取JSON数据
-    with open('/home/runner/work/monitor_Gitcode_PR_efficiency/monitor_Gitcode_PR_efficiency/triton_ascend_prs_analysis.json', 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    print("="*60)
-    print("🎯 看板数据验证报告")
-    print("="*60)
-    
-    # 基础统计
-    total_open_prs = data.get('total_open_prs', 0)
-    recent_submitted_prs = data.get('recent_submitted_prs', [])
-    recent_merged_analysis = data.get('recent_merged_prs_analysis', {})
-    
-    # 失败PR统计
-    daily_submissions = data.get('daily_submissions', {})
-    daily_failed_submissions = data.get('daily_failed_submissions', {})
-    
-    # 计算近7天失败PR数量
-    from datetime import datetime, timedelta, timezone
-    now = datetime.now(timezone.utc)
-    seven_days_ago = now - timedelta(days=7)
-    
-    recent_failed_prs = 0
-    for date_str, failed_count in daily_failed_submissions.items():
-        try:
-            date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-            date_obj = date_obj.replace(tzinfo=timezone.utc)
-            if date_obj >= seven_days_ago:
-                recent_failed_prs += failed_count
-        except ValueError:
-            continue
-    
-    print(f"📊 核心指标:")
-    print(f"  • 待合入PR数量: {total_open_prs}")
-    print(f"  • 近7天提交PR数量: {len(recent_submitted_prs)}")
-    print(f"  • 近7天合入PR数量: {recent_merged_analysis.get('count', 0)}")
-    print(f"  • 近7天失败PR数量: {recent_failed_prs}")
-    
-    if recent_submitted_prs:
-        failure_rate = (recent_failed_prs / len(recent_submitted_prs)) * 100
-        print(f"  • 近7天失败率: {failure_rate:.1f}%")
-    
-    print(f"\n📈 每日数据统计:")
-    print(f"  • 每日提交数据天数: {len(daily_submissions)}")
-    print(f"  • 每日失败数据天数: {len(daily_failed_submissions)}")
-    
-    # 显示最近几天的数据
-    sorted_dates = sorted(daily_submissions.keys())
-    print(f"  • 数据时间范围: {sorted_dates[0]} 到 {sorted_dates[-1]}")
-    
-    print(f"\n🔥 失败PR详细数据:")
-    total_failed = sum(daily_failed_submissions.values())
-    total_submitted = sum(daily_submissions.values())
-    print(f"  • 总失败PR数量: {total_failed}")
-    print(f"  • 总提交PR数量: {total_submitted}")
-    print(f"  • 总体失败率: {(total_failed/total_submitted*100):.1f}%")
-    
-    if total_failed > 0:
-        print(f"  • 失败PR按日期分布:")
-        for date in sorted(daily_failed_submissions.keys())[-5:]:
-            count = daily_failed_submissions[date]
-            total = daily_submissions.get(date, 0)
-            if count > 0:
-                print(f"    - {date}: {count}个失败PR (当天提交{total}个)")
-    
-    # 检查HTML看板文件
-    print(f"\n🌐 HTML看板验证:")
+from daily_index import DailyCountIndex
+from repo_config import get_output_dir, load_repositories, repo_path
+from serialization import load_data, resolve_data_file
+
+# 分析数据的必要字段
+REQUIRED_FIELDS = ('repository', 'total_open_prs', 'daily_submissions', 'daily_failed_submissions')
+
+def verify_repository(data_file, dashboard_file) -> bool:
+    """验证单个仓库的分析数据文件和HTML看板文件，返回是否通过"""
+    try:
+        # 读取分析数据（JSON、压缩JSON或MessagePack）
+        data = load_data(resolve_data_file(data_file))
+    except Exception as e:
+        print(f"❌ 验证过程出错: {e}")
+        return False
+    
     try:
-        with open('/home/runner/work/monitor_Gitcode_PR_efficiency/monitor_Gitcode_PR_efficiency/triton_pr_dashboard.html', 'r', encoding='utf-8') as f:
+        with open(dashboard_file, 'r', encoding='utf-8') as f:
             html_content = f.read()
+    except FileNotFoundError:
+        html_content = None
+    
+    return verify_analysis(data, html_content, data_file)
+
+def verify_analysis(data, html_content, source="") -> bool:
+    """
+    验证内存中的分析数据和HTML看板内容（html_content为None表示看板不存在），打印验证报告并返回是否通过
+
+    数据缺少必要字段、看板不存在或生成失败时不通过（refresh_dashboard.py在写入结果文件前也以此把关）
+    """
+    try:
+        print("="*60)
+        print(f"🎯 看板数据验证报告: {data.get('repository', source)}")
+        print("="*60)
+    
+        missing_fields = [field for field in REQUIRED_FIELDS if field not in data]
+        if missing_fields:
+            print(f"❌ 数据缺少必要字段: {', '.join(missing_fields)}")
+            return False
+    
+        # 基础统计
+        total_open_prs = data.get('total_open_prs', 0)
+        recent_submitted_prs = data.get('recent_submitted_prs', [])
+        recent_merged_analysis = data.get('recent_merged_prs_analysis', {})
+    
+        # 失败PR统计
+        daily_submissions = data.get('daily_submissions', {})
+        daily_failed_submissions = data.get('daily_failed_submissions', {})
+    
+        # 计算近7天失败PR数量
+        from datetime import datetime, timedelta, timezone
+        now = datetime.now(timezone.utc)
+        seven_days_ago = now - timedelta(days=7)
+    
+        recent_failed_prs = 0
+        if data.get('daily_index'):
+            # 逐日计数索引：O(1)窗口查询
+            recent_failed_prs = DailyCountIndex.from_dict(data['daily_index']).window_total('failed', 7)
+        else:
+            for date_str, failed_count in daily_failed_submissions.items():
+                try:
+                    date_obj = datetime.strptime(date_str, '%Y-%m-%d')
+                    date_obj = date_obj.replace(tzinfo=timezone.utc)
+                    if date_obj >= seven_days_ago:
+                        recent_failed_prs += failed_count
+                except ValueError:
+                    continue
+    
+        print(f"📊 核心指标:")
+        print(f"  • 待合入PR数量: {total_open_prs}")
+        print(f"  • 近7天提交PR数量: {len(recent_submitted_prs)}")
+        print(f"  • 近7天合入PR数量: {recent_merged_analysis.get('count', 0)}")
+        print(f"  • 近7天失败PR数量: {recent_failed_prs}")
+    
+        if recent_submitted_prs:
+            failure_rate = (recent_failed_prs / len(recent_submitted_prs)) * 100
+            print(f"  • 近7天失败率: {failure_rate:.1f}%")
+    
+        print(f"\n📈 每日数据统计:")
+        print(f"  • 每日提交数据天数: {len(daily_submissions)}")
+        print(f"  • 每日失败数据天数: {len(daily_failed_submissions)}")
+    
+        # 显示最近几天的数据
+        sorted_dates = sorted(daily_submissions.keys())
+        if sorted_dates:
+            print(f"  • 数据时间范围: {sorted_dates[0]} 到 {sorted_dates[-1]}")
+    
+        print(f"\n🔥 失败PR详细数据:")
+        total_failed = sum(daily_failed_submissions.values())
+        total_submitted = sum(daily_submissions.values())
+        print(f"  • 总失败PR数量: {total_failed}")
+        print(f"  • 总提交PR数量: {total_submitted}")
+        if total_submitted:
+            print(f"  • 总体失败率: {(total_failed/total_submitted*100):.1f}%")
+    
+        if total_failed > 0:
+            print(f"  • 失败PR按日期分布:")
+            for date in sorted(daily_failed_submissions.keys())[-5:]:
+                count = daily_failed_submissions[date]
+                total = daily_submissions.get(date, 0)
+                if count > 0:
+                    print(f"    - {date}: {count}个失败PR (当天提交{total}个)")
+    
+        # 检查HTML看板文件
+        print(f"\n🌐 HTML看板验证:")
+        if html_content is not None and (not html_content or html_content.startswith("<h1>错误</h1>")):
+            print(f"  • ❌ 看板生成失败: {html_content}")
+            return False
+        if html_content is not None:
+            # 提取关键数据
+            failed_prs_match = re.search(r'class="stat-value failed-prs">(\d+)</div>', html_content)
+            if failed_prs_match:
+                html_failed_prs = failed_prs_match.group(1)
+                print(f"  • 看板显示失败PR数量: {html_failed_prs}")
         
-        # 提取关键数据
-        failed_prs_match = re.search(r'class="stat-value failed-prs">(\d+)</div>', html_content)
-        if failed_prs_match:
-            html_failed_prs = failed_prs_match.group(1)
-            print(f"  • 看板显示失败PR数量: {html_failed_prs}")
-        
-        failure_rate_match = re.search(r'个PR失败 \(([\d.]+)%\)</div>', html_content)
-        if failure_rate_match:
-            html_failure_rate = failure_rate_match.group(1)
-            print(f"  • 看板显示失败率: {html_failure_rate}%")
+            failure_rate_match = re.search(r'个PR失败 \(([\d.]+)%\)</div>', html_content)
+            if failure_rate_match:
+                html_failure_rate = failure_rate_match.group(1)
+                print(f"  • 看板显示失败率: {html_failure_rate}%")
         
-        # 检查是否包含双折线图配置
-        if '失败PR数量' in html_content:
-            print(f"  • ✅ 看板包含失败PR折线图配置")
-        else:
-            print(f"  • ❌ 看板缺少失败PR折线图配置")
+            # 检查是否包含双折线图配置
+            if '失败PR数量' in html_content:
+                print(f"  • ✅ 看板包含失败PR折线图配置")
+            else:
+                print(f"  • ❌ 看板缺少失败PR折线图配置")
         
-        print(f"  • ✅ HTML看板文件已生成并包含失败PR统计数据")
+            print(f"  • ✅ HTML看板文件已生成并包含失败PR统计数据")
         
-    except FileNotFoundError:
-        print(f"  • ❌ 找不到HTML看板文件")
-    
-    print(f"\n🎉 验证结果:")
-    print(f"  ✅ JSON数据包含失败PR统计")
-    print(f"  ✅ 失败PR检测逻辑工作正常")
-    print(f"  ✅ HTML看板已更新并显示失败PR数据")
-    print(f"  ✅ 双折线图包含总提交数和失败PR数量")
-    
-    if recent_failed_prs > 0:
-        print(f"\n💡 成功！失败PR统计数据现在正确显示在看板中")
-    else:
-        print(f"\n⚠️  注意：近7天内没有检测到失败PR")
+        else:
+            print(f"  • ❌ 找不到HTML看板文件")
+            return False
+    
+        print(f"\n🎉 验证结果:")
+        print(f"  ✅ JSON数据包含失败PR统计")
+        print(f"  ✅ 失败PR检测逻辑工作正常")
+        print(f"  ✅ HTML看板已更新并显示失败PR数据")
+        print(f"  ✅ 双折线图包含总提交数和失败PR数量")
+    
+        if recent_failed_prs > 0:
+            print(f"\n💡 成功！失败PR统计数据现在正确显示在看板中")
+        else:
+            print(f"\n⚠️  注意：近7天内没有检测到失败PR")
+        return True
+
+    except Exception as e:
+        print(f"❌ 验证过程出错: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def main():
+    output_dir = get_output_dir()
+    results = [verify_repository(repo_path(output_dir, repo_conf, 'data_file'),
+                                 repo_path(output_dir, repo_conf, 'dashboard_file'))
+               for repo_conf in load_repositories()]
+    return 0 if all(results) else 1
 
-except Exception as e:
-    print(f"❌ 验证过程出错: {e}")
-    import traceback
-    traceback.print_exc()
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+PR监控常驻模式
+功能：在一个长期运行的进程内保持HTTP客户端、限流器和PR数据集，按固定间隔增量拉取；
+只有数据发生变化（或跨天导致统计窗口移动）时才重新分析、渲染并写盘，
+收到SIGINT/SIGTERM时完成当前轮次后退出，收到SIGHUP时立即开始新一轮并强制重新渲染
+
+用法：
+    python watch_monitor.py --interval 300
+    WATCH_INTERVAL=120 python watch_monitor.py
+"""
+
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from monitor import (ANALYSIS_WINDOW_DAYS, analyze_pr_data, build_output_data, enrich_repository, get_access_token,
+                     get_all_pull_requests, get_sync_cursor, load_existing_prs, load_sync_options, open_rollup,
+                     sync_repository)
+from pipeline_metrics import PipelineMetrics
+from pr_dashboard import generate_index_html, render_pr_dashboard
+from pr_history import record_history
+from pr_record import project_pr
+from pr_store import PRStore, in_analysis_window, write_analysis_json
+from repo_config import INDEX_FILE, get_output_dir, load_config, repo_path
+
+# 默认轮询间隔（秒）
+DEFAULT_WATCH_INTERVAL = 300
+
+class WatchedRepository:
+    """
+    单个仓库的常驻状态：打开的PRStore、内存中的PR记录（编号 -> PRRecord）以及最近一次的输出数据
+    """
+    def __init__(self, repo_conf: dict, output_dir: str, options: dict):
+        self.repo_conf = repo_conf
+        self.output_dir = output_dir
+        self.options = options
+        self.repository = f"{repo_conf['owner']}/{repo_conf['repo']}"
+        self.store = None
+        # 离线模式下为None，PR详情只使用缓存
+        self.access_token = None
+        self.records = {}
+        # 汇总立方体常驻内存，PR变化时只更新受影响的单元格（未开启ROLLUP时为None）
+        self.rollup = None
+        self.output_data = None
+        # 轮询游标单独维护：webhook写入的PR会推高存储中的最大updated_at，不能用它作为增量拉取的起点
+        self.poll_cursor = None
+        self.window_covered = True
+        self.rendered_on = None
+        self.dirty = False
+        # 上次记录快照历史以来有变化的PR：编号 -> (上次记录时的PRRecord或None, 最新的PRRecord)
+        self.history_changes = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.store is not None
+
+    def _open_store(self) -> PRStore:
+        # 轮询线程与webhook线程都会访问存储，由Watcher.lock保证串行
+        return PRStore(repo_path(self.output_dir, self.repo_conf, "db_file"), extra_fields=self.options["extra_fields"],
+                       check_same_thread=False)
+
+    def bootstrap(self, access_token: str):
+        """首轮同步：与单次运行相同的流程（导入历史、窗口获取、分析），随后把全部PR保留在内存中"""
+        output_data = sync_repository(self.repo_conf, access_token, self.output_dir, self.options, export=False)
+        self.access_token = access_token
+        self.records = {record.number: record for record in output_data["all_prs"]}
+        self.window_covered = output_data["window_covered"]
+        self.output_data = output_data
+        self.store = self._open_store()
+        self.poll_cursor = self.store.get_sync_cursor()
+        self._open_rollup()
+        self.dirty = True
+
+    def bootstrap_local(self):
+        """离线首轮：不访问API，直接从本地存储（为空时从已有的分析JSON导入）加载PR数据集"""
+        self.store = self._open_store()
+        if self.store.count() == 0:
+            existing_prs, _ = load_existing_prs(repo_path(self.output_dir, self.repo_conf, "data_file"))
+            self.store.upsert_prs(existing_prs)
+        self.records = {record.number: record for record in self.store.all_prs()}
+        self.poll_cursor = self.store.get_sync_cursor()
+        self._open_rollup()
+        self.dirty = True
+
+    def _open_rollup(self):
+        if self.options.get("rollup"):
+            self.rollup = open_rollup(self.store)
+            self.rollup.save(self.store)
+
+    def apply(self, prs) -> int:
+        """
+        把一批PR（API对象或PRRecord）合并进内存数据集和存储，返回内容确有变化的PR数量
+
+        内容未变化的PR（例如增量拉取时游标位置上的那个PR）不会触发重新渲染
+        """
+        changed = []
+        for pr in prs:
+            record = project_pr(pr, self.options["extra_fields"])
+            existing = self.records.get(record.number)
+            if existing is None or existing.to_dict() != record.to_dict():
+                changed.append(record)
+
+        if changed:
+            self.store.upsert_prs(changed)
+            for record in changed:
+                if self.options.get("history"):
+                    previous = self.history_changes.get(record.number, (self.records.get(record.number),))[0]
+                    self.history_changes[record.number] = (previous, record)
+                self.records[record.number] = record
+            if self.rollup is not None:
+                self.rollup.update(changed)
+                self.rollup.save(self.store)
+            self.dirty = True
+        return len(changed)
+
+    def poll(self, access_token: str) -> int:
+        """按同步游标增量拉取，返回有变化的PR数量"""
+        fetch_report = {}
+        owner, repo = self.repo_conf["owner"], self.repo_conf["repo"]
+        prs = get_all_pull_requests(owner, repo, access_token, max_pages=self.options["max_pages"],
+                                    since=self.poll_cursor, fetch_report=fetch_report,
+                                    **self.options["fetch_options"])
+        if not fetch_report["window_covered"]:
+            print(f"[{self.repository}] 警告：已达到最大页数限制，部分更新可能要到下一轮才能获取")
+            # 被截断的更新不会再被游标覆盖，下次单次运行时按分析窗口重新获取
+            self.store.set_covered_since(None)
+        # 返回的PR都不早于当前游标，其中最新的updated_at即为新游标
+        self.poll_cursor = get_sync_cursor(prs) or self.poll_cursor
+        return self.apply(prs)
+
+    def is_stale(self) -> bool:
+        """统计窗口按天划分，跨天后即使没有PR变化也需要重新分析"""
+        return self.rendered_on != datetime.now().date()
+
+    def analyze(self, metrics: PipelineMetrics) -> dict:
+        """基于内存中的PR数据集重新分析（窗口条件与PRStore.window_prs()一致）"""
+        window_start = datetime.now(timezone.utc) - timedelta(days=ANALYSIS_WINDOW_DAYS)
+        all_prs = sorted(self.records.values(), key=lambda record: record.number, reverse=True)
+        window_prs = [record for record in all_prs if in_analysis_window(record, window_start.timestamp())]
+        details = enrich_repository(self.repo_conf, self.access_token, window_prs, self.store, self.options)
+        with metrics.stage("analyze", self.repository):
+            analysis_result = analyze_pr_data(window_prs, backend=self.options["analysis_backend"], details=details)
+        self.output_data = build_output_data(self.repository, analysis_result, all_prs, self.store.get_sync_cursor(),
+                                             self.window_covered, metrics, covered_since=self.store.get_covered_since())
+        if self.rollup is not None:
+            self.output_data["rollups"] = self.rollup.export()
+        self.output_data["all_prs"] = all_prs
+        return self.output_data
+
+    def publish(self, metrics: PipelineMetrics):
+        """重新分析（首次发布直接使用首轮同步的分析结果）、渲染并写入分析JSON和看板"""
+        if self.rendered_on is not None or self.output_data is None:
+            self.analyze(metrics)
+            if self.options.get("history"):
+                record_history(self.repo_conf, self.output_dir, self.store, self.history_changes.values(), metrics)
+                self.history_changes = {}
+
+        with metrics.stage("render", self.repository):
+            html_content = render_pr_dashboard(self.output_data, self.repo_conf["title"])
+        with metrics.stage("export_json", self.repository):
+            write_analysis_json(repo_path(self.output_dir, self.repo_conf, "data_file"), self.output_data)
+        with metrics.stage("write_dashboard", self.repository):
+            with open(repo_path(self.output_dir, self.repo_conf, "dashboard_file"), 'w', encoding='utf-8') as f:
+                f.write(html_content)
+
+        self.rendered_on = datetime.now().date()
+        self.dirty = False
+
+    def close(self):
+        if self.store:
+            self.store.close()
+            self.store = None
+
+class Watcher:
+    """
+    常驻轮询器：所有仓库共享同一个API客户端和限流器，每轮依次同步各仓库
+    """
+    def __init__(self, interval: float, config: dict = None, output_dir: str = None, offline: bool = False):
+        self.interval = interval
+        # 离线模式：只从本地存储加载数据，不轮询API（由webhook等其他入口推送更新）
+        self.offline = offline
+        self.config = config or load_config()
+        self.output_dir = output_dir or get_output_dir()
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.access_token = get_access_token()
+        self.options = load_sync_options(self.output_dir, self.config)
+        self.repositories = [WatchedRepository(repo_conf, self.output_dir, self.options)
+                             for repo_conf in self.config["repositories"]]
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.force_render = False
+        # 常驻进程中串行访问数据集（webhook等其他入口与轮询共用）
+        self.lock = threading.RLock()
+
+    def _new_metrics(self) -> PipelineMetrics:
+        """每轮使用新的指标收集器，避免页面记录在常驻进程中无限增长"""
+        metrics = PipelineMetrics()
+        self.options["metrics"] = metrics
+        self.options["fetch_options"]["metrics"] = metrics
+        return metrics
+
+    def request_stop(self, signum=None, frame=None):
+        """SIGINT/SIGTERM处理：第一次请求在当前轮次结束后退出，再次收到则立即中断"""
+        if self.stop_event.is_set():
+            raise KeyboardInterrupt
+        print("\n收到退出信号，完成当前轮次后退出...")
+        self.stop_event.set()
+        self.wake_event.set()
+
+    def request_refresh(self, signum=None, frame=None):
+        """SIGHUP处理：立即开始新一轮并强制重新渲染"""
+        self.force_render = True
+        self.wake_event.set()
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGINT, self.request_stop)
+        signal.signal(signal.SIGTERM, self.request_stop)
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self.request_refresh)
+
+    def publish(self, watched_list: list, metrics: PipelineMetrics):
+        """发布需要更新的仓库，多仓库时同时更新索引页"""
+        for watched in watched_list:
+            watched.publish(metrics)
+            print(f"[{watched.repository}] 看板已更新: {repo_path(self.output_dir, watched.repo_conf, 'dashboard_file')}")
+
+        if watched_list and len(self.repositories) > 1:
+            entries = [(watched.repo_conf, watched.output_data) for watched in self.repositories]
+            with open(os.path.join(self.output_dir, INDEX_FILE), 'w', encoding='utf-8') as f:
+                f.write(generate_index_html(entries))
+        metrics.write(self.output_dir)
+
+    def run_cycle(self) -> int:
+        """执行一轮同步，返回重新发布的仓库数量"""
+        metrics = self._new_metrics()
+        force, self.force_render = self.force_render, False
+        to_publish = []
+
+        with self.lock:
+            for watched in self.repositories:
+                if self.stop_event.is_set():
+                    break
+                try:
+                    with metrics.stage("cycle", watched.repository):
+                        if not watched.ready:
+                            if self.offline:
+                                watched.bootstrap_local()
+                            else:
+                                watched.bootstrap(self.access_token)
+                            print(f"[{watched.repository}] 初始同步完成，内存数据集共 {len(watched.records)} 个PR")
+                        elif not self.offline:
+                            changed = watched.poll(self.access_token)
+                            if changed:
+                                print(f"[{watched.repository}] {changed} 个PR有变化")
+                    if watched.dirty or force or watched.is_stale():
+                        to_publish.append(watched)
+                except Exception as e:
+                    print(f"[{watched.repository}] 本轮同步失败，将在下一轮重试: {e}")
+
+            self.publish(to_publish, metrics)
+        return len(to_publish)
+
+    def run(self, max_cycles: int = None):
+        """循环执行，直到收到退出信号或达到max_cycles轮"""
+        repo_names = ', '.join(watched.repository for watched in self.repositories)
+        print(f"常驻监控已启动: {repo_names}，轮询间隔 {self.interval:g} 秒，输出目录 {self.output_dir}")
+
+        cycles = 0
+        try:
+            while not self.stop_event.is_set():
+                started = time.perf_counter()
+                published = self.run_cycle()
+                cycles += 1
+                api_stats = self.options["fetch_options"]["client"].stats
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 第 {cycles} 轮完成，耗时 "
+                      f"{time.perf_counter() - started:.2f}s，更新 {published} 个看板"
+                      f"（累计API请求 {api_stats['requests']} 次，304 {api_stats['not_modified']} 次）")
+
+                if max_cycles and cycles >= max_cycles:
+                    break
+                self.wake_event.wait(self.interval)
+                self.wake_event.clear()
+        finally:
+            self.close()
+        print("常驻监控已退出")
+
+    def close(self):
+        with self.lock:
+            for watched in self.repositories:
+                watched.close()
+            self.options["fetch_options"]["client"].close()
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="PR监控常驻模式：按间隔增量同步，数据变化时更新看板")
+    arg_parser.add_argument("--interval", type=float,
+                            default=float(os.environ.get("WATCH_INTERVAL", DEFAULT_WATCH_INTERVAL)),
+                            help=f"轮询间隔（秒），默认读取环境变量WATCH_INTERVAL，否则为{DEFAULT_WATCH_INTERVAL}")
+    arg_parser.add_argument("--max-cycles", type=int, default=None, help="执行指定轮数后退出（默认一直运行）")
+    arg_parser.add_argument("--once", action="store_true", help="只执行一轮（等同于 --max-cycles 1）")
+    args = arg_parser.parse_args()
+
+    watcher = Watcher(args.interval)
+    watcher.install_signal_handlers()
+    watcher.run(max_cycles=1 if args.once else args.max_cycles)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
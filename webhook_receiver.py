@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+PR webhook接收器
+功能：在本地监听Gitcode合并请求（Merge Request Hook）事件，把每个事件作为一次PR更新合并进常驻内存的数据集，
+一段时间内的突发事件合并后再防抖触发一次重新分析和看板渲染，使看板在几秒内反映PR变化；
+轮询（watch_monitor.py）保留为兜底，也可以只从本地数据加载、完全依赖webhook（--no-poll）。
+收到的事件可以录制下来（--record-dir），之后不依赖任何在线服务重放（--replay）
+
+用法：
+    python webhook_receiver.py --port 8080 --interval 3600
+    python webhook_receiver.py --replay webhook_events/
+"""
+
+import argparse
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from timeutil import parse_timestamp
+from watch_monitor import DEFAULT_WATCH_INTERVAL, Watcher
+
+# 默认监听地址与端口
+DEFAULT_WEBHOOK_HOST = "127.0.0.1"
+DEFAULT_WEBHOOK_PORT = 8080
+
+# 防抖：最后一个事件之后静默多少秒再渲染；持续有事件时最长等待多少秒必定渲染一次
+DEFAULT_DEBOUNCE_SECONDS = 2.0
+DEFAULT_MAX_DELAY_SECONDS = 10.0
+
+# 请求头中的事件类型与密钥（Gitcode兼容GitLab/Gitee的请求头）
+EVENT_HEADERS = ('X-GitCode-Event', 'X-Gitlab-Event', 'X-Gitee-Event')
+TOKEN_HEADERS = ('X-GitCode-Token', 'X-Gitlab-Token', 'X-Gitee-Token')
+
+# 合并请求事件中的状态 -> API中的PR状态
+_STATE_MAP = {
+    'opened': 'open', 'reopened': 'open', 'locked': 'open', 'open': 'open',
+    'merged': 'merged', 'closed': 'closed',
+}
+
+_TIME_FIELDS = ('created_at', 'updated_at', 'merged_at', 'closed_at')
+
+def _header(headers: dict, names) -> str:
+    lowered = {key.lower(): value for key, value in (headers or {}).items()}
+    for name in names:
+        if name.lower() in lowered:
+            return lowered[name.lower()]
+    return None
+
+def _normalize_time(value):
+    """事件中的时间格式不统一（如"2025-01-01 12:00:00 UTC"），统一为与API一致的ISO 8601字符串"""
+    if not value:
+        return None
+    try:
+        return parse_timestamp(value).isoformat()
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+def _label_names(labels) -> list:
+    names = []
+    for label in labels or ():
+        if isinstance(label, dict):
+            name = label.get('name') or label.get('title')
+            if name:
+                names.append(name)
+        elif isinstance(label, str):
+            names.append(label)
+    return names
+
+def parse_webhook_event(payload: dict, headers: dict = None) -> tuple:
+    """
+    把一次webhook投递解析为 (仓库 "owner/repo", PR更新字典)，不是合并请求事件时返回 (None, None)
+
+    支持GitLab风格（object_kind/object_attributes）和Gitee风格（pull_request）两种载荷；
+    PR更新字典只包含事件中实际带有的字段，字段结构与API返回的PR对象一致
+    """
+    if not isinstance(payload, dict):
+        return None, None
+    event = (_header(headers, EVENT_HEADERS) or '').lower()
+    if event and 'merge request' not in event and 'pull request' not in event:
+        return None, None
+
+    if isinstance(payload.get('pull_request'), dict):
+        pr = payload['pull_request']
+        repo_info = payload.get('repository') or payload.get('project') or {}
+        repository = repo_info.get('full_name') or repo_info.get('path_with_namespace')
+        update = {
+            'number': pr.get('number') or pr.get('iid'),
+            'title': pr.get('title'),
+            'state': pr.get('state'),
+            'html_url': pr.get('html_url') or pr.get('url'),
+            'target_branch': (pr.get('base') or {}).get('ref') if isinstance(pr.get('base'), dict) else pr.get('target_branch'),
+            'source_branch': (pr.get('head') or {}).get('ref') if isinstance(pr.get('head'), dict) else pr.get('source_branch'),
+            'user': (pr.get('user') or {}).get('login') if isinstance(pr.get('user'), dict) else pr.get('user'),
+            'labels': _label_names(pr.get('labels')) if 'labels' in pr else None,
+        }
+        update.update({field: pr.get(field) for field in _TIME_FIELDS})
+    elif payload.get('object_kind') == 'merge_request' or isinstance(payload.get('object_attributes'), dict):
+        attrs = payload.get('object_attributes') or {}
+        repository = (payload.get('project') or {}).get('path_with_namespace') or \
+            (payload.get('repository') or {}).get('path_with_namespace')
+        author = attrs.get('author') if isinstance(attrs.get('author'), dict) else {}
+        update = {
+            'number': attrs.get('iid'),
+            'title': attrs.get('title'),
+            'state': attrs.get('state'),
+            'html_url': attrs.get('url'),
+            'target_branch': attrs.get('target_branch'),
+            'source_branch': attrs.get('source_branch'),
+            'user': author.get('username') or author.get('login'),
+            'labels': _label_names(payload['labels']) if 'labels' in payload else
+                      _label_names(attrs['labels']) if 'labels' in attrs else None,
+        }
+        update.update({field: attrs.get(field) for field in _TIME_FIELDS})
+        # 创建事件中的操作者就是作者，其他操作（评论、合入）的操作者不一定是作者
+        if not update['user'] and attrs.get('action') == 'open':
+            update['user'] = (payload.get('user') or {}).get('username')
+    else:
+        return None, None
+
+    if not repository or update['number'] is None:
+        return None, None
+    update['number'] = int(update['number'])
+    update['state'] = _STATE_MAP.get(str(update['state']).lower()) if update['state'] else None
+    for field in _TIME_FIELDS:
+        update[field] = _normalize_time(update[field])
+    if update['labels'] is not None:
+        update['labels'] = [{'name': name} for name in update['labels']]
+    if update['user']:
+        update['user'] = {'login': update['user']}
+    return repository, {key: value for key, value in update.items() if value is not None}
+
+def merge_update(existing, update: dict):
+    """
+    把事件中的字段合并到已有PR（PRRecord或None）上，返回完整的PR字典；事件早于已有数据时返回None
+
+    合入/关闭事件可能不带merged_at/closed_at，此时以事件的updated_at补全
+    """
+    pr = existing.to_dict() if existing is not None else {}
+    if existing is not None and update.get('updated_at') and existing.updated_at:
+        if parse_timestamp(update['updated_at']) < parse_timestamp(existing.updated_at):
+            return None
+
+    pr.update(update)
+    if pr.get('state') == 'merged' and not pr.get('merged_at'):
+        pr['merged_at'] = pr.get('updated_at')
+    if pr.get('state') in ('merged', 'closed') and not pr.get('closed_at'):
+        pr['closed_at'] = pr.get('merged_at') if pr['state'] == 'merged' else pr.get('updated_at')
+    if not pr.get('created_at'):
+        # 缺少创建时间的PR无法参与按天统计，等待轮询补全
+        return None
+    return pr
+
+def load_deliveries(paths: list) -> list:
+    """
+    读取录制的webhook投递：每个文件为单个投递、投递列表或每行一个投递（NDJSON），目录按文件名排序读取；
+    投递为 {"headers": {...}, "payload": {...}}，也可以直接是事件载荷
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.endswith(('.json', '.ndjson', '.jsonl')))
+        else:
+            files.append(path)
+
+    deliveries = []
+    for file in files:
+        with open(file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        try:
+            items = json.loads(content)
+        except ValueError:
+            items = [json.loads(line) for line in content.splitlines() if line.strip()]
+        for item in items if isinstance(items, list) else [items]:
+            if isinstance(item, dict) and 'payload' in item:
+                deliveries.append((item.get('headers') or {}, item['payload']))
+            else:
+                deliveries.append(({}, item))
+    return deliveries
+
+class WebhookReceiver:
+    """
+    webhook事件的合并与防抖发布
+
+    receive()只把事件放入待处理队列（同一PR的多个事件按字段合并），后台线程在最后一个事件之后静默debounce秒
+    （或第一个事件之后max_delay秒）时，在Watcher.lock内把整批更新合并进各仓库的数据集并重新发布有变化的看板
+    """
+    def __init__(self, watcher: Watcher, debounce: float = DEFAULT_DEBOUNCE_SECONDS,
+                 max_delay: float = DEFAULT_MAX_DELAY_SECONDS, secret: str = None, record_dir: str = None):
+        self.watcher = watcher
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.secret = secret
+        self.record_dir = record_dir
+        self.repositories = {watched.repository.lower(): watched for watched in watcher.repositories}
+        self.condition = threading.Condition()
+        self.pending = {}
+        self.first_event_at = None
+        self.last_event_at = None
+        self.stats = {'received': 0, 'ignored': 0, 'unauthorized': 0, 'applied': 0, 'stale': 0, 'renders': 0}
+        self._sequence = 0
+        self._stopping = False
+
+        if record_dir:
+            os.makedirs(record_dir, exist_ok=True)
+
+    def authorized(self, headers: dict) -> bool:
+        if not self.secret:
+            return True
+        return hmac.compare_digest(_header(headers, TOKEN_HEADERS) or '', self.secret)
+
+    def record(self, headers: dict, payload):
+        """把投递保存为可重放的文件（文件名按接收顺序排序）"""
+        with self.condition:
+            self._sequence += 1
+            sequence = self._sequence
+        file = os.path.join(self.record_dir, f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{sequence:06d}.json")
+        with open(file, 'w', encoding='utf-8') as f:
+            json.dump({'headers': headers, 'payload': payload}, f, ensure_ascii=False, indent=2)
+
+    def receive(self, headers: dict, payload) -> str:
+        """接收一次投递，返回处理结果：queued（已排队）或 ignored（非合并请求事件或未监控的仓库）"""
+        repository, update = parse_webhook_event(payload, headers)
+        watched = self.repositories.get((repository or '').lower())
+        with self.condition:
+            self.stats['received'] += 1
+            if watched is None:
+                self.stats['ignored'] += 1
+                return 'ignored'
+
+            updates = self.pending.setdefault(watched.repository, {})
+            queued = updates.get(update['number'])
+            if queued is None or not queued.get('updated_at') or not update.get('updated_at') or \
+                    parse_timestamp(update['updated_at']) >= parse_timestamp(queued['updated_at']):
+                updates[update['number']] = dict(queued or {}, **update)
+            else:
+                # 乱序到达的旧事件只补充缺失的字段
+                updates[update['number']] = dict(update, **queued)
+
+            now = time.monotonic()
+            self.first_event_at = self.first_event_at or now
+            self.last_event_at = now
+            self.condition.notify()
+        return 'queued'
+
+    def _take_batch(self):
+        """等待到防抖时间点后取出整批待处理事件，停止时返回None"""
+        with self.condition:
+            while True:
+                if self._stopping:
+                    return None
+                if not self.pending:
+                    self.condition.wait()
+                    continue
+                deadline = min(self.last_event_at + self.debounce, self.first_event_at + self.max_delay)
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+                batch, self.pending = self.pending, {}
+                self.first_event_at = self.last_event_at = None
+                return batch
+
+    def _requeue(self, repository: str, updates: dict):
+        with self.condition:
+            pending = self.pending.setdefault(repository, {})
+            for number, update in updates.items():
+                pending[number] = dict(update, **pending.get(number, {}))
+            now = time.monotonic()
+            self.first_event_at = self.first_event_at or now
+            self.last_event_at = now
+
+    def flush(self, batch: dict = None) -> int:
+        """把一批事件合并进数据集并发布有变化的仓库（默认取出当前全部待处理事件），返回发布的仓库数量"""
+        if batch is None:
+            with self.condition:
+                batch, self.pending = self.pending, {}
+                self.first_event_at = self.last_event_at = None
+        if not batch:
+            return 0
+
+        with self.watcher.lock:
+            metrics = self.watcher._new_metrics()
+            to_publish = []
+            for repository, updates in batch.items():
+                watched = self.repositories[repository.lower()]
+                if not watched.ready:
+                    # 首轮同步尚未完成（或失败），事件留待下次处理
+                    self._requeue(repository, updates)
+                    continue
+                with metrics.stage("webhook_apply", repository):
+                    prs = []
+                    for number, update in updates.items():
+                        pr = merge_update(watched.records.get(number), update)
+                        if pr is None:
+                            self.stats['stale'] += 1
+                        else:
+                            prs.append(pr)
+                    changed = watched.apply(prs)
+                self.stats['applied'] += changed
+                if changed:
+                    print(f"[{repository}] webhook: {len(updates)} 个PR的事件，其中 {changed} 个有变化")
+                    to_publish.append(watched)
+            if to_publish:
+                self.watcher.publish(to_publish, metrics)
+                self.stats['renders'] += 1
+        return len(to_publish)
+
+    def run_flusher(self):
+        """后台防抖发布循环，直到stop()"""
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            try:
+                self.flush(batch)
+            except Exception as e:
+                print(f"webhook事件处理失败: {e}")
+
+    def stop(self):
+        with self.condition:
+            self._stopping = True
+            self.condition.notify_all()
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'PRMonitorWebhook/1.0'
+
+    @property
+    def receiver(self) -> WebhookReceiver:
+        return self.server.receiver
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # 健康检查与统计：GET /_stats
+        if self.path.split('?')[0] == '/_stats':
+            self._send_json(200, dict(self.receiver.stats))
+        else:
+            self._send_json(404, {"message": "Not Found"})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        headers = dict(self.headers.items())
+
+        if not self.receiver.authorized(headers):
+            self.receiver.stats['unauthorized'] += 1
+            self._send_json(401, {"message": "invalid token"})
+            return
+        try:
+            payload = json.loads(body.decode('utf-8'))
+        except ValueError:
+            self._send_json(400, {"message": "invalid JSON payload"})
+            return
+
+        if self.receiver.record_dir:
+            self.receiver.record(headers, payload)
+        # 先应答再处理：渲染在后台防抖线程中进行，投递方不会因为渲染耗时而超时
+        self._send_json(202, {"status": self.receiver.receive(headers, payload)})
+
+def start_webhook_server(receiver: WebhookReceiver, host: str = DEFAULT_WEBHOOK_HOST, port: int = DEFAULT_WEBHOOK_PORT,
+                         verbose: bool = False) -> tuple:
+    """
+    在后台线程中启动webhook服务器（port为0时自动分配端口），返回 (server, url)，用完后调用server.shutdown()
+    """
+    server = ThreadingHTTPServer((host, port), WebhookHandler)
+    server.daemon_threads = True
+    server.receiver = receiver
+    server.verbose = verbose
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def replay(receiver: WebhookReceiver, paths: list) -> int:
+    """离线重放录制的投递：加载本地数据集，依次接收全部投递后合并发布一次，返回发布的仓库数量"""
+    deliveries = load_deliveries(paths)
+    receiver.watcher.run_cycle()
+    results = [receiver.receive(headers, payload) for headers, payload in deliveries]
+    published = receiver.flush()
+    print(f"重放 {len(deliveries)} 个投递（排队 {results.count('queued')}，忽略 {results.count('ignored')}），"
+          f"{receiver.stats['applied']} 个PR有变化，过期事件 {receiver.stats['stale']} 个，更新 {published} 个看板")
+    return published
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="PR webhook接收器：收到合并请求事件后在几秒内更新看板")
+    arg_parser.add_argument("--host", default=os.environ.get("WEBHOOK_HOST", DEFAULT_WEBHOOK_HOST))
+    arg_parser.add_argument("--port", type=int, default=int(os.environ.get("WEBHOOK_PORT", DEFAULT_WEBHOOK_PORT)))
+    arg_parser.add_argument("--debounce", type=float,
+                            default=float(os.environ.get("WEBHOOK_DEBOUNCE", DEFAULT_DEBOUNCE_SECONDS)),
+                            help="最后一个事件之后静默多少秒再渲染")
+    arg_parser.add_argument("--max-delay", type=float,
+                            default=float(os.environ.get("WEBHOOK_MAX_DELAY", DEFAULT_MAX_DELAY_SECONDS)),
+                            help="持续有事件时，第一个事件之后最长等待多少秒必定渲染")
+    arg_parser.add_argument("--interval", type=float,
+                            default=float(os.environ.get("WATCH_INTERVAL", DEFAULT_WATCH_INTERVAL)),
+                            help="兜底轮询间隔（秒）")
+    arg_parser.add_argument("--no-poll", action="store_true", help="不访问API，只从本地数据加载并依赖webhook更新")
+    arg_parser.add_argument("--record-dir", default=os.environ.get("WEBHOOK_RECORD_DIR"),
+                            help="把收到的投递保存到该目录，便于之后重放")
+    arg_parser.add_argument("--replay", nargs='+', metavar="PATH",
+                            help="离线重放录制的投递文件或目录后退出（不启动服务器，不访问API）")
+    arg_parser.add_argument("--verbose", action="store_true", help="打印每个请求的访问日志")
+    args = arg_parser.parse_args()
+
+    watcher = Watcher(args.interval, offline=args.no_poll or bool(args.replay))
+    receiver = WebhookReceiver(watcher, debounce=args.debounce, max_delay=args.max_delay,
+                               secret=os.environ.get("WEBHOOK_SECRET"), record_dir=args.record_dir)
+    if args.replay:
+        try:
+            replay(receiver, args.replay)
+        finally:
+            watcher.close()
+        return 0
+
+    server, url = start_webhook_server(receiver, args.host, args.port, args.verbose)
+    flusher = threading.Thread(target=receiver.run_flusher, daemon=True)
+    flusher.start()
+    print(f"webhook接收器已启动: {url} （防抖 {args.debounce:g}s，最长 {args.max_delay:g}s）")
+
+    watcher.install_signal_handlers()
+    try:
+        watcher.run()
+    finally:
+        server.shutdown()
+        server.server_close()
+        receiver.stop()
+        flusher.join()
+        print(f"webhook统计: {json.dumps(receiver.stats, ensure_ascii=False)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())